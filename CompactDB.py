@@ -0,0 +1,64 @@
+"""
+Copyright (C) 2022    Stefan Eichenberger   se_misc ... hotmail.com
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+This script converts tables of the SQLite database defined in section [DBRepo]
+of the config file to the compact schema or to blob storage (see DBRepository.migrate()).
+By default, all tables are converted; [DBRepo] quantize defines how values are stored,
+[DBRepo] storage = blob selects blob storage.
+"""
+
+import argparse
+import configparser
+import sqlite3
+import sys
+from datetime import datetime
+from PVForecast.dbrepository import DBRepository
+
+if __name__ == "__main__":
+    cfgParser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    cfgParser.add_argument('-c', '--cfg', help="Specify config file (default: ./config.ini)", metavar="FILE")
+    cfgParser.add_argument('-q', '--quantize', type=int, help="Store values as integers with this many decimals (default: [DBRepo] quantize)")
+    cfgParser.add_argument('-s', '--storage', choices=['compact', 'blob'], help="Convert to compact schema or to blob storage (default: blob if [DBRepo] storage = blob)")
+    cfgParser.add_argument('--vacuum', action='store_true', help="Rebuild database file afterwards, to release space (requires exclusive access)")
+    cfgParser.add_argument('tables', nargs='*', help="Tables to convert (default: all)")
+    args = cfgParser.parse_args()
+    if args.cfg: cfgFile = args.cfg
+    else:        cfgFile = 'config.ini'
+    config = configparser.ConfigParser(inline_comment_prefixes='#', empty_lines_in_values=False)
+    if not config.read(cfgFile):
+        print("Error reading config file '" + cfgFile + "'")
+        sys.exit(1)
+    myDB     = DBRepository(config)
+    quantize = args.quantize if args.quantize is not None else config['DBRepo'].getint('quantize', 0)
+    storage  = args.storage  if args.storage  is not None else ('blob' if config['DBRepo'].get('storage', 'rows') == 'blob' else 'compact')
+    tables   = args.tables
+    if len(tables) == 0:
+        tables = [table for table in myDB._tables if table not in myDB._schema and table != DBRepository._SCHEMA and not table.endswith(('__compact', DBRepository._LATEST))]
+    for table in tables:
+        if table not in myDB._tables:
+            print("Warning - table '" + table + "' not found, skipped")
+            continue
+        if table in myDB._schema:
+            print("Message - table '" + table + "' already uses " + ('blob storage' if table in myDB._blobs else 'compact schema'))
+            continue
+        start = datetime.now()
+        cnt   = myDB.migrate(table, quantize, storage=storage)
+        print("Message - table '" + table + "': " + str(cnt) + " rows converted in " + str(round((datetime.now() - start).total_seconds(), 1)) + " sec")
+    if args.vacuum:
+        del myDB
+        db = sqlite3.connect(config['DBRepo'].get('storePath') + '/' + config['DBRepo'].get('dbName'))
+        db.execute("VACUUM;")
+        db.close()
@@ -0,0 +1,176 @@
+"""
+Copyright (C) 2022    Stefan Eichenberger   se_misc ... hotmail.com
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import pandas as pd
+import os
+import re
+import sys
+try:
+    import pyarrow         as pa
+    import pyarrow.parquet as pq
+    _pyarrow_installed = True
+except ImportError:
+    _pyarrow_installed = False
+
+class Archive:
+    """Columnar archive of weather data (and model results), as a replacement of many small .kml.gz / .csv.gz
+    files: a Parquet dataset in directory [Archive] path, partitioned by provider and month of IssueTime:
+
+        <path>/provider=<provider>/month=<YYYY-MM>/<first issue>_<last issue>.parquet
+
+    Each row holds one PeriodEnd of one issue, with IssueTime and Name (file name of .csv output) as columns.
+    Providers are named after files, without issue time: MOSMIX_L_2024050109_10637.kml --> MOSMIX_L_10637
+    (raw MOSMIX data, as parsed by DWDForecast.parseKML()), owm_2024-05-01_09-00.csv.gz --> csv_owm
+    (data as written by Forecast.writeCSV()). New issues are appended as new files; once a month holds
+    more than _MAX_PARTS files, they are compacted into one."""
+
+    __operational__ = _pyarrow_installed
+    _MAX_PARTS      = 16                                                                 # files per month, before compaction
+    _STAMP          = re.compile(r'_(\d{10}|\d{4}-\d\d-\d\d_\d\d-\d\d)(?=[_.])')         # issue time in file names, see provider()
+
+    def __init__(self, config):
+        """Initialize Archive
+        config      configparser object with section [Archive]"""
+
+        if not _pyarrow_installed:
+            sys.tracebacklimit=0
+            raise Exception("ERROR --- Archive requires library 'pyarrow'; run 'pip install pyarrow'")
+        self.config = config
+        self.path   = './archive'
+        if 'Archive' in self.config.sections():
+            self.path = self.config['Archive'].get('path', self.path)
+
+    @classmethod
+    def provider(cls, file):
+        """provider name and issue time (string, iso format, UTC) derived from file name;
+        (None, None) if file name doesn't contain an issue time"""
+
+        name  = os.path.basename(file)
+        stamp = cls._STAMP.search(name)
+        if stamp is None:
+            return None, None
+        provider = re.sub(r'\.(zip|kmz|kml|xml|csv)(\.gz|\.zip)?$', '', name[:stamp.start()] + name[stamp.end():], flags=re.IGNORECASE)
+        if re.search(r'\.csv(\.gz|\.zip)?$', name, re.IGNORECASE):
+            provider = 'csv_' + provider
+        digits   = re.sub(r'\D', '', stamp.group(1)).ljust(12, '0')                      # YYYYmmddHHMM
+        issue    = digits[0:4] + '-' + digits[4:6] + '-' + digits[6:8] + ' ' + digits[8:10] + ':' + digits[10:12] + ':00+00:00'
+        return provider, issue
+
+    def issueTimes(self, provider, months = None):
+        """set of IssueTime (strings) stored for provider
+        months      limit search to these months (iterable of 'YYYY-MM'; default: all)"""
+
+        issues = set()
+        for month in self._months(provider):
+            if months is not None and month[-7:] not in months:
+                continue
+            for part in self._parts(month):
+                table  = pq.read_table(part, columns=['IssueTime'], partitioning=None)
+                issues = issues.union(str(t) for t in table.column('IssueTime').unique().to_pandas())
+        return issues
+
+    def append(self, provider, forecasts):
+        """append forecasts (Forecast objects with DataTable indexed by PeriodEnd, IssueTime and csvName)
+        to provider; issues already in the archive are skipped. Returns number of issues appended"""
+
+        known  = self.issueTimes(provider, set(forecast.IssueTime[:7] for forecast in forecasts))   # only partitions appended to
+        months = {}
+        for forecast in forecasts:
+            if forecast.IssueTime in known or forecast.DataTable is None:
+                continue
+            known.add(forecast.IssueTime)
+            data = forecast.DataTable.reset_index()
+            data.insert(0, 'IssueTime', pd.Timestamp(forecast.IssueTime))
+            data.insert(1, 'Name', forecast.csvName)
+            months.setdefault(forecast.IssueTime[:7], []).append(data)
+        for month, datas in sorted(months.items()):
+            path = self.path + '/provider=' + provider + '/month=' + month
+            os.makedirs(path, exist_ok=True)
+            data = pd.concat(datas, ignore_index=True).sort_values(['IssueTime', 'PeriodEnd'], kind='stable')
+            self._write(data, path + '/' + self._partName(data))
+            parts = self._parts(path)
+            if len(parts) > self._MAX_PARTS:
+                self._compact(path, parts)
+        return sum(len(datas) for datas in months.values())
+
+    def read(self, provider, columns = None, start = None, end = None):
+        """generator of (IssueTime, Name, DataTable) for all issues of provider, in order of IssueTime.
+        Data is read one month at a time, with only the columns requested (default: all)
+        start, end  limit IssueTime (inclusive; strings in iso format or Timestamps)"""
+
+        if start is not None: start = self._utc(start)
+        if end   is not None: end   = self._utc(end)
+        for month in self._months(provider):
+            m = pd.Timestamp(month[-7:] + '-01', tz='UTC')
+            if (start is not None and m + pd.offsets.MonthBegin() <= start) or (end is not None and m > end):
+                continue
+            datas = []
+            for part in self._parts(month):
+                names = pq.read_schema(part).names
+                cols  = [col for col in names if columns is None or col in columns or col in ['IssueTime', 'Name', 'PeriodEnd']]
+                datas.append(pq.read_table(part, columns=cols, partitioning=None).to_pandas())
+            data  = pd.concat(datas, ignore_index=True)
+            if start is not None: data = data[data['IssueTime'] >= start]
+            if end   is not None: data = data[data['IssueTime'] <= end]
+            for issue, table in data.groupby('IssueTime', sort=True):
+                name  = table['Name'].iloc[0]
+                table = table.drop(columns=['IssueTime', 'Name']).set_index('PeriodEnd').sort_index()
+                table = table[~table.index.duplicated()]                                 # in case of interrupted compaction
+                yield str(issue), name, table
+
+    def providers(self):
+        """list of providers in archive"""
+
+        if not os.path.isdir(self.path):
+            return []
+        return sorted(entry.name[9:] for entry in os.scandir(self.path) if entry.is_dir() and entry.name.startswith('provider='))
+
+    def _utc(self, t):
+        t = pd.Timestamp(t)
+        return t.tz_localize('UTC') if t.tzinfo is None else t.tz_convert('UTC')
+
+    def _months(self, provider):
+        path = self.path + '/provider=' + provider
+        if not os.path.isdir(path):
+            return []
+        return sorted(entry.path for entry in os.scandir(path) if entry.is_dir() and entry.name.startswith('month='))
+
+    def _parts(self, month):
+        return sorted(entry.path for entry in os.scandir(month) if entry.is_file() and entry.name.endswith('.parquet'))
+
+    def _partName(self, data):
+        first = data['IssueTime'].iloc[0].strftime('%Y%m%d%H%M')
+        last  = data['IssueTime'].iloc[-1].strftime('%Y%m%d%H%M')
+        return first + '_' + last + '.parquet'
+
+    def _compact(self, path, parts):
+        """merge all files of a month into one"""
+
+        data = pd.concat([pq.read_table(part, partitioning=None).to_pandas() for part in parts], ignore_index=True)
+        data = data.sort_values(['IssueTime', 'PeriodEnd'], kind='stable')
+        file = path + '/' + self._partName(data)
+        self._write(data, file)
+        for part in parts:
+            if part != file:
+                os.remove(part)
+
+    def _write(self, data, file):
+        """write data to file, through a temporary file (readers never see partial files)"""
+
+        tmpFile = file + '.' + str(os.getpid()) + '.tmp'
+        pq.write_table(pa.Table.from_pandas(data, preserve_index=False), tmpFile, compression='zstd')
+        os.replace(tmpFile, file)
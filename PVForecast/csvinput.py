@@ -48,4 +48,11 @@ class CSVInput(Forecast):
 
         except Exception as e:
             print("Error - getForecast_CSVInput: " + str(e))
-            sys.exit(1)
\ No newline at end of file
+            sys.exit(1)
+
+    def getForecast_Archive(self, issueTime, name, table):
+        """Take data of one issue, as read from Archive (see Archive.read()), in place of a .csv file"""
+
+        self.DataTable = table
+        self.IssueTime = issueTime
+        self.csvName   = re.sub(r'\.csv.*$', '_out.csv.gz', name)
\ No newline at end of file
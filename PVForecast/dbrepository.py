@@ -17,28 +17,77 @@ along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
 import sqlite3
 import sys
+import json
+import zlib
+import itertools
+import numpy  as np
+import pandas as pd
 from datetime  import datetime, timezone
 from .forecast import Forecast
+try:
+    import zstandard
+    _zstandard_installed = True
+except ImportError:
+    _zstandard_installed = False
 
 class DBRepository:
-    """Class for storing PVForecast related data into sqlite database"""
+    """Class for storing PVForecast related data into sqlite database
+
+    Data is written with prepared 'INSERT OR IGNORE' statements (executemany), in explicit transactions.
+    An issue is skipped (with a message) if its IssueTime is already stored in the table.
+    By default, each call to loadData() / loadBatch() is a transaction of its own. After begin(), data is
+    kept pending and written in one transaction (covering all tables) with commit(), or whenever _BATCH
+    forecasts are pending. The database is switched to WAL journaling ([DBRepo] wal), so that readers and
+    the writer don't block each other; concurrent writers wait up to [DBRepo] timeout seconds.
+
+    With [DBRepo] compact = 1, new tables are created in a compact schema: IssueTime and PeriodEnd are
+    integer epoch seconds (UTC) and tables are WITHOUT ROWID, clustered on (IssueTime, PeriodEnd). With
+    [DBRepo] quantize = <n>, values of compact tables are stored as integers: round(value * 10^n).
+    Compact tables and their scale (10^n, 0 for plain real values) are listed in table _SCHEMA.
+
+    With [DBRepo] storage = blob, new tables hold one row per IssueTime (integer primary key, epoch seconds),
+    with the range of PeriodEnd covered (indexed) and all data in one blob: a compressed segment per column
+    ([DBRepo] codec zlib or zstd), values quantized as with compact tables. Column 'Columns' is a directory
+    of segments (name, dtype, scale, offset, length), so that getIssues() decompresses only the columns
+    requested. Existing tables can be converted with migrate() (see CompactDB.py).
+
+    For each table, table <table>__latest holds the latest forecast for each PeriodEnd (primary key). It is updated
+    with each write (rows of a newer IssueTime replace older ones) and read by getData(mode='latest'). Row tables
+    get an index on PeriodEnd, for getData() and getIssues() with a range of PeriodEnd."""
+
+    _BATCH  = 100                                                                        # max. pending forecasts after begin()
+    _SCHEMA = 'pvforecast_schema'                                                        # compact / blob tables: (tbl, scale, storage)
+    _EPOCH  = pd.Timestamp(0, tz='UTC')
+    _LATEST = '__latest'                                                                 # suffix of tables with latest forecast per PeriodEnd
 
     def __init__(self, config):
         """Initialize DBRepository
-        config      configparser object with section [PVSystem]"""
-        self.config  = config
-        self._db     = None
+        config      configparser object with section [DBRepo]"""
+        self.config    = config
+        self._db       = None
         if 'DBRepo' not in self.config.sections():
             sys.tracebacklimit=0
             raise Exception("missing section 'DBRepo' in config file")
-        path         = self.config['DBRepo'].get('storePath')
-        self.dbName  = path + '/' + self.config['DBRepo'].get('dbName')                   # database name (including path)
-        self._db     = sqlite3.connect(self.dbName)                                       # db connector
-        c            = self._db.cursor()
-        c.execute("SELECT name FROM sqlite_master WHERE type='table';")
-        tablenames   = c.fetchall()
-        self._tables = [''.join(table) for table in tablenames]                           # tuples in tablenames are like (name, ) - and we need get rid of the empty last element
-        c.close()
+        path           = self.config['DBRepo'].get('storePath')
+        self.dbName    = path + '/' + self.config['DBRepo'].get('dbName')                 # database name (including path)
+        timeout        = self.config['DBRepo'].getfloat('timeout', 60)                    # [sec] to wait for locks held by other processes
+        self._db       = sqlite3.connect(self.dbName, timeout=timeout, isolation_level=None)    # db connector, transactions are explicit (see _flush())
+        if self.config['DBRepo'].getboolean('wal', True):
+            self._db.execute("PRAGMA journal_mode=WAL;")                                 # persistent setting of database file
+            self._db.execute("PRAGMA synchronous=NORMAL;")                               # safe with WAL: sync at checkpoints only
+        self._compact  = self.config['DBRepo'].getboolean('compact', False)               # schema of new tables
+        self._quantize = self.config['DBRepo'].getint('quantize', 0)                      # decimals of values stored as integers
+        self._storage  = self.config['DBRepo'].get('storage', 'rows')                     # storage of new tables: rows or blob
+        self._codec    = self.config['DBRepo'].get('codec', 'zlib')                       # compression of blobs: zlib or zstd
+        if self._storage not in ['rows', 'blob'] or self._codec not in ['zlib', 'zstd']:
+            sys.tracebacklimit=0
+            raise Exception("ERROR --- [DBRepo] storage must be 'rows' or 'blob', codec must be 'zlib' or 'zstd'")
+        if self._storage == 'blob' and self._codec == 'zstd' and not _zstandard_installed:
+            sys.tracebacklimit=0
+            raise Exception("ERROR --- [DBRepo] codec = zstd requires library 'zstandard'; run 'pip install zstandard'")
+        self._reload()
+        self._pending  = []                                                               # data not yet written, see _flush()
+        self._deferred = False                                                            # True after begin()
 
     def __del__(self):
         """Deconstructor: close database connection"""
@@ -47,39 +96,532 @@ class DBRepository:
 
     def loadData(self, data: Forecast):
         """Store data (subclass of Forecast) in SQLite database"""
-        
-        c = self._db.cursor()
+
+        self.loadBatch([data])
+
+    def loadBatch(self, datas):
+        """Store a list of data (subclasses of Forecast) in SQLite database, in one transaction
+        (or in the transaction started with begin())"""
+
+        self._refresh()
+        for data in datas:
+            self._pending.append(self._prepare(data))
+        if not self._deferred or len(self._pending) >= self._BATCH:
+            self._flush()
+
+    def _refresh(self):
+        """_reload() if schema was changed by other process (eg. by migrate()), and prepare pending data again"""
+
+        if self._db.execute("PRAGMA schema_version;").fetchone()[0] != self._version:
+            self._reload()
+            self._pending = [self._prepare(p[5]) for p in self._pending]
+
+    def _reload(self):
+        """(re-)read database schema: tables, compact and blob tables (self._schema = {table: scale}, self._blobs)
+        and schema version"""
+
+        c              = self._db.cursor()
+        c.execute("SELECT name FROM sqlite_master WHERE type='table';")
+        tablenames     = c.fetchall()
+        self._tables   = [''.join(table) for table in tablenames]                        # tuples in tablenames are like (name, ) - and we need get rid of the empty last element
+        self._schema   = {}
+        self._blobs    = set()
+        self._registry = None                                                            # columns of _SCHEMA, None if not existing
+        if self._SCHEMA in self._tables:
+            self._registry = [col[1] for col in c.execute("PRAGMA table_info('" + self._SCHEMA + "');").fetchall()]
+            storage        = 'storage' if 'storage' in self._registry else "'compact'"     # _SCHEMA created before blob storage existed
+            for tbl, scale, storage in c.execute("SELECT tbl, scale, " + storage + " FROM " + self._SCHEMA + ";").fetchall():
+                self._schema[tbl] = scale
+                if storage == 'blob': self._blobs.add(tbl)
+        self._indexes  = set(index[0] for index in c.execute("SELECT name FROM sqlite_master WHERE type='index';").fetchall())
+        self._version  = c.execute("PRAGMA schema_version;").fetchone()[0]
+        c.close()
+        self._columns  = {}                                                              # columns of tables, as far as known
+
+    def _createSQL(self, table, params, scale, storage = 'compact'):
+        """statements (with arguments) to create compact or blob table (and its index)"""
+
+        if storage == 'blob':
+            sql = [('CREATE TABLE IF NOT EXISTS `' + table + '` (IssueTime integer PRIMARY KEY, PeriodFirst integer, PeriodLast integer, ' + 
+                    'Periods integer, Codec text, Columns text, Data blob);', ()),
+                   ('CREATE INDEX IF NOT EXISTS `' + table + '_PeriodLast` ON `' + table + '` (PeriodLast);', ())]
+        else:
+            type = ' integer' if scale else ' real'
+            sql = [('CREATE TABLE IF NOT EXISTS `' + table + '` (IssueTime integer, PeriodEnd integer, ' + (type + ', ').join(params) + type + 
+                    ', PRIMARY KEY(IssueTime, PeriodEnd)) WITHOUT ROWID;', ())]
+        return sql
+
+    def _registerSQL(self, table, scale, storage):
+        """statements (with arguments) to list table in _SCHEMA"""
+
+        sql = [('CREATE TABLE IF NOT EXISTS ' + self._SCHEMA + ' (tbl text PRIMARY KEY, scale integer, storage text);', ())]
+        if self._registry is not None and 'storage' not in self._registry:
+            sql.append(('ALTER TABLE ' + self._SCHEMA + ' ADD COLUMN storage text;', ()))
+        self._registry = ['tbl', 'scale', 'storage']
+        sql.append(('INSERT OR REPLACE INTO ' + self._SCHEMA + ' (tbl, scale, storage) VALUES (?, ?, ?);', (table, scale, storage)))
+        return sql
+
+    def _indexSQL(self, table):
+        """statement to create index on PeriodEnd of row table"""
+
+        self._indexes.add(table + '_PeriodEnd')
+        return [('CREATE INDEX IF NOT EXISTS `' + table + '_PeriodEnd` ON `' + table + '` (PeriodEnd);', ())]
+
+    def _latestSQL(self, table, params, epoch, scale, fill):
+        """statements to create table with latest forecast per PeriodEnd for table; if fill, it is filled from
+        (existing) row table table"""
+
+        key    = ' integer' if epoch else ' text'
+        type   = ' integer' if scale else ' real'
+        latest = table + self._LATEST
+        sql    = [('CREATE TABLE IF NOT EXISTS `' + latest + '` (PeriodEnd' + key + ' PRIMARY KEY, IssueTime' + key + 
+                   ''.join(', `' + param + '`' + type for param in params) + ') WITHOUT ROWID;', ())]
+        if fill:                                                                         # SQLite: other columns are taken from row with max(IssueTime)
+            cols = ''.join(', `' + param + '`' for param in params)
+            sql.append(('INSERT OR IGNORE INTO `' + latest + '` (PeriodEnd, IssueTime' + cols + ') SELECT PeriodEnd, max(IssueTime)' + cols + 
+                        ' FROM `' + table + '` GROUP BY PeriodEnd;', ()))
+        return sql
+
+    def _upsertSQL(self, table, cols):
+        """statement to write rows with columns cols to table with latest forecast per PeriodEnd, where newer;
+        columns not in cols are set NULL"""
+
+        latest = table + self._LATEST
+        sets   = ['`' + col + '` = excluded.`' + col + '`' for col in cols[1:]]
+        sets   = sets + ['`' + col + '` = NULL' for col in self._columns[latest] if col not in cols]
+        return ('INSERT INTO `' + latest + '` (`' + '`, `'.join(cols) + '`) VALUES (' + ', '.join(['?']*len(cols)) + ') ' + 
+                'ON CONFLICT(PeriodEnd) DO UPDATE SET ' + ', '.join(sets) + ' WHERE excluded.IssueTime > `' + latest + '`.IssueTime;')
+
+    def begin(self):
+        """Keep data pending until commit(), to write data of all tables in one transaction"""
+
+        self._deferred = True
+
+    def commit(self):
+        """Write pending data in one transaction, end deferred mode started with begin()"""
+
+        self._flush()
+        self._deferred = False
+
+    def _prepare(self, data: Forecast):
+        """Statements and rows to store data; checks for omitted / new fields in existing tables.
+        Values are converted as pandas.to_sql() would: timestamps as '2022-01-01 12:00:00+00:00', NaN as NULL"""
+
         table = data.SQLTable
-        if (table not in self._tables):                                                  # create database table table
-            sql = (' real, ').join(data.get_ParaNames()) + ' real'
-            sql = 'CREATE TABLE `' + table + '` (IssueTime text, PeriodEnd text, ' + sql + ', PRIMARY KEY(IssueTime, PeriodEnd));'
-            c.execute(sql)
+        if table not in self._columns:
+            if (table in self._tables):
+                c = self._db.cursor()
+                c.execute("SELECT name FROM PRAGMA_TABLE_INFO('" + table + "') WHERE name <> 'PeriodEnd';")
+                colnames = c.fetchall()
+                c.close()
+                self._columns[table] = [''.join(col) for col in colnames]                # tuples in colnames are like (name, ) - and we need get rid of the empty last element
+        create = []
+        if table not in self._columns:                                                   # create database table table
+            if self._storage == 'blob' or self._compact:
+                storage = 'blob' if self._storage == 'blob' else 'compact'
+                scale   = 10**self._quantize if self._quantize > 0 else 0
+                create  = self._createSQL(table, data.get_ParaNames(), scale, storage) + self._registerSQL(table, scale, storage)
+                self._schema[table] = scale
+                if storage == 'blob': self._blobs.add(table)
+            else:
+                sql    = (' real, ').join(data.get_ParaNames()) + ' real'
+                create = [('CREATE TABLE IF NOT EXISTS `' + table + '` (IssueTime text, PeriodEnd text, ' + sql + ', PRIMARY KEY(IssueTime, PeriodEnd));', ())]
+            self._columns[table] = ['IssueTime'] + data.get_ParaNames()
+            myData = data.DataTable
+        elif table in self._blobs:                                                       # blobs describe their columns
             myData = data.DataTable
         else:                                                                            # check wether we have omitted / newfields
-            c.execute("SELECT name FROM PRAGMA_TABLE_INFO('" + table + "') WHERE name <> 'PeriodEnd';")
-            colnames = c.fetchall()
-            cols     = [''.join(col) for col in colnames]                                # tuples in colnames are like (name, ) - and we need get rid of the empty last element
+            cols     = self._columns[table]
             myData   = data.DataTable[data.DataTable.columns.intersection(cols)]
             newCols  = data.DataTable.columns.difference(cols)                           # we load only columns existing in database, but warn on new columns
             if (len(newCols) > 0):
                 print("Warning - New columns found in incoming data for table '" + table + "' at " + data.IssueTime)
                 print(*newCols)
-        
-        c.execute("SELECT IssueTime FROM `" + table + "` WHERE IssueTime='" + data.IssueTime + "';")
-        if (c.fetchone() != None):
-            print("Message - IssueTime " + data.IssueTime + " already exists in table '" + table + "', no data to add to DB")
+
+        epoch  = table in self._schema                                                   # compact or blob table
+        scale  = self._schema.get(table, 0)
+        cols, rows = self._rows(myData, data.IssueTime, epoch, scale)
+        if table in self._blobs:
+            insert = 'INSERT OR IGNORE INTO `' + table + '` (IssueTime, PeriodFirst, PeriodLast, Periods, Codec, Columns, Data) VALUES (?, ?, ?, ?, ?, ?, ?);'
         else:
-            myData['IssueTime'] = data.IssueTime
-            myData.to_sql(table, self._db, if_exists='append')
-            myData.drop(columns=['IssueTime'], inplace=True)                             # else, further storage methods (such as writeCSV) would see this field
-        c.close()
+            insert = 'INSERT OR IGNORE INTO `' + table + '` (`' + '`, `'.join(cols) + '`) VALUES (' + ', '.join(['?']*len(cols)) + ');'
+        latest = []                                                                      # statements and rows for table <table>__latest
+        if cols[0] == 'PeriodEnd':
+            if table not in self._blobs and table + '_PeriodEnd' not in self._indexes:
+                create = create + self._indexSQL(table)
+            create, latest = self._prepareLatest(table, myData, epoch, scale, create)
+            latest = latest + [(self._upsertSQL(table, cols), rows)]
+        if table in self._blobs:
+            rows   = [self._encode(myData, data.IssueTime, scale)]
+        return table, data.IssueTime, create, insert, rows, data, latest
+
+    def _rows(self, myData, issue, epoch, scale):
+        """columns and rows to insert myData into row table (keys as epoch seconds if epoch, values quantized if scale)"""
+
+        index  = myData.index.name if myData.index.name is not None else 'index'
+        cols   = [index] + list(myData) + ['IssueTime']
+        values = myData.to_numpy(dtype=object)
+        isna   = myData.isna().to_numpy()
+        if epoch:                                                                        # compact or blob table
+            if scale:
+                for j, col in enumerate(myData):                                         # all numeric columns: read paths divide all by scale
+                    if pd.api.types.is_numeric_dtype(myData[col]):
+                        values[:, j] = np.round(myData[col].to_numpy(dtype=np.float64)*scale)
+            keys  = ((myData.index - self._EPOCH) // pd.Timedelta(seconds=1)).tolist()
+            issue = self._toEpoch(issue)
+        elif isinstance(myData.index, pd.DatetimeIndex):
+            keys  = [t.isoformat(' ') for t in myData.index.to_pydatetime()]
+        else:
+            keys  = list(myData.index)
+        values[isna] = None
+        rows   = [(key, *row, issue) for key, row in zip(keys, values.tolist())]
+        return cols, rows
+
+    def _prepareLatest(self, table, myData, epoch, scale, create):
+        """statements to create (and fill) table <table>__latest if it doesn't exist yet, or to add new columns of
+        blob tables. Tables with latest forecast of blob tables are filled from getIssues(): returns create and a list
+        of statements and rows for these"""
+
+        latest = table + self._LATEST
+        fill   = []
+        if latest not in self._columns and latest in self._tables:
+            c = self._db.cursor()
+            c.execute("SELECT name FROM PRAGMA_TABLE_INFO('" + latest + "') WHERE name <> 'PeriodEnd';")
+            self._columns[latest] = [''.join(col) for col in c.fetchall()]
+            c.close()
+        if latest not in self._columns:
+            if table in self._blobs:
+                issues = list(self.getIssues(table)) if table in self._tables else []
+                params = list(dict.fromkeys([col for _, issue in issues for col in issue] + list(myData)))
+                create = create + self._latestSQL(table, params, epoch, scale, False)
+                self._columns[latest] = ['IssueTime'] + params
+                for issueTime, issue in issues:
+                    cols, rows = self._rows(issue, issueTime, epoch, scale)
+                    fill.append((self._upsertSQL(table, cols), rows))
+            else:
+                params = [col for col in self._columns[table] if col != 'IssueTime']
+                create = create + self._latestSQL(table, params, epoch, scale, table in self._tables)
+                self._columns[latest] = ['IssueTime'] + params
+        elif table in self._blobs:                                                       # blobs may have new columns
+            for col in myData.columns.difference(self._columns[latest]):
+                create = create + [('ALTER TABLE `' + latest + '` ADD COLUMN `' + col + '`' + (' integer' if scale else ' real') + ';', ())]
+                self._columns[latest].append(col)
+        return create, fill
+
+    @staticmethod
+    def _toEpoch(t):
+        """iso format string to epoch seconds"""
+        return int(datetime.fromisoformat(t).timestamp())
+
+    def _encode(self, myData, issueTime, scale):
+        """row of blob table for myData (DataTable indexed by PeriodEnd): one compressed segment per column,
+        PeriodEnd as int64 epoch seconds, values as float64 or - if scale - as integers round(value*scale), with
+        the smallest integer of their dtype representing NaN. Segments are not shuffled or delta-encoded, so that
+        decompressed segments can be used as numpy arrays directly"""
+
+        keys     = ((myData.index - self._EPOCH) // pd.Timedelta(seconds=1)).to_numpy(dtype=np.int64)
+        segments = [('PeriodEnd', keys, 0)]
+        for col in myData:
+            values = myData[col].to_numpy(dtype=np.float64)
+            if scale:
+                values = np.round(values*scale)
+                finite = values[np.isfinite(values)]
+                dtype  = np.int32 if len(finite) == 0 or np.abs(finite).max() < np.iinfo(np.int32).max else np.int64
+                values = np.where(np.isnan(values), np.iinfo(dtype).min, values).astype(dtype)
+            segments.append((col, values, scale))
+        columns  = []
+        data     = []
+        offset   = 0
+        for col, values, colScale in segments:
+            segment = self._compress(values.tobytes())
+            columns.append([col, values.dtype.str, colScale, offset, len(segment)])
+            data.append(segment)
+            offset  = offset + len(segment)
+        first    = int(keys.min()) if len(keys) > 0 else None
+        last     = int(keys.max()) if len(keys) > 0 else None
+        return (self._toEpoch(issueTime), first, last, len(keys), self._codec, json.dumps(columns), b''.join(data))
+
+    def _compress(self, buffer):
+        if self._codec == 'zstd': return zstandard.ZstdCompressor(level=9).compress(buffer)
+        else:                     return zlib.compress(buffer, 6)
+
+    def _decompress(self, codec, buffer):
+        if codec == 'zstd':
+            if not _zstandard_installed:
+                sys.tracebacklimit=0
+                raise Exception("ERROR --- database contains zstd compressed data, which requires library 'zstandard'; run 'pip install zstandard'")
+            return zstandard.ZstdDecompressor().decompress(buffer)
+        else:
+            return zlib.decompress(buffer)
+
+    def _flush(self):
+        """Write pending data in one transaction"""
+
+        if len(self._pending) == 0:
+            return
+        pending       = self._pending
+        self._pending = []
+        c             = self._db.cursor()
+        try:
+            c.execute("BEGIN IMMEDIATE;")                                                # get write lock now (or wait for it), not half way through
+            if c.execute("PRAGMA schema_version;").fetchone()[0] != self._version:       # schema changed by other process, eg. by migrate()
+                self._reload()
+                pending = [self._prepare(p[5]) for p in pending]
+            for table, issueTime, create, insert, rows, data, latest in pending:
+                for sql, args in create:
+                    c.execute(sql, args)
+                issue = self._toEpoch(issueTime) if table in self._schema else issueTime
+                if c.execute("SELECT 1 FROM `" + table + "` WHERE IssueTime = ? LIMIT 1;", (issue, )).fetchone() is not None:
+                    print("Message - IssueTime " + issueTime + " already exists in table '" + table + "', no data to add to DB")
+                    continue                                                             # issues are stored completely or not at all
+                c.executemany(insert, rows)                                              # one prepared statement for all rows
+                for sql, latestRows in latest:
+                    c.executemany(sql, latestRows)
+            self._version = c.execute("PRAGMA schema_version;").fetchone()[0]
+            c.execute("COMMIT;")
+            for table, issueTime, create, insert, rows, data, latest in pending:
+                if table not in self._tables: self._tables.append(table)
+                if len(latest) > 0 and table + self._LATEST not in self._tables: self._tables.append(table + self._LATEST)
+        except Exception:
+            if self._db.in_transaction: c.execute("ROLLBACK;")
+            self._reload()                                                               # tables may not have been created
+            raise
+        finally:
+            c.close()
 
     def getLastIssueTime(self, table):
+        self._refresh()
+        IssueTime = datetime(1990, 1, 1, 0, 0, 0, 0,timezone.utc)
         if (table in self._tables): 
             c = self._db.cursor()
             c.execute("SELECT max(IssueTime) FROM `" + table + "`;")
             t = c.fetchone()[0]
-            IssueTime = datetime.fromisoformat(t)
-        else:
-            IssueTime = datetime(1990, 1, 1, 0, 0, 0, 0,timezone.utc)
+            c.close()
+            if t is not None and table in self._schema: IssueTime = datetime.fromtimestamp(t, timezone.utc)
+            elif t is not None:                         IssueTime = datetime.fromisoformat(t)
+        for pending in self._pending:                                                    # not yet written, see begin()
+            if pending[0] == table: IssueTime = max(IssueTime, datetime.fromisoformat(pending[1]))
         return(IssueTime)
+
+    def getIssues(self, table, start = None, end = None, columns = None):
+        """generator of (IssueTime, DataTable) for all issues of table with periods in range [start, end], in order of
+        IssueTime. DataTable is indexed by PeriodEnd (UTC) and holds the columns requested (default: all), values
+        as stored (divided by scale for quantized tables). Data not yet written (see begin()) is not included.
+        start, end  limit PeriodEnd (inclusive; strings in iso format, datetime or Timestamps)"""
+
+        self._refresh()
+        if table not in self._tables:
+            return
+        start = None if start is None else self._utc(start)
+        end   = None if end   is None else self._utc(end)
+        if table in self._blobs:
+            yield from self._getBlobIssues(table, start, end, columns)
+            return
+        names = [col[1] for col in self._db.execute("PRAGMA table_info('" + table + "');").fetchall() if col[1] not in ['IssueTime', 'PeriodEnd']]
+        cols  = names if columns is None else [col for col in columns if col in names]
+        scale = self._schema.get(table, 0)
+        where, args = self._where(start, end, table in self._schema)
+        sql   = 'SELECT IssueTime, PeriodEnd' + ''.join(', `' + col + '`' for col in cols) + ' FROM `' + table + '`' + where
+        data  = pd.read_sql_query(sql + ' ORDER BY IssueTime, PeriodEnd;', self._db, params=args)
+        for issueTime, myData in data.groupby('IssueTime', sort=False):
+            if table in self._schema:
+                issueTime = self._fromEpoch(issueTime)
+                index     = pd.to_datetime(myData['PeriodEnd'], unit='s', utc=True)
+            else:
+                index     = pd.to_datetime(myData['PeriodEnd'], utc=True)
+            myData = myData[cols].set_index(pd.DatetimeIndex(index, name='PeriodEnd'))
+            if scale:
+                myData = myData.astype(np.float64)/scale
+            yield issueTime, myData
+
+    def _getBlobIssues(self, table, start, end, columns):
+        """getIssues() for blob table: index range scan on PeriodLast, then per issue only the segments of the columns
+        requested are read from the blob (with Python >= 3.11 without reading the whole blob) and decompressed"""
+
+        where, args = self._where(start, end, True, 'PeriodLast', 'PeriodFirst')
+        issues = self._db.execute('SELECT IssueTime, Codec, Columns FROM `' + table + '`' + where + ' ORDER BY IssueTime;', args).fetchall()
+        for issueTime, codec, directory in issues:
+            segments = {col[0]: col[1:] for col in json.loads(directory)}
+            if hasattr(self._db, 'blobopen'):
+                blob = self._db.blobopen(table, 'Data', issueTime, readonly=True)      # IssueTime is rowid
+            else:
+                blob = memoryview(self._db.execute('SELECT Data FROM `' + table + '` WHERE IssueTime = ?;', (issueTime, )).fetchone()[0])
+
+            def segment(col):
+                dtype, scale, offset, length = segments[col]
+                values = np.frombuffer(self._decompress(codec, blob[offset:offset + length]), dtype=dtype)
+                if scale:
+                    values = np.where(values == np.iinfo(values.dtype).min, np.nan, values/scale)
+                return values
+
+            keys  = segment('PeriodEnd')
+            mask  = np.ones(len(keys), dtype=bool)
+            if start is not None: mask = mask & (keys >= int(start.timestamp()))
+            if end   is not None: mask = mask & (keys <= int(end.timestamp()))
+            cols  = [col for col in (segments if columns is None else columns) if col in segments and col != 'PeriodEnd']
+            data  = {col: segment(col)[mask] for col in cols}
+            if not isinstance(blob, memoryview): blob.close()
+            yield self._fromEpoch(issueTime), pd.DataFrame(data, index=pd.DatetimeIndex(pd.to_datetime(keys[mask], unit='s', utc=True), name='PeriodEnd'))
+
+    def getData(self, table, start = None, end = None, columns = None, mode = 'latest'):
+        """DataTable of table for periods in range [start, end] (inclusive; strings in iso format, datetime or Timestamps),
+        indexed by PeriodEnd (UTC), with column IssueTime (Timestamp) and the columns requested (default: all)
+        mode    'latest'        latest forecast for each period, from table <table>__latest
+                'all'           all forecasts, ordered by PeriodEnd and IssueTime
+                'horizon=<h>'   for each period, the latest forecast issued at least h hours before PeriodEnd"""
+
+        horizon = None
+        if mode.startswith('horizon='):
+            horizon = pd.Timedelta(hours=float(mode[8:]))
+        elif mode not in ['latest', 'all']:
+            sys.tracebacklimit=0
+            raise Exception("ERROR --- getData(): mode must be 'latest', 'all' or 'horizon=<hours>'")
+        self._refresh()
+        start = None if start is None else self._utc(start)
+        end   = None if end   is None else self._utc(end)
+        if mode == 'latest' and table + self._LATEST in self._tables:
+            return self._getLatest(table, start, end, columns)
+        datas = []                                                                       # no table <table>__latest: see _prepareLatest()
+        for issueTime, myData in self.getIssues(table, start, end, columns):
+            myData.insert(0, 'IssueTime', pd.Timestamp(issueTime))
+            if horizon is not None:
+                myData = myData[myData.index - myData['IssueTime'] >= horizon]
+            datas.append(myData)
+        if len(datas) == 0:
+            return pd.DataFrame(columns=['IssueTime'] + ([] if columns is None else list(columns)), index=pd.DatetimeIndex([], tz='UTC', name='PeriodEnd'))
+        data  = pd.concat(datas).reset_index().sort_values(['PeriodEnd', 'IssueTime'], kind='stable').set_index('PeriodEnd')
+        if mode != 'all':
+            data = data[~data.index.duplicated(keep='last')]
+        return data
+
+    def _getLatest(self, table, start, end, columns):
+        """getData(mode='latest'): range scan on table <table>__latest"""
+
+        latest = table + self._LATEST
+        names  = [col[1] for col in self._db.execute("PRAGMA table_info('" + latest + "');").fetchall() if col[1] not in ['IssueTime', 'PeriodEnd']]
+        cols   = names if columns is None else [col for col in columns if col in names]
+        epoch  = table in self._schema
+        scale  = self._schema.get(table, 0)
+        where, args = self._where(start, end, epoch)
+        sql    = 'SELECT PeriodEnd, IssueTime' + ''.join(', `' + col + '`' for col in cols) + ' FROM `' + latest + '`' + where
+        data   = pd.read_sql_query(sql + ' ORDER BY PeriodEnd;', self._db, params=args)
+        for key in ['PeriodEnd', 'IssueTime']:
+            data[key] = pd.to_datetime(data[key], unit='s', utc=True) if epoch else pd.to_datetime(data[key], utc=True)
+        if scale:
+            data[cols] = data[cols].astype(np.float64)/scale
+        return data.set_index('PeriodEnd')
+
+    def _where(self, start, end, epoch, low = 'PeriodEnd', high = 'PeriodEnd'):
+        """WHERE clause (and arguments) for periods in range [start, end]: low >= start and high <= end"""
+
+        where = []
+        args  = []
+        for col, op, t in [(low, ' >= ?', start), (high, ' <= ?', end)]:
+            if t is not None:
+                where.append(col + op)
+                args.append(int(t.timestamp()) if epoch else t.isoformat(' '))
+        return (' WHERE ' + ' AND '.join(where) if len(where) > 0 else ''), args
+
+    @staticmethod
+    def _fromEpoch(t):
+        """epoch seconds to iso format string, as Forecast.IssueTime"""
+        return datetime.fromtimestamp(t, timezone.utc).isoformat(' ')
+
+    @staticmethod
+    def _utc(t):
+        t = pd.Timestamp(t)
+        return t.tz_localize('UTC') if t.tzinfo is None else t.tz_convert('UTC')
+
+    def migrate(self, table, quantize = 0, chunkSize = 100000, storage = 'compact'):
+        """Convert table to compact schema or - with storage = 'blob' - to blob storage (see class description), with
+        values stored as integers if quantize > 0. Rows are streamed through a second connection into a new table, in
+        transactions of chunkSize rows, so that other processes can keep writing to the database. Rows added meanwhile
+        (with a rowid beyond those streamed, whatever their IssueTime) are copied when the new table replaces the old one,
+        in a final short transaction. Returns number of rows converted"""
+
+        if table in self._schema:
+            print("Message - table '" + table + "' already uses " + ('blob storage' if table in self._blobs else 'compact schema'))
+            return 0
+        self._flush()
+        cols     = [col[1] for col in self._db.execute("PRAGMA table_info('" + table + "');").fetchall() if col[1] not in ['IssueTime', 'PeriodEnd']]
+        scale    = 10**quantize if quantize > 0 else 0
+        new      = table + '__compact'
+        select   = 'SELECT IssueTime, PeriodEnd, `' + '`, `'.join(cols) + '` FROM `' + table + '`'
+        if storage == 'blob':
+            insert = 'INSERT OR IGNORE INTO `' + new + '` (IssueTime, PeriodFirst, PeriodLast, Periods, Codec, Columns, Data) VALUES (?, ?, ?, ?, ?, ?, ?);'
+        else:
+            insert = 'INSERT OR IGNORE INTO `' + new + '` (IssueTime, PeriodEnd, `' + '`, `'.join(cols) + '`) VALUES (' + ', '.join(['?']*(len(cols) + 2)) + ');'
+        epochs   = {}                                                                    # IssueTime, PeriodEnd strings repeat a lot ...
+
+        def convert(rows):
+            result = []
+            if storage == 'blob':                                                        # rows of complete issues, ordered by IssueTime, PeriodEnd
+                for issue, group in itertools.groupby(rows, key=lambda row: row[0]):
+                    group  = list(group)
+                    index  = pd.DatetimeIndex(pd.to_datetime([row[1] for row in group], utc=True), name='PeriodEnd')
+                    myData = pd.DataFrame([row[2:] for row in group], index=index, columns=cols, dtype=np.float64)
+                    result.append(self._encode(myData, issue, scale))
+                return result
+            for row in rows:
+                keys = []
+                for t in row[:2]:
+                    if t not in epochs: epochs[t] = self._toEpoch(t)
+                    keys.append(epochs[t])
+                if scale:
+                    result.append((*keys, *[round(v*scale) if isinstance(v, (int, float)) else v for v in row[2:]]))
+                else:
+                    result.append((*keys, *row[2:]))
+            return result
+
+        c        = self._db.cursor()
+        c.execute("DROP TABLE IF EXISTS `" + new + "`;")                                 # left-over of interrupted migration
+        for sql, args in self._createSQL(new, cols, scale, storage)[:1]:
+            c.execute(sql, args)
+        reader   = sqlite3.connect(self.dbName, isolation_level=None)
+        reader.execute("BEGIN;")                                                         # same snapshot for max(rowid) and rows streamed
+        maxRowid = reader.execute("SELECT max(rowid) FROM `" + table + "`;").fetchone()[0] or 0
+        rows     = reader.execute(select + ' ORDER BY IssueTime, PeriodEnd;')
+        cnt      = 0
+        carry    = []                                                                    # blob: rows of last issue in chunk, may continue in next chunk
+        while True:
+            chunk = rows.fetchmany(chunkSize)
+            if len(chunk) == 0:
+                break
+            cnt   = cnt + len(chunk)
+            if storage == 'blob':
+                chunk = carry + chunk
+                cut   = len(chunk)
+                while cut > 0 and chunk[cut - 1][0] == chunk[-1][0]:
+                    cut = cut - 1
+                carry = chunk[cut:]
+                chunk = chunk[:cut]
+                if len(chunk) == 0:
+                    continue
+            c.execute("BEGIN IMMEDIATE;")
+            c.executemany(insert, convert(chunk))
+            c.execute("COMMIT;")
+            if len(epochs) > 1000000: epochs.clear()
+        reader.close()
+        try:
+            c.execute("BEGIN IMMEDIATE;")
+            chunk = c.execute(select + ' WHERE rowid > ?;', (maxRowid, )).fetchall()      # rows added while migrating (new rowids are max(rowid) + 1)
+            cnt   = cnt + len(chunk)
+            chunk = sorted(carry + chunk, key=lambda row: (row[0], row[1]))
+            c.executemany(insert, convert(chunk))
+            c.execute("DROP TABLE `" + table + "`;")
+            c.execute("ALTER TABLE `" + new + "` RENAME TO `" + table + "`;")
+            for sql, args in self._createSQL(table, cols, scale, storage)[1:] + self._registerSQL(table, scale, storage):
+                c.execute(sql, args)
+            c.execute("DROP TABLE IF EXISTS `" + table + self._LATEST + "`;")            # blob: re-created with next write, see _prepareLatest()
+            if storage != 'blob':
+                for sql, args in self._indexSQL(table) + self._latestSQL(table, cols, True, scale, True):
+                    c.execute(sql, args)
+            c.execute("COMMIT;")
+            self._reload()
+        except Exception:
+            if self._db.in_transaction: c.execute("ROLLBACK;")
+            self._reload()
+            raise
+        finally:
+            c.close()
+        return cnt
@@ -17,10 +17,14 @@ along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
 import requests
 import os
+import json
+import time
+import hashlib
+import struct
+import zlib
 import xml.etree.ElementTree as ET
-import elementpath
 import gzip
-from zipfile import ZipFile
+from zipfile import ZipFile, BadZipFile
 from io      import BytesIO
 from bs4     import BeautifulSoup
 
@@ -34,6 +38,12 @@ from .forecast import Forecast
 class DWDForecast(Forecast):
     """Class for downloading and parsing DWD MOSMIX weather forecasts"""
 
+    _KEEP     = ['TTT', 'Td', 'PPPP', 'FF', 'Neff', 'Rad1h', 'RRad1']                    # elementNames kept by convertDT() with [DWD] dropWeather
+    _NAME     = re.compile(rb'<kml:name>([^<]*)</kml:name>')                             # station name of a placemark
+    _RETRIES  = 3                                                                        # download attempts for MOSMIX_S
+    _CHUNK    = 1 << 18                                                                  # download chunk size
+    _FORECAST = re.compile(rb'<dwd:Forecast dwd:elementName="([^"]+)">\s*<dwd:value>([^<]*)</dwd:value>')
+
     def __init__(self, config):
         """Initialize DWDForecast
         config      configparser object with section [DWD]"""
@@ -45,24 +55,32 @@ class DWDForecast(Forecast):
                                'kml' : 'http://www.opengis.net/kml/2.2', 
                                'atom': 'http://www.w3.org/2005/Atom', 
                                'xal' : 'urn:oasis:names:tc:ciq:xsdschema:xAL:2.0' }
-        self._kml          = None                                                        # xml with wheather data as ElementTree
+        self._kml          = None                                                        # xml source with wheather data (bytes), parsed by parseKML()
         self.kmlName       = None                                                        # used for .csv file name determination
         self.SQLTable      = 'dwd'                                                       # which SQL table name is this data stored to (see DBRepository.loadData())
         self.storePath     = self.config['DWD'].get('storePath')
+        self._parsed       = False                                                       # DataTable already populated (see readMOSMIX_S)
+        self.modified      = True                                                        # False if download is unchanged since last run (see _DownloadCache)
+        self._cache        = None
+        if self.config['DWD'].getboolean('downloadCache', False):
+            cachePath      = self.config['DWD'].get('cachePath', self.storePath)
+            self._cache    = _DownloadCache(cachePath, self.config['DWD'].getboolean('force', False))
 
 
-    def getForecast_DWD_L(self):                                                         # get forecast from DWD web page --> self.kml as XML elementtree
-        """Get newest MOSMIX_L forecast (file for selected station); store file as .zip"""
+    def getForecast_DWD_L(self, station = None):                                         # get forecast from DWD web page --> self._kml as xml source
+        """Get newest MOSMIX_L forecast (file for selected station); store file as .zip
+        station     DWD station, defaults to [DWD] DWDStation"""
 
         baseurl = self.config['DWD'].get('DWD_URL_L', 'https://opendata.dwd.de/weather/local_forecasts/mos/MOSMIX_L/single_stations/')        # station based 'long', six-hourly forecast
-        station = self.config['DWD'].get('DWDStation')
+        if station is None:
+            station = self.config['DWD'].get('DWDStation')
         url     = baseurl + station + '/kml/MOSMIX_L_LATEST_' + station + '.kmz'
         try:
-            req     = requests.get(url)                                                  # get .kmz file
-            if (req.reason != 'OK'):
-                sys.tracebacklimit=0
-                raise Exception("ERROR --- Can't download file '" + url + "' --- Reason: " + req.reason)
-            zipfile = ZipFile(BytesIO(req.content))                                      # .kmz is zip-compressed, so read content as bytestream into ZipFile
+            content = self._download(url)                                                # get .kmz file
+            if content is None:                                                          # unchanged since last run
+                print("Message - MOSMIX_L for station " + station + " not modified since last download")
+                return
+            zipfile = ZipFile(BytesIO(content))                                          # .kmz is zip-compressed, so read content as bytestream into ZipFile
             names   = zipfile.namelist()                                                 # find file names in .kmz file
             if (len(names) != 1):                                                        # we expect exactly one file, else we don't know what to do
                 sys.tracebacklimit=0
@@ -70,7 +88,7 @@ class DWDForecast(Forecast):
             self.kmlName = names[0]
             kmlfile      = zipfile.open(names[0])
             kml          = kmlfile.read()                                                # xml source as a string
-            self._kml    = ET.fromstring(kml)
+            self._kml    = kml
             kmlfile.close()
             if (self.config['DWD'].getboolean('storeKMZ', False)):
                 gzfile   = gzip.open(self.storePath + '/' + self.kmlName + '.gz', 'wb')
@@ -81,19 +99,23 @@ class DWDForecast(Forecast):
         except Exception as e:
             print ("Warning - getForecast_DWD_L: " + str(e))
 
-    def getForecast_DWD_S(self):
-        """Get newest MOSMIX_S forecast (global file), extract data for selected station; 
-        store extracted file as xxx_<station>.kml.gz"""
+    def getForecast_DWD_S(self, stations = None):
+        """Get newest MOSMIX_S forecast (global file), extract data for selected station(s) in a single pass
+        (see extractMOSMIX_S); store extracted files as xxx_<station>.kml.gz
+        stations    list of DWD stations, defaults to [DWD] DWDStation
         
-        url     = self.config['DWD'].get('DWD_URL_S', 'https://opendata.dwd.de/weather/local_forecasts/mos/MOSMIX_S/all_stations/kml/')
-        station = self.config['DWD'].get('DWDStation')
+        self is populated with data of first station; returns { station: DWDForecast } for all stations found"""
+        
+        url      = self.config['DWD'].get('DWD_URL_S', 'https://opendata.dwd.de/weather/local_forecasts/mos/MOSMIX_S/all_stations/kml/')
+        if stations is None:
+            stations = [self.config['DWD'].get('DWDStation')]
+        forecasts = {}
         try:
             req      = requests.get(url)
             if (req.reason != 'OK'):
                 sys.tracebacklimit=0
                 raise Exception("ERROR --- Can't open page '" + url + "' --- Reason: " + req.reason)
-            page     = requests.get(url).text
-            soup     = BeautifulSoup(page, 'html.parser')
+            soup     = BeautifulSoup(req.text, 'html.parser')
             files    = [url + '/' + node.get('href') for node in soup.find_all('a') if node.get('href').endswith('kmz')]
             if (len(files) < 2):
                 sys.tracebacklimit=0
@@ -102,63 +124,212 @@ class DWDForecast(Forecast):
             myLocal  = self.storePath + os.path.basename(myRemote)                       # where to store downloaded file
             if (os.path.isfile(myLocal)):
                 print('Message - File ' + myLocal + ' already exists, not re-downloaded')
+                self.modified = False
             else:
                 if not self.config['DWD'].getboolean('keepKMZ_S', False):                # delete local MOSMIX_S_* files
                     for f in os.listdir(self.storePath):
-                        if re.search(r'^MOSMIX_S_', f):
+                        if re.search(r'^MOSMIX_S_', f) and f != os.path.basename(myLocal) + '.part':   # keep partial download of this file, to be resumed
                             f_path = self.storePath + os.path.basename(f)
                             if os.path.isfile(f_path):
                                 os.remove(f_path)
-                kmlName = os.path.basename(myLocal)
-                kmlName = re.sub(r'\.kmz', '.kml', kmlName)
-                req     = requests.get(myRemote)
-                if (req.reason != 'OK'):
-                    sys.tracebacklimit=0
-                    raise Exception("ERROR --- Can't download file '" + myRemote + "' --- Reason: " + req.reason)
-                open(myLocal, 'wb').write(req.content)
-
-                extract = 1
-                kml     = ''
-                zipfile = ZipFile(myLocal)
-                kmlfile = zipfile.open(kmlName, 'r')
-                for line in kmlfile:
-                    if (extract == 1):
-                        kml += line.decode('UTF-8')
-                        if (line.find(rb'</kml:ExtendedData>') > 0):
-                            extract = 0
-                    elif(extract == 2):
-                        kml += line.decode('UTF-8')
-                        if (line.find(rb'</kml:Placemark>') > 0):
-                            extract = 3
-                            break
-                    else:
-                        if (line.find(('<kml:name>' + station + '</kml:name>').encode()) > 0):
-                            kml += '        <kml:Placemark>'
-                            kml += line.decode('UTF-8')
-                            extract = 2
-                kml += '   </kml:Document>\n</kml:kml>'
-                kmlfile.close()
-                if (extract != 3):
-                    sys.tracebacklimit=0
-                    raise Exception("ERROR --- Station " + station + " not found")
-                self._kml     = ET.fromstring(kml)
-                self.SQLTable = 'dwd_s'
-
-                kmlName = re.sub(r'\.kml', '_' + station + '.kml', kmlName)
-                self.csvName = re.sub(r'\.kml$', '.csv.gz', kmlName)
-                if (self.config['DWD'].getboolean('storeKMZ', False)):
-                    self.kmlName = kmlName
-                    kmlName = self.storePath + '/' + kmlName + '.gz'
-                    if (not os.path.isfile(kmlName)):                                    # don't over-write pre-existing file
-                        gzfile = gzip.open(kmlName, 'wt')
-                        gzfile.write(kml)
-                        gzfile.close()
+                forecasts = self._downloadMOSMIX_S(myRemote, myLocal, stations)
 
         except Exception as e:
             print ("Warning - getForecast_DWD_S: " + str(e))
+        return forecasts
+
+    def readMOSMIX_S(self, file, stations):
+        """Extract data of 'stations' from (global) MOSMIX_S .kmz file (see extractMOSMIX_S)
+        self is populated with data of first station; returns { station: DWDForecast } for all stations found"""
+
+        with ZipFile(file) as zipfile:
+            names = zipfile.namelist()
+            if (len(names) != 1):
+                sys.tracebacklimit=0
+                raise Exception("ERROR --- " + str(len(names)) + " files found inside '" + file + "', should be == 1")
+            with zipfile.open(names[0], 'r') as kmlfile:                                 # decompressed while reading
+                extract = self.extractMOSMIX_S(kmlfile, stations, self._elements())
+        return self._stationForecasts(names[0], stations, *extract)
+
+    def _downloadMOSMIX_S(self, url, file, stations):
+        """Download (global) MOSMIX_S file 'url' to 'file' and extract data of 'stations' while downloading
+        (see _ZipStream). Data is streamed to <file>.part, which is renamed to 'file' only after its size
+        and CRC are checked. Interrupted downloads are resumed (HTTP Range), also in a later run; corrupt
+        downloads are restarted. Other errors (eg. parsing) are raised at once, keeping <file>.part.
+        Returns as readMOSMIX_S()"""
+
+        part    = file + '.part'
+        timeout = self.config['DWD'].getfloat('timeout', 60)                             # [sec], for connecting and between received data
+        for attempt in range(1, self._RETRIES + 1):
+            try:
+                kmlfile = _ZipStream(self._resumeDownload(url, part, timeout))
+                try:
+                    extract = self.extractMOSMIX_S(kmlfile, stations, self._elements())
+                    kmlfile.drain()                                                      # complete download, CRC of all data
+                finally:
+                    kmlfile.close()
+                with ZipFile(part) as zipfile:
+                    info = zipfile.infolist()
+                if len(info) != 1 or info[0].filename != kmlfile.name or info[0].CRC != kmlfile.crc or info[0].file_size != kmlfile.size:
+                    sys.tracebacklimit=0
+                    raise BadZipFile("ERROR --- integrity check failed for '" + url + "'")
+                os.replace(part, file)
+                break
+            except requests.exceptions.RequestException as e:                           # network issue: resume
+                error = e
+            except (BadZipFile, zlib.error) as e:                                        # corrupt data: start over (other errors, eg. parsing, propagate)
+                error = e
+                if os.path.isfile(part):
+                    os.remove(part)
+            if attempt == self._RETRIES:
+                sys.tracebacklimit=0
+                raise Exception("ERROR --- Can't download file '" + url + "' --- Reason: " + str(error))
+            print("Warning - download of " + os.path.basename(url) + " failed (" + str(error) + "), retrying")
+        return self._stationForecasts(kmlfile.name, stations, *extract)
+
+    def _resumeDownload(self, url, part, timeout):
+        """Generator of compressed data of 'url': content of partially downloaded file 'part' (if any) first,
+        then remaining data, which is appended to 'part' as it arrives"""
+
+        done    = os.path.getsize(part) if os.path.isfile(part) else 0
+        headers = { 'Range': 'bytes=' + str(done) + '-' } if done > 0 else {}
+        req     = requests.get(url, headers=headers, stream=True, timeout=timeout)
+        with req:
+            if req.status_code == 416:                                                   # range not satisfiable: download is complete
+                total = done
+            elif req.status_code == 206:
+                total = int(req.headers['Content-Range'].split('/')[-1])
+            elif req.reason == 'OK':                                                     # server ignored range, start over
+                done  = 0
+                total = int(req.headers.get('Content-Length', -1))
+            else:
+                sys.tracebacklimit=0
+                raise Exception("ERROR --- Can't download file '" + url + "' --- Reason: " + req.reason)
+            if done > 0:
+                with open(part, 'rb') as f:
+                    for chunk in iter(lambda: f.read(self._CHUNK), b''):
+                        yield chunk
+            if done < total or total < 0:
+                with open(part, 'ab' if done > 0 else 'wb') as f:
+                    for chunk in req.iter_content(self._CHUNK):
+                        f.write(chunk)
+                        done = done + len(chunk)
+                        yield chunk
+            if total >= 0 and done != total:
+                raise requests.exceptions.ChunkedEncodingError("incomplete download, " + str(done) + " of " + str(total) + " bytes")
+
+    def _stationForecasts(self, kmlName, stations, issueTime, periodEnd, data, header):
+        """DWDForecast objects from result of extractMOSMIX_S(); see readMOSMIX_S()"""
+
+        missing   = [station for station in stations if station not in data]
+        if len(missing) > 0:
+            print("Warning - readMOSMIX_S: station(s) " + ', '.join(missing) + " not found")
+        forecasts = {}
+        for station in stations:
+            if station not in data:
+                continue
+            myWeather                      = self if len(forecasts) == 0 else DWDForecast(self.config)
+            values, placemark              = data[station]
+            myWeather.IssueTime            = issueTime
+            myWeather.DataTable            = pd.DataFrame(values, index=periodEnd)
+            myWeather.DataTable.index.name = 'PeriodEnd'                                 # Time is in UTC
+            myWeather.SQLTable             = 'dwd_s'
+            myWeather._parsed              = True                                        # nothing left to do for parseKML()
+            stationName                    = re.sub(r'\.kml', '_' + station + '.kml', kmlName)
+            myWeather.csvName              = re.sub(r'\.kml$', '.csv.gz', stationName)
+            if (self.config['DWD'].getboolean('storeKMZ', False)):
+                myWeather.kmlName = stationName
+                stationFile       = self.storePath + '/' + stationName + '.gz'
+                if (not os.path.isfile(stationFile)):                                    # don't over-write pre-existing file
+                    with gzip.open(stationFile, 'wb') as gzfile:                         # station extract, as readable by readKML()
+                        gzfile.write(header + placemark + b'\n    </kml:Document>\n</kml:kml>\n')
+            forecasts[station] = myWeather
+        if len(forecasts) == 0:
+            sys.tracebacklimit=0
+            raise Exception("ERROR --- Station(s) " + ', '.join(stations) + " not found")
+        return forecasts
+
+    def extractMOSMIX_S(self, kmlfile, stations, elements = None, chunkSize = 1 << 20):
+        """Single pass over a MOSMIX .kml stream (binary file object, eg. opened from .kmz), extracting 
+        data of all 'stations' at once. Memory is bounded to about one chunk plus one station, however 
+        large the file. Reading stops once all stations are found. Only 'elements' (list of elementName,
+        default: all) are converted to float.
+
+        Returns IssueTime, PeriodEnd (DatetimeIndex), { station: ({ elementName: np.array }, placemark) }
+        and the file header up to the first placemark. 'placemark' is the raw xml of the station"""
 
+        wanted    = set(stations)
+        data      = {}
+        header    = None
+        buf       = b''
+        pos       = 0
+        while len(data) < len(wanted):
+            chunk = kmlfile.read(chunkSize)
+            buf   = buf[pos:] + chunk                                                    # drop processed data
+            pos   = 0
+            if header is None:
+                first = buf.find(b'<kml:Placemark>')
+                if first < 0:
+                    if len(chunk) == 0:
+                        break
+                    continue
+                header    = buf[:first]
+                issueTime = re.search(rb'<dwd:IssueTime>([^<]+)</dwd:IssueTime>', header).group(1).decode()
+                issueTime = re.sub('T', ' ', issueTime)
+                issueTime = re.sub('.000Z', '+00:00', issueTime)                         # same format as in parseKML()
+                periodEnd = pd.DatetimeIndex([t.decode() for t in re.findall(rb'<dwd:TimeStep>([^<]+)</dwd:TimeStep>', header)])
+                pos       = first
+            while True:
+                start = buf.find(b'<kml:Placemark>', pos)
+                if start < 0:
+                    pos = max(pos, len(buf) - len(b'<kml:Placemark>'))                   # keep a possibly split tag
+                    break
+                end   = buf.find(b'</kml:Placemark>', start)
+                if end < 0:
+                    pos = start                                                          # incomplete placemark, read more
+                    break
+                end   = end + len(b'</kml:Placemark>')
+                name  = self._NAME.search(buf, start, end)
+                if name is not None and name.group(1).decode() in wanted:
+                    placemark = buf[start:end]
+                    values    = { param.decode() : self._toFloat(valStr.decode()) for param, valStr in self._FORECAST.findall(placemark)
+                                  if elements is None or param.decode() in elements }
+                    data[name.group(1).decode()] = (values, b'        ' + placemark)
+                pos   = end
+            if len(chunk) == 0:
+                break
+        if header is None:
+            sys.tracebacklimit=0
+            raise Exception("ERROR --- no MOSMIX data found")
+        return issueTime, periodEnd, data, header
 
-    def readKML(self, file):                                                             # read forecast from .kml file --> self.kml as XML elementtree
+    @staticmethod
+    def _toFloat(valStr):
+        """MOSMIX value string (whitespace separated, missing values as '-') to float array"""
+        if valStr is None:
+            return np.empty(0)
+        return np.array(['nan' if token == '-' else token for token in valStr.split()], dtype=np.float64)
+
+    def _elements(self):
+        """elementNames to be parsed: those used by convertDT() with [DWD] dropWeather, else all (None)"""
+        if self.config['DWD'].getboolean('dropWeather', True):
+            return self._KEEP
+        return None
+
+    def _download(self, url):
+        """Content of 'url'; with [DWD] downloadCache, None if unchanged since last download"""
+
+        if self._cache is not None:
+            content       = self._cache.get(url)
+            self.modified = content is not None
+            return content
+        req = requests.get(url)
+        if (req.reason != 'OK'):
+            sys.tracebacklimit=0
+            raise Exception("ERROR --- Can't download file '" + url + "' --- Reason: " + req.reason)
+        return req.content
+
+    def readKML(self, file):                                                             # read forecast from .kml file --> self._kml as xml source
         """Read MOSMIX_L file and make XML content available internally (to be parsed with parseKML)
         .xml and .kml files are considered XML (possibly .gz-ipped), 
         .zip and .kmz are considered .zip files containing one .kml"""
@@ -170,12 +341,13 @@ class DWDForecast(Forecast):
                 if (len(names) != 1):
                     sys.tracebacklimit=0
                     raise Exception("ERROR --- " + str(len(names)) + " files found inside '" + file + "', should be == 1")
-                kml = zipfile.open(names[0]).read()
-                self._kml = ET.fromstring(kml)
+                self._kml = zipfile.open(names[0]).read()
             elif (bool(re.search(r'\.(kml|xml)\.gz$', file, re.IGNORECASE))):
-                self._kml = ET.parse(gzip.open(file, 'r'))
+                with gzip.open(file, 'rb') as f:
+                    self._kml = f.read()
             elif (bool(re.search(r'\.(kml|xml)$', file, re.IGNORECASE))):
-                self._kml = ET.parse(file)
+                with open(file, 'rb') as f:
+                    self._kml = f.read()
             else:
                 sys.tracebacklimit=0
                 raise Exception("ERROR --- unknown file type for weather file " + file)
@@ -186,28 +358,43 @@ class DWDForecast(Forecast):
         except Exception as e:
             print ("readKML: " + str(e))
 
-    def parseKML(self):                                                                  # parse XML to pandas self.DataTable
-        """Parse XML content of a MOSMIX .kml file"""
+    def readArchive(self, issueTime, name, table):
+        """Take MOSMIX data of one issue, as read from Archive (see Archive.read()), in place of readKML() and parseKML()"""
 
-        success = False
-        if self._kml is not None:
+        self.IssueTime = issueTime
+        self.DataTable = table
+        self.csvName   = name
+        self.kmlName   = re.sub(r'\.csv\.gz$', '.kml', name)
+        if name.startswith('MOSMIX_S'):
+            self.SQLTable = 'dwd_s'
+        self._parsed   = True                                                            # nothing left to do for parseKML()
+
+    def parseKML(self, elements = None):                                                 # parse XML to pandas self.DataTable
+        """Parse XML content of a MOSMIX .kml file (first placemark), in a single streaming pass
+        elements    list of elementNames to extract, defaults to what convertDT() needs (see _elements())"""
+
+        success = self._parsed
+        if self._kml is not None and not self._parsed:
             try:
-                self.IssueTime = elementpath.select(self._kml, '//dwd:IssueTime/text()', self._kmlNS)[0]
-                self.IssueTime = re.sub('T', ' ', self.IssueTime)
-                self.IssueTime = re.sub('.000Z', '+00:00', self.IssueTime)               # now we have the same format as pandas will eventually output for time steps
-                PeriodEnd      = elementpath.select(self._kml, '//dwd:ForecastTimeSteps/dwd:TimeStep/text()', self._kmlNS)
-                ParaNames      = elementpath.select(self._kml, '//dwd:Forecast/@dwd:elementName', self._kmlNS)
-                valStrArray    = elementpath.select(self._kml, '//dwd:Forecast/dwd:value', self._kmlNS)
-                weatherData    = {}
-                if (len(ParaNames) != len(valStrArray)):
-                    sys.tracebacklimit=0
-                    raise Exception("ERROR --- length mismatch in parseKML()")
-                for i, param in enumerate(ParaNames):
-                    valStr = valStrArray[i].text.replace('-', 'nan')
-                    valArr = valStr.split()
-                    valArr = np.array(valArr)
-                    valArr = np.asarray(valArr, dtype=float)
-                    weatherData.update({ param : valArr })
+                if elements is None:
+                    elements = self._elements()
+                dwd         = '{' + self._kmlNS['dwd'] + '}'
+                kml         = '{' + self._kmlNS['kml'] + '}'
+                PeriodEnd   = []
+                weatherData = {}
+                for event, elem in ET.iterparse(BytesIO(self._kml), events=('end', )):
+                    if elem.tag == dwd + 'Forecast':
+                        param = elem.get(dwd + 'elementName')
+                        if elements is None or param in elements:
+                            weatherData[param] = self._toFloat(elem.find(dwd + 'value').text)
+                        elem.clear()                                                     # free memory of value strings
+                    elif elem.tag == dwd + 'TimeStep':
+                        PeriodEnd.append(elem.text)
+                    elif elem.tag == dwd + 'IssueTime':
+                        self.IssueTime = re.sub('T', ' ', elem.text)
+                        self.IssueTime = re.sub('.000Z', '+00:00', self.IssueTime)       # now we have the same format as pandas will eventually output for time steps
+                    elif elem.tag == kml + 'Placemark':                                  # we only expect one station
+                        break
                 self.DataTable            = pd.DataFrame(weatherData, index=pd.DatetimeIndex(PeriodEnd))
                 self.DataTable.index.name = 'PeriodEnd'                                  # Time is in UTC
                 success = True
@@ -223,7 +410,7 @@ class DWDForecast(Forecast):
         if dropWeather:
             drop    = []
             for field in list(self.DataTable):
-                if field not in ['TTT', 'Td', 'PPPP', 'FF', 'Neff', 'Rad1h', 'RRad1']: 
+                if field not in self._KEEP: 
                     drop.append(field)
             self.DataTable.drop(drop, axis=1, inplace=True)                              # drop columns which are either not useful or non-float
         self.DataTable.rename(columns = {'TTT'  : 'temp_air', 
@@ -237,4 +424,138 @@ class DWDForecast(Forecast):
         if 'RRad1' in self.DataTable:
             self.DataTable.rename(columns = {'RRad1': 'kt'}, inplace=True)
             self.DataTable['kt'] = self.DataTable['kt']/100                              # convert to RRad1 to kt (/100)
-        return()
\ No newline at end of file
+        return()
+
+class _DownloadCache():
+    """Conditional downloads: validators (ETag, Last-Modified) of the last download of each url are kept in 
+    <path>/dwd_downloads.json, together with a local copy of the downloaded file. Requests are sent with 
+    If-None-Match / If-Modified-Since; on '304 - Not Modified' (or identical content, if the server 
+    doesn't support validators) the download is reported as unchanged. With 'force', the local copy is 
+    returned instead. Entries not used for _MAX_AGE seconds are evicted."""
+
+    _INDEX   = 'dwd_downloads.json'
+    _MAX_AGE = 7*24*3600                                                                 # evict after a week
+
+    def __init__(self, path, force = False):
+        self.path  = path
+        self.force = force
+        self._file = os.path.join(path, self._INDEX)
+        try:
+            with open(self._file, 'r') as f:
+                self._index = json.load(f)
+        except Exception:                                                                # no cache yet
+            self._index = {}
+
+    def get(self, url):
+        """Returns content; None if unchanged and not 'force'"""
+
+        entry   = self._index.get(url)
+        headers = {}
+        if entry is not None and os.path.isfile(entry['file']):
+            if entry.get('etag')         is not None: headers['If-None-Match']     = entry['etag']
+            if entry.get('lastModified') is not None: headers['If-Modified-Since'] = entry['lastModified']
+        else:
+            entry   = None
+        req     = requests.get(url, headers=headers)
+        if req.status_code == 304 and entry is not None:
+            content = None
+        elif (req.reason != 'OK'):
+            sys.tracebacklimit=0
+            raise Exception("ERROR --- Can't download file '" + url + "' --- Reason: " + req.reason)
+        else:
+            content = req.content
+            sha1    = hashlib.sha1(content).hexdigest()
+            if entry is not None and entry['sha1'] == sha1:                              # server doesn't support validators
+                content = None
+            else:
+                entry = { 'file': os.path.join(self.path, 'dwd_' + hashlib.sha1(url.encode()).hexdigest()[:16] + '_' + os.path.basename(url)),
+                          'sha1': sha1 }
+                self._write(entry['file'], content)
+            entry['etag']         = req.headers.get('ETag')
+            entry['lastModified'] = req.headers.get('Last-Modified')
+        entry['time']    = time.time()
+        self._index[url] = entry
+        self._evict()
+        self._write(self._file, json.dumps(self._index, indent=1).encode())
+        if content is None and self.force:                                               # re-process local copy
+            with open(entry['file'], 'rb') as f:
+                content = f.read()
+        return content
+
+    def _evict(self):
+        for url in [url for url, entry in self._index.items() if entry['time'] < time.time() - self._MAX_AGE]:
+            try:
+                os.remove(self._index[url]['file'])
+            except OSError:
+                pass
+            del self._index[url]
+
+    def _write(self, file, content):
+        tmp = file + '.' + str(os.getpid()) + '.tmp'
+        os.makedirs(self.path, exist_ok=True)
+        with open(tmp, 'wb') as f:
+            f.write(content)
+        os.replace(tmp, file)                                                            # don't leave partially written files
+
+class _ZipStream():
+    """Binary file object (read() only) over the first member of a .zip file, which is decompressed from
+    an iterable of compressed chunks as they arrive, eg. while downloading. Memory is bounded to about one
+    chunk. After drain(), crc and size are those of the entire member, to be checked against the central 
+    directory of the .zip file"""
+
+    _HEADER = struct.Struct('<IHHHHHIIIHH')                                              # local file header
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._input  = b''
+        self._zlib   = None
+        self._eof    = False
+        self.name    = None                                                              # name of member
+        self.crc     = 0                                                                 # of data read so far
+        self.size    = 0
+
+    def _next(self):
+        chunk = next(self._chunks, None)
+        if chunk is None:
+            sys.tracebacklimit=0
+            raise BadZipFile("ERROR --- unexpected end of .zip data")
+        self._input = self._input + chunk
+
+    def _start(self):
+        while len(self._input) < self._HEADER.size:
+            self._next()
+        sig, version, flags, method, mtime, mdate, crc, csize, usize, nameLen, extraLen = self._HEADER.unpack_from(self._input)
+        if sig != 0x04034b50 or method != 8:                                             # we only expect deflate
+            sys.tracebacklimit=0
+            raise BadZipFile("ERROR --- not a .zip file or unsupported compression")
+        while len(self._input) < self._HEADER.size + nameLen + extraLen:
+            self._next()
+        self.name   = self._input[self._HEADER.size:self._HEADER.size + nameLen].decode('cp437')
+        self._input = self._input[self._HEADER.size + nameLen + extraLen:]
+        self._zlib  = zlib.decompressobj(-zlib.MAX_WBITS)                                # raw deflate stream
+
+    def read(self, size = -1):
+        if self._zlib is None:
+            self._start()
+        limit = size if size > 0 else 1 << 20
+        data  = b''
+        while len(data) == 0 and not self._eof:
+            if len(self._input) == 0:
+                self._next()
+            data        = self._zlib.decompress(self._input, limit)
+            self._input = self._zlib.unconsumed_tail
+            self._eof   = self._zlib.eof
+        self.crc  = zlib.crc32(data, self.crc)
+        self.size = self.size + len(data)
+        return data
+
+    def drain(self):
+        """Read remaining data, including central directory of .zip file"""
+        while len(self.read()) > 0:
+            pass
+        for chunk in self._chunks:
+            pass
+
+    def close(self):
+        if hasattr(self._chunks, 'close'):
+            self._chunks.close()
\ No newline at end of file
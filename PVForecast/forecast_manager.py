@@ -19,11 +19,16 @@ import pandas as pd
 import configparser
 import sys
 import os
+import time
+import re
 from datetime import datetime, timezone, timedelta
+from concurrent.futures import ProcessPoolExecutor
 
+from .forecast       import Forecast
 from .dwdforecast    import DWDForecast
 from .openweather    import OWMForecast
 from .pvmodel        import PVModel
+from .pvfleet        import PVFleet
 from .solcast        import SolCast
 from .visualcrossing import VisualCrossing
 from .entsoe         import EntsoE
@@ -31,8 +36,11 @@ from .co2signal      import CO2signal
 from .csvinput       import CSVInput
 from .dbrepository   import DBRepository
 from .influx         import InfluxRepo
+from .archive        import Archive
 
 class ForecastManager:
+    _WRITE_BATCH = 100                                                                   # files per write transaction of reprocessDWDFiles()
+
     def __init__(self, configFile):
         try:
             config = configparser.ConfigParser(inline_comment_prefixes='#', empty_lines_in_values=False)
@@ -45,6 +53,17 @@ class ForecastManager:
             sys.exit(1)
 
         self.config     = config
+        self._myDB      = None                                                           # DBRepository shared by all methods, see _openDB()
+        self._inRun     = False                                                          # in runForecasts()
+
+    def _openDB(self):
+        """DBRepository shared by all methods: one connection per run. Within runForecasts(), data of all
+        methods is written in one transaction at the end of the run (see DBRepository.begin())"""
+
+        if self._myDB is None:
+            self._myDB = DBRepository(self.config)
+            if self._inRun: self._myDB.begin()
+        return self._myDB
 
     def _check_hasPVModel(self, what):        
         if not PVModel.__operational__:
@@ -77,42 +96,201 @@ class ForecastManager:
         else:
             myWeather.readKML(file)
         if myWeather.parseKML():                                                         # successful parsing done ...
-            myWeather.convertDT()                                                        # strip-down and rename weather data to what is needed by PVModel
+            if (file == 'L' or file == 'S') and self.config['DWD'].getboolean('storeArchive', False):
+                self._archiveDWD(myWeather)                                              # raw weather data to columnar archive
+            self._modelDWD(myWeather)
 
-            #--------------------------------------------------------------------------- PV Forecast handling
-            myPV  = PVModel(self.config)
-            model = self.config['DWD'].get('Irradiance', 'disc')
-            myPV.run_splitArray(myWeather, model)
-            myWeather.merge_PVSim(myPV)                                                  # merge stripped-down weather data and forecast
+    def _modelDWD(self, myWeather):
+        """model PV output for parsed MOSMIX data and store results"""
 
-            #--------------------------------------------------------------------------- CSV storage
-            if (self.config['DWD'].getboolean('storeCSV', False)):                       # store full weather data to .csv
-                myWeather.writeCSV()
+        myWeather.convertDT()                                                            # strip-down and rename weather data to what is needed by PVModel
+
+        #------------------------------------------------------------------------------- PV Forecast handling
+        myPV  = PVModel(self.config)
+        model = self.config['DWD'].get('Irradiance', 'disc')
+        myPV.run_splitArray(myWeather, model)
+        myWeather.merge_PVSim(myPV)                                                      # merge stripped-down weather data and forecast
+        self._storeDWD(myWeather)
+
+    def _archiveDWD(self, myWeather):
+        """append parsed MOSMIX data (before convertDT()) to Archive"""
 
-            #--------------------------------------------------------------------------- SQLite storage
-            if (self.config['DWD'].getboolean('storeDB')):
-                myDB = DBRepository(self.config)
-                myDB.loadData(myWeather)
-                del myDB                                                                 # force closure of DB
+        try:
+            kmlName     = re.sub(r'\.csv\.gz$', '.kml', myWeather.csvName)
+            provider, _ = Archive.provider(kmlName)
+            Archive(self.config).append(provider, [myWeather])
+        except Exception as e:
+            print("Warning - _archiveDWD: " + str(e))
+
+    def _storeDWD(self, myWeather, myDB = None, myInflux = None):
+        """store processed MOSMIX data; myDB, myInflux can be provided to re-use open repositories"""
+
+        #------------------------------------------------------------------------------- CSV storage
+        if (self.config['DWD'].getboolean('storeCSV', False)):                           # store full weather data to .csv
+            myWeather.writeCSV()
 
-            #--------------------------------------------------------------------------- Influx storage
-            if (self.config['DWD'].getboolean('storeInflux')):
-                myInflux = InfluxRepo(self.config)
-                myInflux.loadData(myWeather)
+        #------------------------------------------------------------------------------- SQLite storage
+        if (self.config['DWD'].getboolean('storeDB')):
+            if myDB is None: myDB = self._openDB()
+            myDB.loadData(myWeather)
+
+        #------------------------------------------------------------------------------- Influx storage
+        if (self.config['DWD'].getboolean('storeInflux')):
+            if myInflux is None: myInflux = InfluxRepo(self.config)
+            myInflux.loadData(myWeather)
 
     def processDWDDirectory(self, directory, extension):
         """process directory full of MOSMIX files through processDWDFile
-        All files with matching 'extension' are processed"""
+        All files with matching 'extension' are processed, in order of file names
+
+        If [FileInput] batchSize > 1, files are processed in batches of batchSize files 
+        through backtestDWDFiles(). If [FileInput] workers <> 1, files are parsed and modelled
+        in a process pool (see reprocessDWDFiles())"""
 
-        cnt = 0
-        for entry in os.scandir(directory):
-            if entry.path.endswith(extension) and entry.is_file():
-                self.processDWDFile(entry.path)
+        cnt       = 0
+        batchSize = 0
+        workers   = 1
+        if 'FileInput' in self.config.sections():
+            batchSize = self.config['FileInput'].getint('batchSize', 0)
+            workers   = self.config['FileInput'].getint('workers', 1)
+        files     = sorted([entry.path for entry in os.scandir(directory) if entry.path.endswith(extension) and entry.is_file()])
+        if workers != 1:
+            cnt = self.reprocessDWDFiles(files, workers, batchSize)
+        elif batchSize > 1:
+            for i in range(0, len(files), batchSize):
+                cnt = cnt + self.backtestDWDFiles(files[i:i+batchSize])
+        else:
+            for file in files:
+                self.processDWDFile(file)
                 cnt = cnt+1
         print("Processed " + str(cnt) + " files")
 
+    def backtestDWDFiles(self, files):
+        """process a list of (archived) MOSMIX files, as processDWDFile would do, but model PV output 
+        for all files in one vectorized pass (see PVModel.run_backtest()). Returns number of files processed"""
+
+        if not self._check_hasPVModel('MOSMIX backtest'): 
+            return 0
+        weathers = _modelDWDFiles(self.config, files, True)
+        myDB     = None
+        myInflux = None
+        if (self.config['DWD'].getboolean('storeDB')):     myDB     = self._openDB()
+        if (self.config['DWD'].getboolean('storeInflux')): myInflux = InfluxRepo(self.config)
+        for myWeather in weathers:
+            self._storeDWD(myWeather, myDB, myInflux)
+        return len(weathers)
+
+    def reprocessDWDFiles(self, files, workers = 0, batchSize = 0):
+        """process a list of (archived) MOSMIX files, as processDWDFile (or backtestDWDFiles, if batchSize > 1)
+        would do, with parsing and PV modelling spread over a pool of 'workers' processes (0 = number of CPUs).
+        Results are stored by this process only: CSV files, one SQLite transaction and one Influx connection 
+        per batch of _WRITE_BATCH files, in order of IssueTime within each batch. Returns number of files processed"""
+
+        if not self._check_hasPVModel('MOSMIX reprocessing'): 
+            return 0
+        config    = { 'DEFAULT': dict(self.config.defaults()) }                          # ConfigParser objects don't travel well between processes
+        for section in self.config.sections():
+            config[section] = dict(self.config._sections[section])                       # raw own items, workers interpolate again
+        if config['PVSystem'].get('executor', '').lower() == 'process':
+            config['PVSystem']['executor'] = 'serial'                                    # no nested pools in workers
+        size      = batchSize if batchSize > 1 else 1
+        tasks     = [files[i:i+size] for i in range(0, len(files), size)]
+        if workers <= 0: workers = None                                                  # default: number of CPUs
+
+        myDB      = None
+        myInflux  = None
+        if (self.config['DWD'].getboolean('storeDB')):     myDB     = self._openDB()
+        if (self.config['DWD'].getboolean('storeInflux')): myInflux = InfluxRepo(self.config)
+        cnt       = 0                                                                    # files done
+        stored    = 0                                                                    # forecasts stored
+        pending   = []
+        start     = time.perf_counter()
+        report    = start
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = pool.map(_modelDWDTask, [config]*len(tasks), tasks, [batchSize > 1]*len(tasks))
+            for task, weathers in zip(tasks, results):                                   # collect in order of file names
+                cnt     = cnt + len(task)
+                pending = pending + weathers
+                if len(pending) >= self._WRITE_BATCH or cnt == len(files):
+                    self._storeDWDBatch(pending, myDB, myInflux)
+                    stored  = stored + len(pending)
+                    pending = []
+                now = time.perf_counter()
+                if now - report >= 10 or cnt == len(files):                              # progress report every 10 sec
+                    report = now
+                    print("Message - processed %d of %d files (%.1f files/sec)" % (cnt, len(files), cnt/max(now - start, 1e-9)))
+        if stored < cnt:
+            print("Warning - " + str(cnt - stored) + " files could not be parsed")
+        return stored
+
+    def _storeDWDBatch(self, weathers, myDB = None, myInflux = None):
+        """store a list of processed MOSMIX data, in order of IssueTime, with one database transaction 
+        and Influx connection for all of them"""
+
+        weathers = sorted(weathers, key = lambda w: w.IssueTime)
+        if (self.config['DWD'].getboolean('storeCSV', False)):
+            for myWeather in weathers:
+                myWeather.writeCSV()
+        if (self.config['DWD'].getboolean('storeDB')):
+            if myDB is None: myDB = self._openDB()
+            myDB.loadBatch(weathers)
+        if (self.config['DWD'].getboolean('storeInflux')):
+            if myInflux is None: myInflux = InfluxRepo(self.config)
+            myInflux.loadBatch(weathers)
+
+    def processFleet(self):
+        """model PV output of all sites of a fleet (see PVFleet), based on MOSMIX_L data downloaded 
+        once per DWD station (or MOSMIX_S data, extracted for all stations in one pass with 
+        [Fleet] MOSMIX = S). Results are stored per site, in tables 'fleet_<site>'"""
+
+        if not PVModel.__operational__:
+            print("Error: Can't run Fleet - pvlib library installation missing or old version (required: >=0.9.0)")
+            sys.exit(1)
+        if 'DWD' not in self.config.sections():
+            print("Warning: Can't run Fleet without section 'DWD' in config file, skipped")
+            return
+        storeDB     = self.config['Fleet'].getboolean('storeDB', False)
+        storeInflux = self.config['Fleet'].getboolean('storeInflux', False)
+        storeCSV    = self.config['Fleet'].getboolean('storeCSV', False)
+        if not (storeDB or storeInflux or storeCSV):                                     # else there is no storage location ...
+            print("Warning - Fleet not supported without storage enabled (storeDB, storeInflux or storeCSV)")
+            return
+        myFleet  = PVFleet(self.config)
+        model    = self.config['Fleet'].get('Irradiance', self.config['DWD'].get('Irradiance', 'disc'))
+        myDB     = None
+        myInflux = None
+        if storeDB:     myDB     = self._openDB()                                        # one connection for all sites
+        if storeInflux: myInflux = InfluxRepo(self.config)
+        cnt      = 0
+        mosmix   = self.config['Fleet'].get('MOSMIX', 'L').upper()
+        if mosmix == 'S':                                                                # all stations in one pass over global file
+            myWeather = DWDForecast(self.config)
+            forecasts = myWeather.getForecast_DWD_S(myFleet.stations)
+            if not myWeather.modified:
+                return
+        for station in myFleet.stations:
+            if mosmix == 'S':
+                myWeather = forecasts.get(station, DWDForecast(self.config))
+            else:
+                myWeather = DWDForecast(self.config)
+                myWeather.getForecast_DWD_L(station)
+            if not myWeather.modified:                                                   # unchanged since last run, nothing to do
+                continue
+            if myWeather.parseKML():
+                myWeather.convertDT()
+                for mySite in myFleet.run(myWeather, station, model):
+                    if storeDB:     myDB.loadData(mySite)
+                    if storeInflux: myInflux.loadData(mySite)
+                    if storeCSV:    mySite.writeCSV()
+                    cnt = cnt + 1
+            else:
+                print("Warning - Fleet: no weather data for station " + station + ", sites skipped")
+        print("Processed " + str(cnt) + " sites")
+
     def processSolCast(self):
-        mySolCast = SolCast(self.config)
+        myDB      = None
+        if self.config['SolCast'].getboolean('storeDB', False): myDB = self._openDB()
+        mySolCast = SolCast(self.config, myDB)
         mySolCast.getSolCast()
 
     def processVisualCrossing(self):
@@ -126,7 +304,7 @@ class ForecastManager:
             if myWeather.getForecast_VisualCrossing():
                 last_issue = datetime.fromtimestamp(0, timezone.utc)
                 if storeDB:
-                    myDB       = DBRepository(self.config)
+                    myDB       = self._openDB()
                     last_issue = myDB.getLastIssueTime(myWeather.SQLTable)
                 if storeInflux: 
                     myInflux   = InfluxRepo(self.config)
@@ -157,7 +335,7 @@ class ForecastManager:
             if myWeather.getForecast_OWM():
                 last_issue = datetime.fromtimestamp(0, timezone.utc)
                 if storeDB:     
-                    myDB       = DBRepository(self.config)
+                    myDB       = self._openDB()
                     last_issue = myDB.getLastIssueTime(myWeather.SQLTable)
                 if storeInflux: 
                     myInflux   = InfluxRepo(self.config)
@@ -210,7 +388,7 @@ class ForecastManager:
                     if myEntsoE.prepareDump(zone):                                           # we have data for this zone
                         last_issue = datetime.fromtimestamp(0, timezone.utc)
                         if storeDB:     
-                            myDB       = DBRepository(self.config)
+                            myDB       = self._openDB()
                             last_issue = myDB.getLastIssueTime(myEntsoE.SQLTable)
                         if storeInflux: 
                             myInflux   = InfluxRepo(self.config)
@@ -235,7 +413,7 @@ class ForecastManager:
             for zone in myCO2signal.zones:                                               # CO2signal can write multiple tables (one per zone)
                 myCO2signal.prepareDump(zone)
                 if storeDB:     
-                    myDB       = DBRepository(self.config)
+                    myDB       = self._openDB()
                 if storeInflux: 
                     myInflux   = InfluxRepo(self.config)
                 if storeDB:     myDB.loadData(myCO2signal)
@@ -247,7 +425,7 @@ class ForecastManager:
         """Process various input files, for debugging. Based on config file section 'FileInput'"""
         type = self.config['FileInput'].get('type', 'csv')
         file = self.config['FileInput'].get('file')
-        if type == 'csv' or type == 'kml':
+        if type == 'csv' or type == 'kml' or type == 'convert' or type == 'archive':
             if type == 'kml':
                 if os.path.isfile(file):
                     self.processDWDFile(file)
@@ -268,17 +446,110 @@ class ForecastManager:
                     raise Exception("processFileInput: File '" + file + "' not found")
                 myWeather = CSVInput(self.config)
                 myWeather.getForecast_CSVInput(file)
-                myPV      = PVModel(self.config)
-                model     = self.config['FileInput'].get('Irradiance', 'disc')
-                myPV.run_splitArray(myWeather, model)
-                myWeather.merge_PVSim(myPV)
-                myWeather.writeCSV()                                                     # unconditional writing to CSV, other store paths not supported
+                self._modelCSV(myWeather)
+
+            elif type == 'convert':
+                if not os.path.isdir(file):
+                    sys.tracebacklimit=0
+                    raise Exception("processFileInput: Directory '" + file + "' not found")
+                extension = self.config['FileInput'].get('extension', '.zip')
+                if extension[0] != '.': extension = '.' + extension
+                self.convertToArchive(file, extension)
+
+            elif type == 'archive':
+                self.processArchive()
 
             else:
                 sys.tracebacklimit=0
                 raise Exception("processFileInput: type '" + type + "' unsupported")
         return()
     
+    def _modelCSV(self, myWeather):
+        """model PV output for weather data read by CSVInput and store results"""
+
+        myPV      = PVModel(self.config)
+        model     = self.config['FileInput'].get('Irradiance', 'disc')
+        myPV.run_splitArray(myWeather, model)
+        myWeather.merge_PVSim(myPV)
+        myWeather.writeCSV()                                                             # unconditional writing to CSV, other store paths not supported
+
+    def convertToArchive(self, directory, extension):
+        """compact files in directory into Archive: MOSMIX files (as readable by DWDForecast.readKML()) and 
+        .csv files (as written by Forecast.writeCSV()) with matching 'extension'. Issues already archived 
+        are skipped, so that conversion can be repeated as new files arrive"""
+
+        myArchive = Archive(self.config)
+        providers = {}
+        for entry in sorted(os.scandir(directory), key = lambda entry: entry.name):
+            if entry.is_file() and entry.name.endswith(extension):
+                provider, issue = Archive.provider(entry.name)
+                if provider is None:
+                    print("Warning - convertToArchive: no issue time in file name '" + entry.name + "', skipped")
+                else:
+                    providers.setdefault(provider, []).append((issue, entry.path))
+        for provider, files in providers.items():
+            known = myArchive.issueTimes(provider, set(issue[:7] for issue, file in files))
+            files = [file for issue, file in files if issue not in known]
+            cnt   = 0
+            for i in range(0, len(files), self._WRITE_BATCH):                            # append in batches, to limit memory needs
+                forecasts = []
+                for file in files[i:i+self._WRITE_BATCH]:
+                    if provider.startswith('csv_'):
+                        forecast = self._readCSV(file)
+                    else:
+                        forecast = DWDForecast(self.config)
+                        forecast.readKML(file)
+                        if not forecast.parseKML(): forecast = None
+                    if forecast is not None:
+                        forecasts.append(forecast)
+                cnt = cnt + myArchive.append(provider, forecasts)
+            print("Message - " + str(cnt) + " issues of '" + provider + "' added to archive")
+
+    def _readCSV(self, file):
+        """read .csv file (as written by Forecast.writeCSV()) for convertToArchive(); issue time from file name"""
+
+        try:
+            forecast           = Forecast()
+            forecast.DataTable = pd.read_csv(file)
+            forecast.DataTable['PeriodEnd'] = pd.to_datetime(forecast.DataTable['PeriodEnd'], utc=True)
+            forecast.DataTable.set_index('PeriodEnd', verify_integrity=True, inplace=True)
+            forecast.IssueTime = Archive.provider(file)[1]
+            forecast.csvName   = os.path.basename(file)
+            return forecast
+        except Exception as e:
+            print("Warning - convertToArchive: " + file + ": " + str(e) + ", skipped")
+            return None
+
+    def processArchive(self):
+        """reprocess all issues of [FileInput] provider in Archive, as processDWDFile() (MOSMIX data) or 
+        processFileInput() (.csv data) would do with the original files. [FileInput] start, end can limit 
+        the range of IssueTime"""
+
+        if not self._check_hasPVModel('Archive'):
+            return
+        myArchive = Archive(self.config)
+        provider  = self.config['FileInput'].get('provider')
+        start     = self.config['FileInput'].get('start')
+        end       = self.config['FileInput'].get('end')
+        if provider not in myArchive.providers():
+            sys.tracebacklimit=0
+            raise Exception("processArchive: provider '" + str(provider) + "' not found in archive; available: " + ', '.join(myArchive.providers()))
+        columns   = None
+        if not provider.startswith('csv_') and self.config['DWD'].getboolean('dropWeather', True):
+            columns = DWDForecast._KEEP                                                  # read only what convertDT() keeps
+        cnt       = 0
+        for issueTime, name, table in myArchive.read(provider, columns, start, end):
+            if provider.startswith('csv_'):
+                myWeather = CSVInput(self.config)
+                myWeather.getForecast_Archive(issueTime, name, table)
+                self._modelCSV(myWeather)
+            else:
+                myWeather = DWDForecast(self.config)
+                myWeather.readArchive(issueTime, name, table)
+                self._modelDWD(myWeather)
+            cnt = cnt + 1
+        print("Processed " + str(cnt) + " issues")
+
     def processMethod(self, m):
         try:
             print('processing ' + m)
@@ -290,6 +561,7 @@ class ForecastManager:
             elif m == 'Entso-E':        self.processEntsoE()         # Entso-E based CO2 forecast
             elif m == 'CO2signal':      self.processCO2signal()      # CO2signal from electricityMaps.com
             elif m == 'FileInput':      self.processFileInput()      # process file input
+            elif m == 'Fleet':          self.processFleet()          # fleet of PV systems (MOSMIX_L - DWD)
         except SystemExit as e:
             print('Terminating in method ' + m + '; review config file to fix error, or report issue on Github')
             sys.exit(1)
@@ -297,7 +569,7 @@ class ForecastManager:
             print('Error - Method ' + m + ': ' + str(e))            
 
     def runForecasts(self):
-        methods = ['MOSMIX_L', 'MOSMIX_S', 'SolCast', 'VisualCrossing', 'OpenWeatherMap', 'Entso-E', 'CO2signal', 'FileInput']
+        methods = ['MOSMIX_L', 'MOSMIX_S', 'SolCast', 'VisualCrossing', 'OpenWeatherMap', 'Entso-E', 'CO2signal', 'FileInput', 'Fleet']
         runList = []
         if 'Forecasts' in self.config.sections():
             for m in methods:
@@ -319,5 +591,60 @@ class ForecastManager:
             print("Error: no data providers selected in config file")
             sys.exit(1)
 
-        for m in runList:
-            self.processMethod(m)
+        self._inRun = True
+        try:
+            for m in runList:
+                self.processMethod(m)
+        finally:
+            if self._myDB is not None:
+                self._myDB.commit()                                                      # write data of all methods in one transaction
+            self._inRun = False
+
+def _modelDWDFiles(config, files, vectorized = False):
+    """parse (archived) MOSMIX 'files' and model PV output, either file by file (as ForecastManager.processDWDFile 
+    does) or vectorized for consecutive issues with identical weather columns (see PVModel.run_backtest()).
+    Returns list of DWDForecast objects in order of IssueTime"""
+
+    weathers = []
+    for file in files:
+        myWeather = DWDForecast(config)
+        myWeather.readKML(file)
+        if myWeather.parseKML():
+            myWeather.convertDT()
+            weathers.append(myWeather)
+    weathers.sort(key = lambda w: w.IssueTime)
+
+    model    = config['DWD'].get('Irradiance', 'disc')
+    if not vectorized:
+        for myWeather in weathers:
+            myPV  = PVModel(config)
+            myPV.run_splitArray(myWeather, model)
+            myWeather.merge_PVSim(myPV)
+        return weathers
+    batch    = []                                                                        # consecutive issues with identical weather columns
+    for myWeather in weathers + [None]:
+        if len(batch) > 0 and (myWeather is None or list(myWeather.DataTable) != list(batch[0].DataTable)):
+            myPV  = PVModel(config)
+            myPV.run_backtest(batch, model)
+            batch = []
+        if myWeather is not None:
+            batch.append(myWeather)
+    return weathers
+
+def _modelDWDTask(config, files, vectorized):
+    """Worker task of ForecastManager.reprocessDWDFiles(): parse and model 'files' (see _modelDWDFiles());
+    returns stripped-down Forecast objects, holding what is needed for storage"""
+
+    cfg     = configparser.ConfigParser()
+    cfg.read_dict(config)
+    results = []
+    for myWeather in _modelDWDFiles(cfg, files, vectorized):
+        result              = Forecast()
+        result.DataTable    = myWeather.DataTable
+        result.IssueTime    = myWeather.IssueTime
+        result.SQLTable     = myWeather.SQLTable
+        result.InfluxFields = myWeather.InfluxFields
+        result.csvName      = myWeather.csvName
+        result.storePath    = myWeather.storePath
+        results.append(result)
+    return results
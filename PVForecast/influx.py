@@ -80,28 +80,45 @@ class InfluxRepo:
 
         data    Forecast object to be loaded.
         """
-        if (data.InfluxFields):
-            df       = data.DataTable[data.InfluxFields].copy()
-            for field in data.InfluxFields:
-                df[field] = df[field].astype(float)
+        self.loadBatch([data])
 
-            issueTime = int(datetime.fromisoformat(data.IssueTime).timestamp())
-            now_utc   = datetime.now(timezone.utc)
-            df_log    = pd.DataFrame(data={'IssueTime': issueTime, 'Table': [data.SQLTable]}, index=[now_utc])
+    def loadBatch(self, datas):
+        """
+        Load a list of Forecast objects into Influx, through one client connection (see loadData())
 
-            if not self._influx_V2:
-                client    = DataFrameClient(host=self._host, port=self._port, database=self._database, username=self._username, password=self._password, ssl=self._ssl, verify_ssl=self._verify_ssl)
-                self._verifyDB(client)
+        datas   list of Forecast objects to be loaded.
+        """
+        datas = [data for data in datas if data.InfluxFields]
+        if len(datas) == 0:
+            return
+        if not self._influx_V2:
+            client    = DataFrameClient(host=self._host, port=self._port, database=self._database, username=self._username, password=self._password, ssl=self._ssl, verify_ssl=self._verify_ssl)
+            self._verifyDB(client)
+            for data in datas:
+                df, df_log = self._frames(data)
                 client.write_points(df, data.SQLTable)
                 client.write_points(df_log, 'forecast_log', tag_columns=['Table'])
-            else:
-                client    = InfluxDBClient_V2(url=self._host+":"+str(self._port), token=self._token, org=self._org)
-                self._verifyDB(client)
-                write_api = client.write_api()
+        else:
+            client    = InfluxDBClient_V2(url=self._host+":"+str(self._port), token=self._token, org=self._org)
+            self._verifyDB(client)
+            write_api = client.write_api()
+            for data in datas:
+                df, df_log = self._frames(data)
                 write_api.write(self._database, record=df,     data_frame_measurement_name=data.SQLTable, retention_policy=self._retention)
                 write_api.write(self._database, record=df_log, data_frame_measurement_name='forecast_log', data_frame_tag_columns=['Table'], retention_policy=self._retention)
-                write_api.close()
-                client.close()
+            write_api.close()
+            client.close()
+
+    def _frames(self, data: Forecast):
+        """data frames to be written for data: InfluxFields and log entry for 'forecast_log'"""
+        df       = data.DataTable[data.InfluxFields].copy()
+        for field in data.InfluxFields:
+            df[field] = df[field].astype(float)
+
+        issueTime = int(datetime.fromisoformat(data.IssueTime).timestamp())
+        now_utc   = datetime.now(timezone.utc)
+        df_log    = pd.DataFrame(data={'IssueTime': issueTime, 'Table': [data.SQLTable]}, index=[now_utc])
+        return df, df_log
  
     def getLastIssueTime(self, table):
         """
@@ -0,0 +1,226 @@
+"""
+Copyright (C) 2022    Stefan Eichenberger   se_misc ... hotmail.com
+
+This file is part of the PVOptimize and PVForecast project: you can
+redistribute it and/or modify it under the terms of the GNU General
+Public License as published by the Free Software Foundation, either
+version 3 of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import pandas as pd
+import numpy  as np
+import re
+import sys
+import configparser
+
+from .forecast import Forecast
+from .pvmodel  import PVModel, _SolarGeometry, _pvlib_installed
+if _pvlib_installed:
+    import pvlib
+    from pvlib             import irradiance
+    from pvlib.temperature import TEMPERATURE_MODEL_PARAMETERS
+
+class PVFleet():
+    """Model PV output of a fleet of PVWatts systems (sites), which share the weather data of a few DWD stations.
+
+    Sites are defined in a site table (.csv or .parquet file, see [Fleet] siteTable), one row per site.
+    Irradiance is calculated once per station (at the mean location of its sites), PV output of all sites
+    of a station is modelled as one (time x site) array. Calculation steps are those of PVModel with
+    [PVSystem] engine = numpy (see pvmodel.py / _PVWattsChain)"""
+
+    _REQUIRED = ['Site', 'DWDStation', 'Latitude', 'Longitude', 'Tilt', 'Azimuth', 'SystemPower', 'InverterPower']
+    _DEFAULTS = { 'Altitude'          : 0,                                               # optional columns of site table and their defaults (see PVModel)
+                  'TemperatureCoeff'  : -0.005,
+                  'NominalEfficiency' : 0.96,
+                  'TemperatureModel'  : 'open_rack_glass_glass' }
+    _ALBEDO   = 0.25                                                                     # pvlib default albedo
+
+    def __init__(self, config, section = 'Fleet'):
+        """Initialize PVFleet
+        config      configparser object with section [<section>]
+                    <section> defaults to 'Fleet'"""
+
+        try:
+            self.config    = config
+            self._cfg      = section
+            self.cachePath = self.config[self._cfg].get('cachePath')                     # where to keep persistent caches (see PVModel)
+            self.sites     = self._readSites(self.config[self._cfg].get('siteTable'))
+            self.stations  = list(self.sites['DWDStation'].unique())                     # DWD stations used by fleet, in order of site table
+            self._losses   = (100 - pvlib.pvsystem.pvwatts_losses(**PVModel._PVWATTS_LOSSES)) / 100.
+            params         = [TEMPERATURE_MODEL_PARAMETERS['sapm'][m] for m in self.sites['TemperatureModel']]
+            for p in ['a', 'b', 'deltaT']:
+                self.sites['_' + p] = [param[p] for param in params]
+        except Exception as e:
+            print("pvfleet __init__: " + str(e))
+            sys.exit(1)
+
+    def _readSites(self, file):
+        """Read site table from .csv or .parquet file"""
+
+        if file is None:
+            sys.tracebacklimit=0
+            raise Exception("ERROR --- no site table defined (siteTable) in section " + self._cfg)
+        if re.search(r'\.parquet$', file, re.IGNORECASE):
+            try:
+                sites = pd.read_parquet(file)
+            except ImportError:
+                sys.tracebacklimit=0
+                raise Exception("ERROR --- reading .parquet files requires library 'pyarrow'; run 'pip install pyarrow' or use a .csv file")
+        else:
+            sites = pd.read_csv(file, dtype={ 'Site': str, 'DWDStation': str }, skipinitialspace=True)
+        missing = [col for col in self._REQUIRED if col not in sites]
+        if len(missing) > 0:
+            sys.tracebacklimit=0
+            raise Exception("ERROR --- site table " + file + " misses column(s) " + ', '.join(missing))
+        for col, val in self._DEFAULTS.items():
+            if col not in sites:
+                sites[col] = val
+            else:
+                sites[col] = sites[col].fillna(val)
+        sites['Site']       = sites['Site'].astype(str).str.strip()
+        sites['DWDStation'] = sites['DWDStation'].astype(str).str.strip()
+        if sites['Site'].duplicated().any():
+            sys.tracebacklimit=0
+            raise Exception("ERROR --- duplicate site name(s) in site table " + file + ": " + ', '.join(sites['Site'][sites['Site'].duplicated()].unique()))
+        return sites.reset_index(drop=True)
+
+    def _stationModel(self, sites):
+        """PVModel at mean location of sites, used to calculate irradiance data (PV system is a dummy)"""
+
+        system = { 'Latitude'      : str(sites['Latitude'].mean()),
+                   'Longitude'     : str(sites['Longitude'].mean()),
+                   'Altitude'      : str(sites['Altitude'].mean()),
+                   'SystemPower'   : '1000',
+                   'InverterPower' : '1000',
+                   'engine'        : 'numpy' }
+        for key in ['clearsky_model', 'solarPosition', 'cachePath', 'geometryCache']:
+            if self.config[self._cfg].get(key) is not None:
+                system[key] = self.config[self._cfg].get(key)
+        config = configparser.ConfigParser()
+        config.read_dict({ 'PVSystem': system })
+        return PVModel(config)
+
+    def _geometry(self, sites, times, temp_air):
+        """Apparent zenith, zenith, azimuth and relative airmass as (time x site) arrays.
+        With solarPosition 'nrel_numpy' (default), solar position of all sites is calculated at once (see _spa()),
+        else once per distinct site location"""
+
+        method  = self.config[self._cfg].get('solarPosition', 'nrel_numpy').lower()
+        persist = self.config[self._cfg].getboolean('geometryCache', False)
+        if method == 'nrel_numpy' and not persist and times.is_unique:
+            result = self._spa(sites, times, temp_air.to_numpy(dtype=float))
+        else:
+            result = { col : np.empty((len(times), len(sites))) for col in ['apparent_zenith', 'zenith', 'azimuth'] }
+            for loc, idx in sites.groupby(['Latitude', 'Longitude', 'Altitude']).indices.items():
+                solpos = _SolarGeometry.for_location(*[float(l) for l in loc], method, self.cachePath, persist).get_solarposition(times, temperature=temp_air)
+                for col in result:
+                    result[col][:, idx] = solpos[col].to_numpy()[:, None]
+        result['airmass'] = pvlib.atmosphere.get_relative_airmass(result['apparent_zenith'], 'kastenyoung1989')
+        return result
+
+    def _spa(self, sites, times, temperature):
+        """Solar position of all sites as (time x site) arrays, as pvlib.solarposition.spa_python() calculates
+        it for each site. Location independent terms are calculated once, topocentric terms per site"""
+
+        spa      = pvlib.solarposition._spa_python_import('numpy')
+        lat      = sites['Latitude'].to_numpy(dtype=float)
+        lon      = sites['Longitude'].to_numpy(dtype=float)
+        elev     = sites['Altitude'].to_numpy(dtype=float)
+        pressure = np.array([pvlib.atmosphere.alt2pres(float(a)) for a in elev]) / 100  # as Location.get_solarposition() (scalar power), in millibars
+        unixtime = np.array(times.view(np.int64)/10**9)
+        delta_t  = 67.0                                                                  # default of spa_python()
+        R,               = spa.solar_position_numpy(unixtime, 0, 0, 0, 0, 0, delta_t, 0, 0, esd=True)
+        v, alpha, delta  = [x[:, None] for x in spa.solar_position_numpy(unixtime, 0, 0, 0, 0, 0, delta_t, 0, 0, sst=True)]
+        H           = spa.local_hour_angle(v, lon, alpha)                                # as spa.solar_position_numpy()
+        xi          = spa.equatorial_horizontal_parallax(R)[:, None]
+        u           = spa.uterm(lat)
+        x           = spa.xterm(u, lat, elev)
+        y           = spa.yterm(u, lat, elev)
+        delta_alpha = spa.parallax_sun_right_ascension(x, xi, H, delta)
+        delta_prime = spa.topocentric_sun_declination(delta, x, y, xi, delta_alpha, H)
+        H_prime     = spa.topocentric_local_hour_angle(H, delta_alpha)
+        e0          = spa.topocentric_elevation_angle_without_atmosphere(lat, delta_prime, H_prime)
+        delta_e     = spa.atmospheric_refraction_correction(pressure, temperature[:, None], e0, 0.5667)
+        e           = spa.topocentric_elevation_angle(e0, delta_e)
+        gamma       = spa.topocentric_astronomers_azimuth(H_prime, delta_prime, lat)
+        return { 'apparent_zenith' : spa.topocentric_zenith_angle(e),
+                 'zenith'          : spa.topocentric_zenith_angle(e0),
+                 'azimuth'         : spa.topocentric_azimuth_angle(gamma) }
+
+    def _dcac(self, sites, weather, geometry, dni_extra):
+        """DC and AC output of sites as (time x site) arrays, for irradiance data 'weather'
+        (as calculated by PVModel.getIrradiance()); as _PVWattsChain.run_model()"""
+
+        col        = lambda c: weather[c].to_numpy(dtype=float)[:, None]
+        temp_air   = col('temp_air')
+        wind_speed = col('wind_speed')
+        ghi        = col('ghi')
+        dni        = col('dni')
+        dhi        = col('dhi')
+        tilt       = sites['Tilt'].to_numpy(dtype=float)
+        orient     = sites['Azimuth'].to_numpy(dtype=float)
+        zenith     = geometry['apparent_zenith']
+        azimuth    = geometry['azimuth']
+
+        aoi        = irradiance.aoi(tilt, orient, zenith, azimuth)
+        sky        = irradiance.get_sky_diffuse(tilt, orient, zenith, azimuth, dni, ghi, dhi,
+                                                dni_extra=dni_extra[:, None], airmass=geometry['airmass'], model='perez')
+        ground     = irradiance.get_ground_diffuse(tilt, ghi, self._ALBEDO)
+        poa        = irradiance.poa_components(aoi, dni, sky, ground)
+        effective  = poa['poa_direct'] * pvlib.iam.physical(aoi) + poa['poa_diffuse']
+        temp_cell  = pvlib.temperature.sapm_cell(poa['poa_global'], temp_air, wind_speed,
+                                                 sites['_a'].to_numpy(), sites['_b'].to_numpy(), sites['_deltaT'].to_numpy())
+        dc         = pvlib.pvsystem.pvwatts_dc(effective, temp_cell, sites['SystemPower'].to_numpy(dtype=float),
+                                               sites['TemperatureCoeff'].to_numpy(dtype=float)) * self._losses
+        ac         = pvlib.inverter.pvwatts(dc, sites['InverterPower'].to_numpy(dtype=float), sites['NominalEfficiency'].to_numpy(dtype=float))
+        return dc, np.where(np.isnan(ac), 0, ac)                                         # as ModelChain.pvwatts_inverter()
+
+    def run(self, weather: Forecast, station, modelLst = 'all'):
+        """Model all sites of 'station' for weather data (see DWDForecast, after convertDT()), for irradiance
+        models in 'modelLst' (see PVModel.run_allModels()). Returns list of Forecast objects (one per site),
+        with weather data and modelled output, as PVModel.run_splitArray() and merge_PVSim() would provide"""
+
+        sites      = self.sites[self.sites['DWDStation'] == station].reset_index(drop=True)
+        if len(sites) == 0:
+            return []
+        myPV       = self._stationModel(sites)
+        models     = myPV._modelList(weather, modelLst)
+        cols, colModel = myPV._modelColumns(models)
+        n, k       = len(weather.DataTable), len(sites)
+        block      = np.empty((len(cols), n, k))                                         # column x time x site
+        colIdx     = { c : i for i, c in enumerate(cols) }
+        geometry   = None
+        for m in models:
+            myPV.getIrradiance(weather, m)
+            data   = myPV.irradiance
+            if geometry is None:                                                         # solar position doesn't depend on model
+                geometry  = self._geometry(sites, data.index, data['temp_air'])
+                dni_extra = np.asarray(myPV._location.get_extra_radiation(data.index))
+            dc, ac = self._dcac(sites, data, geometry, dni_extra)
+            block[colIdx['dc_' + m]] = dc
+            block[colIdx['ac_' + m]] = ac
+            for c in ['ghi', 'dni', 'dhi', 'kt']:                                        # irradiance is shared by all sites of station
+                if c + '_' + m in colIdx:
+                    block[colIdx[c + '_' + m]] = data[c].to_numpy()[:, None]
+        block[colIdx['zenith']] = geometry['zenith']
+
+        result = []
+        for j, site in enumerate(sites['Site']):
+            mySite              = Forecast()
+            mySite.DataTable    = pd.concat([weather.DataTable, pd.DataFrame(block[:, :, j].T, index=weather.DataTable.index, columns=cols)], axis=1)
+            mySite.IssueTime    = weather.IssueTime
+            mySite.SQLTable     = 'fleet_' + re.sub(r'\W', '_', site)                    # which SQL table name is this data stored to (see DBRepository.loadData())
+            mySite.InfluxFields = ['dc_' + m for m in models]
+            mySite.storePath    = weather.storePath
+            if weather.csvName is not None:
+                mySite.csvName  = re.sub(r'\.csv\.gz$', '_' + re.sub(r'\W', '_', site) + '.csv.gz', weather.csvName)
+            result.append(mySite)
+        return result
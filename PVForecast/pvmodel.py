@@ -15,7 +15,6 @@ You should have received a copy of the GNU General Public License
 along with this program.  If not, see <https://www.gnu.org/licenses/>.
 """
 
-import warnings
 _pvlib_installed = True
 try:
     import pvlib
@@ -39,12 +38,32 @@ import pandas as pd
 import numpy  as np
 import re
 import sys
+import os
+import pickle
+import hashlib
+import configparser
+import threading
+import functools
+from collections        import OrderedDict
+from types              import SimpleNamespace, MappingProxyType
+from concurrent.futures import ProcessPoolExecutor
 
 from .forecast    import Forecast
 
+def _ignoreOverflow(method):
+    """Ignore numpy overflow warnings (eg. single-diode model at night) - unlike warnings.filterwarnings(),
+    np.errstate() is local to the calling thread"""
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        with np.errstate(over='ignore'):
+            return method(*args, **kwargs)
+    return wrapper
+
 class PVModel(Forecast):
     """Model PV output based on irradiance or cloud coverage data"""
     __operational__ = _pvlib_installed
+    _PVWATTS_LOSSES = { 'soiling'    : 0,   'shading': 0, 'snow':            0, 'mismatch': 0, 'wiring':       2,
+                        'connections': 0.5, 'lid'    : 0, 'nameplate_rating':0, 'age':      0, 'availability': 0 }
 
     def __init__(self, config, section = 'PVSystem'):
         """Initialize PVModel
@@ -52,7 +71,6 @@ class PVModel(Forecast):
                     <section> defaults to 'PVSystem'"""
 
         try:
-            warnings.filterwarnings("ignore", category=RuntimeWarning, message=".*overflow.*")
             self._pvversion = pvlib.__version__
             if version.parse(self._pvversion) > version.parse('0.10.3'):
                 print("Warning --- pvmodel not tested with pvlib > 0.10.3")
@@ -62,31 +80,34 @@ class PVModel(Forecast):
             super().__init__()
             self.config = config
             self._cfg   = section
-            self.config['DEFAULT']['NominalEfficiency']  =  '0.96'                       # nominal inverter efficiency, default of pvwatts model
-            self.config['DEFAULT']['TemperatureCoeff']   = '-0.005'                      # temperature coefficient of module, default of pvwatts model
-            self.config['DEFAULT']['TemperatureModel']   = 'open_rack_glass_glass'       # https://pvlib-python.readthedocs.io/en/stable/generated/pvlib.temperature.sapm_cell.html
-            self.config['DEFAULT']['clearsky_model']     = 'simplified_solis'            # default clearsky model
-            self.config['DEFAULT']['Altitude']           = '0'                           # default altitude sea level
-            self.config['DEFAULT']['Model']              = 'PVWatts'                     # default PV modeling stratey
-            if section != 'PVSystem':
-                for item in list(self.config.items('PVSystem')):                         # copy 'PVSystem' into default, so that it serves as fallback for 'PVSystem_i' (split-arrays)
-                    self.config['DEFAULT'][item[0]] = item[1]
-
-            self._location = Location(latitude  = self.config[self._cfg].getfloat('Latitude'),
-                                      longitude = self.config[self._cfg].getfloat('Longitude'), 
-                                      altitude  = self.config[self._cfg].getfloat('Altitude'),
-                                      tz='UTC')                                          # let's stay in UTC for the entire time ...
+            self._spec  = _SystemSpec(config, section)                                   # pre-parsed settings of this array; config itself is not modified
+            self._lead  = _SystemSpec(config, 'PVSystem') if section != 'PVSystem' else self._spec   # lead array: execution settings
+            self.storePath          = self._spec.get('storePath')                        # where to store .csv file
+            self.cachePath          = self._spec.get('cachePath')                        # where to keep persistent caches (eg. CEC database extracts)
+            if self.cachePath is None and self.storePath is not None:
+                self.cachePath      = self.storePath + '/cache/'
+            self._location = _SolarGeometry.for_location(latitude  = self._spec.getfloat('Latitude'),
+                                                         longitude = self._spec.getfloat('Longitude'),
+                                                         altitude  = self._spec.getfloat('Altitude'),
+                                                         method    = self._spec.get('solarPosition', 'nrel_numpy'),
+                                                         cachePath = self.cachePath,
+                                                         persist   = self._spec.getboolean('geometryCache', False))
             self._pvsystem          = None                                               # PV system, once defined with init_CEC() or init_PVWatts()
             self._mc                = None                                               # Model chain, once defined in init_CEC() or init_PVWatts()
             self._weather           = None                                               # weather data used for getIrradiance() and runModel()
             self.irradiance_model   = None                                               # model name if irradiance data calculated in getIrradiance()
             self.irradiance         = None                                               # calculated irradiance data
             self.pv_model           = None                                               # CEC or PVWatts once solar system is defined
+            self._block             = None                                               # preallocated result block, see run_allModels()
+            self._blockCols         = None                                               # column name --> column number in self._block
+            self._followers         = []                                                 # split-array followers as (PVModel, suffix), see run_allModels()
+            self._suffix            = None                                               # column suffix of lead array, if stored individually
+            self._issueSlices       = None                                               # row slices of individual issues in stacked weather data, see run_backtest()
+            self._ensemble          = False                                              # True while modelling ensemble members, see _runEnsemble()
             self.SQLTable           = self._cfg.lower()                                  # which SQL table name is this data stored to (see DBRepository.loadData())
-            self.storePath          = self.config[self._cfg].get('storePath')            # where to store .csv file
 
 
-            if (self.config[self._cfg].get('Model') == 'CEC'):
+            if (self._spec.get('Model') == 'CEC'):
                 self._init_CEC()
             else:
                 self._init_PVWatts()
@@ -99,17 +120,26 @@ class PVModel(Forecast):
         """Configure PV system based on actual components available in pvlib CEC database"""
 
         try:
-            moduleName     = self.config[self._cfg].get('ModuleName')
-            inverterName   = self.config[self._cfg].get('InverterName')
-            tempModel      = self.config[self._cfg].get('TemperatureModel')
-            self._pvsystem = PVSystem(surface_tilt                 = self.config[self._cfg].getfloat('Tilt'),
-                                      surface_azimuth              = self.config[self._cfg].getfloat('Azimuth'),
-                                      module_parameters            = pvlib.pvsystem.retrieve_sam('cecmod')[moduleName],
-                                      inverter_parameters          = pvlib.pvsystem.retrieve_sam('cecinverter')[inverterName],
-                                      strings_per_inverter         = self.config[self._cfg].getint('NumStrings'),
-                                      modules_per_string           = self.config[self._cfg].getint('NumPanels'),
+            moduleName     = self._spec.get('ModuleName')
+            inverterName   = self._spec.get('InverterName')
+            tempModel      = self._spec.get('TemperatureModel')
+            self._pvsystem = PVSystem(surface_tilt                 = self._spec.getfloat('Tilt'),
+                                      surface_azimuth              = self._spec.getfloat('Azimuth'),
+                                      module_parameters            = _CECDatabase.get('cecmod', moduleName, self.cachePath),
+                                      inverter_parameters          = _CECDatabase.get('cecinverter', inverterName, self.cachePath),
+                                      strings_per_inverter         = self._spec.getint('NumStrings'),
+                                      modules_per_string           = self._spec.getint('NumPanels'),
                                       temperature_model_parameters = TEMPERATURE_MODEL_PARAMETERS['sapm'][tempModel])
-            self._mc       = ModelChain(self._pvsystem, self._location, aoi_model='physical', spectral_model='no_loss')
+            engine         = self._spec.get('engine', 'ModelChain').lower()
+            if engine == 'surrogate':                                                    # table based, see _CECSurrogateChain
+                self._mc   = _CECSurrogateChain(self._pvsystem, self._location, self.cachePath)
+            elif engine == 'modelchain' or engine == 'numpy':
+                if engine == 'numpy':
+                    print("Warning --- engine 'numpy' only available for PVWatts, using ModelChain in section " + self._cfg)
+                self._mc   = ModelChain(self._pvsystem, self._location, aoi_model='physical', spectral_model='no_loss')
+            else:
+                sys.tracebacklimit=0
+                raise Exception("ERROR --- unknown engine '" + engine + "' in section " + self._cfg + ", must be 'ModelChain' or 'surrogate'")
             self.pv_model  = 'CEC'
         except Exception as e:
             print("init_CEC: " + str(e))
@@ -119,22 +149,29 @@ class PVModel(Forecast):
         """Configure PV system using simplified PVWatts model"""
 
         try:
-            pvwatts_module   = { 'pdc0'         : self.config[self._cfg].getfloat('SystemPower'),
-                                 'gamma_pdc'    : self.config[self._cfg].getfloat('TemperatureCoeff') }
-            pvwatts_inverter = { 'pdc0'         : self.config[self._cfg].getfloat('InverterPower'), 
-                                 'eta_inv_nom'  : self.config[self._cfg].getfloat('NominalEfficiency') }
-            pvwatts_losses   = { 'soiling'    : 0,   'shading': 0, 'snow':            0, 'mismatch': 0, 'wiring':       2, 
-                                 'connections': 0.5, 'lid'    : 0, 'nameplate_rating':0, 'age':      0, 'availability': 0 }
-            tempModel        = self.config[self._cfg].get('TemperatureModel')
-            self._pvsystem   = PVSystem(surface_tilt                 = self.config[self._cfg].getfloat('Tilt'),
-                                        surface_azimuth              = self.config[self._cfg].getfloat('Azimuth'),
+            pvwatts_module   = { 'pdc0'         : self._spec.getfloat('SystemPower'),
+                                 'gamma_pdc'    : self._spec.getfloat('TemperatureCoeff') }
+            pvwatts_inverter = { 'pdc0'         : self._spec.getfloat('InverterPower'), 
+                                 'eta_inv_nom'  : self._spec.getfloat('NominalEfficiency') }
+            tempModel        = self._spec.get('TemperatureModel')
+            self._pvsystem   = PVSystem(surface_tilt                 = self._spec.getfloat('Tilt'),
+                                        surface_azimuth              = self._spec.getfloat('Azimuth'),
                                         module_parameters            = pvwatts_module,
                                         inverter_parameters          = pvwatts_inverter,
-                                        losses_parameters            = pvwatts_losses,
+                                        losses_parameters            = self._PVWATTS_LOSSES,
                                         temperature_model_parameters = TEMPERATURE_MODEL_PARAMETERS['sapm'][tempModel])
-            self._mc          = ModelChain.with_pvwatts(self._pvsystem, self._location,
+            engine           = self._spec.get('engine', 'ModelChain').lower()
+            if engine == 'numpy':                                                        # array based, see _PVWattsChain
+                self._mc      = _PVWattsChain(self._pvsystem, self._location)
+            elif engine == 'modelchain' or engine == 'surrogate':
+                if engine == 'surrogate':
+                    print("Warning --- engine 'surrogate' only available for CEC, using ModelChain in section " + self._cfg)
+                self._mc      = ModelChain.with_pvwatts(self._pvsystem, self._location,
                                         dc_model='pvwatts', ac_model='pvwatts',
                                         aoi_model='physical', spectral_model='no_loss')
+            else:
+                sys.tracebacklimit=0
+                raise Exception("ERROR --- unknown engine '" + engine + "' in section " + self._cfg + ", must be 'ModelChain' or 'numpy'")
             self.pv_model    = 'PVWatts'
         except Exception as e:
             print("init_PVWatts: " + str(e))
@@ -183,21 +220,21 @@ class PVModel(Forecast):
                                                  pressure         = weatherData['pressure'])
                     dni  = np.array(disc['dni'])
                     kt   = np.array(disc['kt'])
-                elif (model == 'dirint'):
-                    dni  = pvlib.irradiance.dirint(ghi            = ghi,                 # returns array
-                                                   solar_zenith   = solar_position['zenith'],
-                                                   times          = weatherData.index,
-                                                   temp_dew       = weatherData['temp_dew'] - 273.15)
+                elif (model == 'dirint'):                                                # dirint uses adjacent time steps: calculate per issue
+                    dni  = self._byIssue(lambda i: pvlib.irradiance.dirint(ghi            = ghi[i],         # returns array
+                                                                           solar_zenith   = solar_position['zenith'].iloc[i],
+                                                                           times          = weatherData.index[i],
+                                                                           temp_dew       = weatherData['temp_dew'].iloc[i] - 273.15))
                 else:
                     clearsky = self._location.get_clearsky(weatherData.index,            # calculate clearsky ghi, dni, dhi for times
                                                            model='ineichen')
-                    dni  = pvlib.irradiance.dirindex(ghi          = ghi,                 # returns array
-                                                     ghi_clearsky = clearsky['ghi'],
-                                                     dni_clearsky = clearsky['dni'],
-                                                     zenith       = solar_position['zenith'],
-                                                     times        = weatherData.index,
-                                                     pressure     = weatherData['pressure'],
-                                                     temp_dew     = weatherData['temp_dew'] - 273.15)
+                    dni  = self._byIssue(lambda i: pvlib.irradiance.dirindex(ghi          = ghi[i],         # returns array
+                                                                             ghi_clearsky = clearsky['ghi'].iloc[i],
+                                                                             dni_clearsky = clearsky['dni'].iloc[i],
+                                                                             zenith       = solar_position['zenith'].iloc[i],
+                                                                             times        = weatherData.index[i],
+                                                                             pressure     = weatherData['pressure'].iloc[i],
+                                                                             temp_dew     = weatherData['temp_dew'].iloc[i] - 273.15))
                 dhi = ghi - dni*cosSZA
             elif (model == 'erbs'):
                 erbs = pvlib.irradiance.erbs(ghi             = ghi,                  # returns dataframe with columns ['dni', 'dhi', 'kt']
@@ -207,7 +244,7 @@ class PVModel(Forecast):
                 dhi  = np.array(erbs['dhi'])
                 kt   = np.array(erbs['kt'])
             elif (model == 'clearsky'):
-                clearsky_model  = self.config[self._cfg].get('clearsky_model')
+                clearsky_model  = self._spec.get('clearsky_model')
                 self.irradiance = self._location.get_clearsky(weatherData.index,         # calculate clearsky ghi, dni, dhi for clearsky
                                                               model=clearsky_model)
             elif (model == 'clearsky_scaling' or model == 'campbell_norman'):
@@ -221,9 +258,7 @@ class PVModel(Forecast):
             sys.exit(1)
 
         if (model != 'clearsky' and model != 'clearsky_scaling' and model != 'campbell_norman'):
-            self.irradiance         = pd.DataFrame(data=[ghi, dni, dhi]).T
-            self.irradiance.index   = weatherData.index
-            self.irradiance.columns = ['ghi', 'dni', 'dhi']
+            self.irradiance         = pd.DataFrame({ 'ghi': ghi, 'dni': dni, 'dhi': dhi }, index=weatherData.index)
         if (model == 'disc' or model == 'erbs'):
             self.irradiance['kt']   = kt
         self.irradiance_model       = model
@@ -232,10 +267,24 @@ class PVModel(Forecast):
         except:
             pass
 
-    def runModel(self, weather: Forecast, model, modelLst = 'all'):
-        """Run one PV simulation model (named in self.pv_model, set in getIrradiance())
-        Weather data is inherited from prior call to getIrradiance() call
-        Populates self.sim_result      pandas dataframe with simulation results"""
+    def _byIssue(self, calc):
+        """Evaluate calc(<rows>) for each issue of stacked weather data (see run_backtest()) and
+        concatenate the results. Needed for models which depend on adjacent time steps (dirint, dirindex).
+
+        All issues are evaluated in one call: each issue is padded with a copy of its second row before 
+        and of its last but one row after, so that first and last rows see the same neighbours as in a 
+        call per issue (Perez eqn 3). Padding rows are dropped from the result"""
+
+        if self._issueSlices is None:
+            return np.asarray(calc(slice(None)))
+        if min(i.stop - i.start for i in self._issueSlices) < 3:                         # too short for padding
+            return np.concatenate([np.asarray(calc(i)) for i in self._issueSlices])
+        rows = np.concatenate([np.r_[i.start + 1, i.start:i.stop, i.stop - 2] for i in self._issueSlices])
+        keep = np.concatenate([np.r_[False, np.ones(i.stop - i.start, dtype=bool), False] for i in self._issueSlices])
+        return np.asarray(calc(rows))[keep]
+
+    def _selectModel(self, model, modelLst = 'all'):
+        """True if 'model' is requested by 'modelLst' (comma separated list of models, or 'all')"""
 
         if modelLst is not None:
             modelLst     = modelLst.lower()
@@ -243,24 +292,53 @@ class PVModel(Forecast):
                 modelLst = modelLst.replace(" ", "")
                 models   = modelLst.split(",")
                 if model not in models:                                                   # request was for something else ...
-                    return None
+                    return False
+        return True
+
+    def _resultColumns(self, m):
+        """Output columns created by runModel() for irradiance model 'm'"""
+
+        cols = ['dc_' + m, 'ac_' + m, 'ghi_' + m, 'dni_' + m, 'dhi_' + m]
+        if (m == 'disc' or m == 'erbs'):
+            cols.append('kt_' + m)
+        return cols
+
+    @_ignoreOverflow
+    def runModel(self, weather: Forecast, model, modelLst = 'all'):
+        """Run one PV simulation model (named in self.pv_model, set in getIrradiance())
+        Weather data is inherited from prior call to getIrradiance() call
+        Populates self.sim_result      pandas dataframe with simulation results
+        
+        If called from run_allModels(), results are written to the preallocated self._block instead.
+        Split-array followers (see run_splitArray()) are modelled on the same irradiance data"""
+
+        if not self._selectModel(model, modelLst):
+            return None
 
         try:
             model = model.lower()
             self.getIrradiance(weather, model)
             self._mc.run_model(self.irradiance)
-            cols = ['ghi', 'dni', 'dhi']
+            values = [self._getDC(), self._mc.results.ac, self.irradiance['ghi'], self.irradiance['dni'], self.irradiance['dhi']]
             if 'kt' in self.irradiance: 
-                cols.append('kt')
-            if (self.pv_model == 'PVWatts'):
-                self.DataTable = pd.concat([self._mc.results.dc, self._mc.results.ac, self.irradiance[cols]], axis=1)
-            else:                                                                        # CEC
-                self.DataTable = pd.concat([self._mc.results.dc.p_mp, self._mc.results.ac, self.irradiance[cols]], axis=1)
-            m                  = self.irradiance_model
-            if (m == 'disc' or m == 'erbs'):
-                self.DataTable.columns = ['dc_' + m, 'ac_' + m, 'ghi_' + m, 'dni_' + m, 'dhi_' + m, 'kt_' + m]
-            else:
-                self.DataTable.columns = ['dc_' + m, 'ac_' + m, 'ghi_' + m, 'dni_' + m, 'dhi_' + m]
+                values.append(self.irradiance['kt'])
+            m      = self.irradiance_model
+            cols   = self._resultColumns(m)
+            if self._block is None:                                                      # stand-alone call: own result table
+                self.DataTable = pd.DataFrame(np.column_stack(values), index=self.irradiance.index, columns=cols)
+            else:                                                                        # fill in columns of preallocated block
+                for col, val in zip(cols[2:], values[2:]):
+                    if col in self._blockCols:
+                        self._block[:, self._blockCols[col]] = val
+                self._storeOutput(m, values[0], values[1], self._suffix, True)
+                for pv, suffix in self._followers:                                       # split-array followers
+                    if pv._location is self._location and pv._spec.get('clearsky_model') == self._spec.get('clearsky_model'):
+                        pv.irradiance = self.irradiance                                  # same location: irradiance doesn't depend on array
+                    else:
+                        pv._issueSlices = self._issueSlices
+                        pv.getIrradiance(weather, m)
+                    pv._mc.run_model(pv.irradiance)
+                    self._storeOutput(m, pv._getDC(), pv._mc.results.ac, suffix, False)
             self.InfluxFields.append('dc_' + m)
             return self.DataTable
 
@@ -268,74 +346,1070 @@ class PVModel(Forecast):
             print("runModel: " + str(e))
             sys.exit(1)
 
-    def run_allModels(self, weather: Forecast, modelLst = 'all'):
+    def _getDC(self):
+        if (self.pv_model == 'PVWatts'):
+            return self._mc.results.dc
+        else:                                                                            # CEC
+            return self._mc.results.dc.p_mp
+
+    def _storeOutput(self, m, dc, ac, suffix, lead):
+        """Store dc, ac output of one array in self._block: as sum (columns '(dc|ac)_<m>') and/or
+        individually (columns '(dc|ac)_<m><suffix>'), depending on the columns allocated in run_allModels()"""
+
+        for col, val in (('dc_' + m, dc), ('ac_' + m, ac)):
+            if col in self._blockCols:
+                if lead: self._block[:, self._blockCols[col]]  = val
+                else:    self._block[:, self._blockCols[col]] += val                     # add new values to existing sum
+            if suffix is not None and col + suffix in self._blockCols:
+                self._block[:, self._blockCols[col + suffix]] = val
+
+    @_ignoreOverflow
+    def run_allModels(self, weather: Forecast, modelLst = 'all', followers = None):
         """Run all implemented models (default). Alternatively, 'modelLst' can contain a 
         comma separated list of valid models (see self.runModel()) to be calculated
-        
+
+        followers  list of PVModel objects for split-array followers (see run_splitArray())
+
         Populates self.DataTable   pandas dataframe with all simulation results"""
 
-        dfList = []                                                                      # list of calculated models
+        models          = self._modelList(weather, modelLst)
+        cols, colModel  = self._modelColumns(models)
+
+        self._suffix    = None
+        self._followers = []
+        if followers:                                                                    # we have a split-array configuration
+            storage     = self._lead.get('storage', 'sum').lower()                       # 'individual', 'both' or 'sum'
+            pat         = re.compile('^(ac|dc)_')                                        # PV output cols match this regex
+            output      = [ c for c in cols if pat.match(c)]
+            if storage == 'individual' or storage == 'both':
+                self._suffix = '_' + self._lead.get('suffix', '1')                       # determine suffix of first measurement
+                if storage == 'individual':
+                    cols = [ c + self._suffix if c in output else c for c in cols ]      # rename columns to contain suffix
+                else:                                                                    # sum in base cols (without suffix)
+                    cols = cols + [ c + self._suffix for c in output ]
+                colModel.update({ c + self._suffix : colModel[c] for c in output })
+            for pv in followers:
+                suffix  = None
+                if storage == 'individual' or storage == 'both':
+                    suffix = re.search('_.+$', pv._cfg).group(0)                         # must match, since followers are based on 'PVSystem_' regex
+                    cols   = cols + [ c + suffix for c in output ]
+                    colModel.update({ c + suffix : colModel[c] for c in output })
+                self._followers.append((pv, suffix))
+
+        try:
+            maxRows     = self._lead.getint('incrementalRows', 0)
+            if maxRows > 0 and self.cachePath is not None and not self._ensemble:
+                self._runIncremental(weather, models, cols, colModel, maxRows)
+            else:
+                self._runBlock(weather, models, cols, colModel)
+            self.DataTable = pd.DataFrame(self._block, index=weather.DataTable.index, columns=cols)
+        finally:
+            self._block     = None
+            self._blockCols = None
+            self._followers = []
+
+    def _modelList(self, weather: Forecast, modelLst = 'all'):
+        """Irradiance models available for weather data, as requested by 'modelLst'"""
+
+        models = []                                                                      # list of models to calculate
         if 'ghi' in weather.DataTable:                                                   # ---- irrandiance based models
-            dfList.append(self.runModel(weather, 'disc',     modelLst))
-            dfList.append(self.runModel(weather, 'dirint',   modelLst))
-            dfList.append(self.runModel(weather, 'dirindex', modelLst))
-            dfList.append(self.runModel(weather, 'erbs',     modelLst))
-        if 'clouds' in weather.DataTable:
-            dfList.append(self.runModel(weather, 'clearsky_scaling', modelLst))          # ---- cloud based models
-            dfList.append(self.runModel(weather, 'campbell_norman', modelLst))
-        dfList.append(self.runModel(weather, 'clearsky', modelLst))
-        dfList.append(self._mc.results.solar_position.zenith)                            # ---- add solar position
-        self.DataTable = pd.concat(dfList, axis=1)
-        drop           = []
-        for col in self.DataTable:
-            if 'ghi' in col and not (col.startswith('ghi_clearsky') or col.startswith('ghi_campbell')):
-                drop.append(col)                                                         # ghi is input and available from weather data section in output
-        if (len(drop) > 0): self.DataTable = self.DataTable.drop(drop, axis=1)
+            models += ['disc', 'dirint', 'dirindex', 'erbs']
+        if 'clouds' in weather.DataTable:                                                # ---- cloud based models
+            models += ['clearsky_scaling', 'campbell_norman']
+        models.append('clearsky')
+        return [m for m in models if self._selectModel(m, modelLst)]
+
+    def _modelColumns(self, models):
+        """Output columns of run_allModels() for 'models' (in order of models) and dict column --> model"""
+
+        cols     = []                                                                    # output columns, in order of models
+        colModel = {}                                                                    # output column --> irradiance model
+        for m in models:
+            for col in self._resultColumns(m):
+                if 'ghi' in col and not (col.startswith('ghi_clearsky') or col.startswith('ghi_campbell')):
+                    continue                                                             # ghi is input and available from weather data section in output
+                cols.append(col)
+                colModel[col] = m
+        cols.append('zenith')                                                            # ---- add solar position
+        return cols, colModel
+
+    def _runBlock(self, weather: Forecast, models, cols, colModel):
+        """Allocate self._block with columns 'cols' and fill it for 'models', using the configured executor.
+        With [PVSystem] skipNight, night rows are not modelled (see _runDaylight())"""
+
+        if not self._lead.getboolean('skipNight', False):
+            return self._runExecutor(weather, models, cols)
+        influx = list(self.InfluxFields)
+        self._runDaylight(weather, models, cols, colModel)
+        if self._lead.getboolean('checkNight', False):                                   # proof: model all rows and compare
+            daylight          = self._block
+            self.InfluxFields = list(influx)
+            self._runExecutor(weather, models, cols)
+            if np.array_equal(daylight, self._block, equal_nan=True):
+                print("Message - night check: results identical to modelling all rows")
+            else:
+                print("Warning --- night check: results differ from modelling all rows, using results of all rows")
+        return self._block
+
+    def _runExecutor(self, weather: Forecast, models, cols):
+        """Allocate self._block with columns 'cols' and fill it for 'models', using the configured executor"""
+
+        self._blockCols = { col : i for i, col in enumerate(cols) }
+        self._block     = np.empty((len(weather.DataTable), len(cols)))
+        executor        = self._lead.get('executor', 'serial').lower()                   # 'serial', 'stacked' or 'process'
+        if executor == 'stacked' and len(models) > 1:
+            self._runStacked(weather, models)
+        elif executor == 'process' and len(models) > 1:
+            self._runParallel(weather, models)
+            if self._lead.getboolean('checkExecutor', False):                            # determinism check against serial path
+                parallel    = self._block.copy()
+                self.InfluxFields = []
+                self._runSerial(weather, models)
+                if np.array_equal(parallel, self._block, equal_nan=True):
+                    print("Message - executor check: parallel results identical to serial results")
+                else:
+                    print("Warning --- executor check: parallel results differ from serial results, using serial results")
+        else:
+            self._runSerial(weather, models)
+        return self._block
+
+    def _runDaylight(self, weather: Forecast, models, cols, colModel):
+        """Fill self._block, modelling daylight rows only. Night rows (solar zenith >= 90° + [PVSystem] nightMargin
+        and no ghi) get the output of arrays without irradiance: zero, except ac of CEC inverters (night 
+        consumption). 'dirint' and 'dirindex' depend on adjacent time steps and are modelled on all rows"""
+
+        influx  = list(self.InfluxFields)
+        data    = weather.DataTable
+        zenith  = np.asarray(self._zenith(data))
+        night   = zenith >= 90 + self._lead.getfloat('nightMargin', 2)
+        if 'ghi' in data:
+            night = night & (data['ghi'].values == 0)
+        full    = [m for m in models if m == 'dirint' or m == 'dirindex']
+        day     = [m for m in models if m not in full]
+        if not night.any() or len(day) == 0:
+            return self._runExecutor(weather, models, cols)
+
+        self._blockCols = { col : i for i, col in enumerate(cols) }                     # output of a night row
+        self._block     = np.zeros((1, len(cols)))
+        for m in models:
+            self._storeOutput(m, 0, self._nightAC(), self._suffix, True)
+            for pv, suffix in self._followers:
+                self._storeOutput(m, 0, pv._nightAC(), suffix, False)
+        block           = np.empty((len(data), len(cols)))
+        block[night]    = self._block[0]
+
+        if len(full) > 0:
+            sub = self._runExecutor(weather, full, cols)
+            idx = [i for i, c in enumerate(cols) if colModel.get(c) in full]
+            block[:, idx] = sub[:, idx]
+        if not night.all():
+            rows           = Forecast()
+            rows.DataTable = data[~night]
+            rows.IssueTime = weather.IssueTime
+            rows.SQLTable  = weather.SQLTable
+            sub = self._runExecutor(rows, day, cols)
+            idx = [i for i, c in enumerate(cols) if colModel.get(c) in day]
+            block[np.ix_(~night, idx)] = sub[:, idx]
+        block[:, cols.index('zenith')] = zenith
+        self._blockCols = { col : i for i, col in enumerate(cols) }
+        self._block     = block
+        self._setResultInfo(weather, influx + ['dc_' + m for m in models])
+        return self._block
+
+    def _nightAC(self):
+        """AC output of this array without DC input (PVWatts: 0, CEC: night consumption of inverter)"""
+
+        if (self.pv_model == 'PVWatts'):
+            return float(self._pvsystem.get_ac('pvwatts', 0.0))
+        else:                                                                            # CEC
+            return float(self._pvsystem.get_ac('sandia', 0.0, 0.0))
+
+    def _zenith(self, weatherData):
+        """Solar zenith for weatherData, as calculated by ModelChain from irradiance data of getIrradiance()"""
+
+        temperature       = 12
+        if 'temp_air' in weatherData and 'wind_speed' in weatherData:
+            temperature   = weatherData['temp_air'] - 273.15
+        return self._location.get_solarposition(weatherData.index, temperature=temperature)['zenith']
+
+    def _setResultInfo(self, weather: Forecast, influxFields):
+        """Set InfluxFields, IssueTime and SQLTable, as modelling with runModel() does"""
+
+        self.InfluxFields = influxFields
+        self.IssueTime    = weather.IssueTime
+        if (weather.SQLTable == 'dwd_s'):                                                # as in getIrradiance()
+            self.SQLTable = self._cfg.lower() + '_s'
+
+    def _runIncremental(self, weather: Forecast, models, cols, colModel, maxRows):
+        """Fill self._block, re-using results of earlier runs for unchanged weather rows (see _RowMemo). 
+        Only rows not found in the memo are modelled. 'dirint' and 'dirindex' depend on adjacent
+        time steps and are always modelled"""
+
+        influx  = list(self.InfluxFields)
+        memo    = _RowMemo(os.path.join(self.cachePath, 'rows_' + self._configHash() + '.pkl'), maxRows)
+        n       = len(weather.DataTable)
+        block   = np.empty((n, len(cols)))
+        mcols   = { m : [i for i, c in enumerate(cols) if colModel.get(c) == m] for m in models }
+        full    = [m for m in models if m == 'dirint' or m == 'dirindex']
+        cached  = [m for m in models if m not in full]
+        keys    = {}
+        missing = np.zeros(n, dtype=bool)
+        for m in cached:
+            keys[m] = memo.keys(weather.DataTable, m)
+            for i, key in enumerate(keys[m]):
+                val = memo.get(key)
+                if val is None: missing[i]        = True
+                else:           block[i, mcols[m]] = val
+
+        if len(full) > 0:
+            sub = self._runBlock(weather, full, cols, colModel)
+            for m in full:
+                block[:, mcols[m]] = sub[:, mcols[m]]
+        if missing.any():                                                                # model only new or changed rows
+            rows              = Forecast()
+            rows.DataTable    = weather.DataTable[missing]
+            rows.IssueTime    = weather.IssueTime
+            rows.SQLTable     = weather.SQLTable
+            sub               = self._runBlock(rows, cached, cols, colModel)
+            pos               = np.flatnonzero(missing)
+            for m in cached:
+                block[pos[:, None], mcols[m]] = sub[:, mcols[m]]
+                for j, i in enumerate(pos):
+                    memo.put(keys[m][i], sub[j, mcols[m]])
+        memo.save()
+
+        block[:, cols.index('zenith')] = self._zenith(weather.DataTable)                 # solar position as used by ModelChain
+        self._blockCols   = { col : i for i, col in enumerate(cols) }
+        self._block       = block
+        self._setResultInfo(weather, influx + ['dc_' + m for m in models])
+
+    def _configHash(self):
+        """Hash over all PVSystem sections of config file (except keys controlling execution) and pvlib version"""
+
+        skip = ['executor', 'workers', 'checkexecutor', 'incrementalrows', 'cachepath', 'skipnight', 'nightmargin', 'checknight', 'geometrycache',
+                'ensemble', 'ensemblequantiles', 'ensembleclouds', 'ensembleghi', 'ensemblecorrelation', 'ensembleseed']
+        h    = hashlib.blake2b(pvlib.__version__.encode(), digest_size=8)
+        for section in self.config.sections():
+            if section == 'PVSystem' or section.startswith('PVSystem_'):
+                items = [item for item in _SystemSpec(self.config, section).items() if item[0] not in skip]
+                h.update(repr((section, sorted(items))).encode())
+        return h.hexdigest()
         
+    def _runSerial(self, weather: Forecast, models):
+        """Run 'models' one after another, filling self._block"""
+
+        for m in models:
+            self.runModel(weather, m)
+        self._block[:, self._blockCols['zenith']] = self._mc.results.solar_position.zenith
+
+    def _stackIrradiance(self, weather: Forecast, models):
+        """Irradiance data of all 'models', stacked in order of models (index PeriodEnd repeats for each model)"""
+
+        irradiance = []
+        for m in models:
+            self.getIrradiance(weather, m)
+            irradiance.append(self.irradiance)
+        return pd.concat(irradiance)
+
+    def _runStacked(self, weather: Forecast, models):
+        """Run 'models' as one (time x model) block through one ModelChain.run_model() call per array
+        (POA transposition, cell temperature, DC and AC are elementwise). Fills self._block"""
+
+        n       = len(weather.DataTable)
+        stacked = self._stackIrradiance(weather, models)
+        for i, m in enumerate(models):                                                   # irradiance columns
+            for col in ['ghi', 'dni', 'dhi', 'kt']:
+                if col + '_' + m in self._blockCols:
+                    self._block[:, self._blockCols[col + '_' + m]] = stacked[col].values[i*n:(i+1)*n]
+        arrays  = [(self, self._suffix, True, stacked)]
+        for pv, suffix in self._followers:                                               # split-array followers
+            if pv._location is self._location and pv._spec.get('clearsky_model') == self._spec.get('clearsky_model'):
+                arrays.append((pv, suffix, False, stacked))                              # same location: irradiance doesn't depend on array
+            else:
+                pv._issueSlices = self._issueSlices
+                arrays.append((pv, suffix, False, pv._stackIrradiance(weather, models)))
+        for pv, suffix, lead, irradiance in arrays:
+            pv._mc.run_model(irradiance)
+            dc  = np.asarray(pv._getDC())
+            ac  = np.asarray(pv._mc.results.ac)
+            for i, m in enumerate(models):
+                self._storeOutput(m, dc[i*n:(i+1)*n], ac[i*n:(i+1)*n], suffix, lead)
+        for m in models:
+            self.InfluxFields.append('dc_' + m)
+        self._block[:, self._blockCols['zenith']] = self._mc.results.solar_position.zenith.values[-n:]
+
+    def _runParallel(self, weather: Forecast, models):
+        """Run 'models' in a process pool (one task per model, covering all split-arrays) and 
+        merge results into self._block. Worker count is set with [PVSystem] workers (default: all cores)"""
+
+        config  = { 'DEFAULT': dict(self.config.defaults()) }                            # ConfigParser objects don't travel well between processes
+        for section in self.config.sections():
+            config[section] = dict(self.config._sections[section])                       # raw own items, workers interpolate again
+        config['PVSystem']['executor'] = 'serial'                                        # no nested pools in workers
+        task          = Forecast()                                                       # stripped-down weather data
+        task.DataTable = weather.DataTable
+        task.IssueTime = weather.IssueTime
+        task.SQLTable  = weather.SQLTable
+        followers     = [pv._cfg for pv, suffix in self._followers]
+
+        workers = self._lead.getint('workers', 0)
+        if workers <= 0: workers = None                                                  # default: number of CPUs
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(_runModelTask, config, task, self._issueSlices, followers, m) for m in models]
+            for m, future in zip(models, futures):                                       # merge in fixed order of models
+                result, influxFields, self.SQLTable = future.result()
+                for col in result:
+                    self._block[:, self._blockCols[col]] = result[col]
+                self.InfluxFields.append('dc_' + m)
+        self.IssueTime = weather.IssueTime
+
     def run_splitArray(self, weather: Forecast, modelLst = 'all'):
+        """Run all models (see run_allModels()) for lead array 'PVSystem' and all split-array 
+        followers 'PVSystem_<suffix>' in one pass; irradiance data is shared between arrays"""
+
         try:
             if self._cfg != 'PVSystem':
                 sys.tracebacklimit=0
                 raise Exception ("ERROR --- run_splitArray can only be called on lead array 'PVSystem', not " + self._cfg)
-            self.run_allModels(weather, modelLst)
             pat       = re.compile('^PVSystem_')
-            followers = [elem for elem in self.config.sections() if pat.match(elem)]
-
-            if len(followers) > 0:                                                       # we have a split-array configuration
-                storage        = self.config['PVSystem'].get('storage', 'sum').lower()   # 'individual', 'both' or 'sum'
-                pat            = re.compile('^(ac|dc)_')                                 # PV output cols match this regex
-                output         = [ c for c in list(self.DataTable) if pat.match(c)]
-                if storage == 'individual' or storage == 'both':
-                    suffix     = '_' + self.config['PVSystem'].get('suffix', '1')        # determine suffix of first measurement
-                    rename     = { c : c + suffix for c in output }
-                    if storage == 'individual':
-                        self.DataTable.rename(columns = rename, inplace = True)          # rename columns to contain suffix
-                    else:                                                                # initialize a copy of the output columns
-                        df     = self.DataTable[output].copy()
-                        df.rename(columns = rename, inplace = True)
-                        self.DataTable    = self.DataTable.join(df, how='inner')         # this basically duplicates output columns; we'll add follower results to base cols (without suffix)
-
-                for elem in followers:
-                    pv         = PVModel(self.config, elem)
-                    pv.run_allModels(weather, modelLst)
-                    df         = pv.DataTable[output].copy()                             # get only output columns
-                    if storage == 'both' or storage == 'sum':
-                        self.DataTable[output] = self.DataTable[output] + df             # add new values to existing sum
-                        pass
-                    if storage == 'individual' or storage == 'both':
-                        suffix = re.search('_.+$', elem).group(0)                        # must match, since we built 'followers' based on 'PVSystem_' regex
-                        rename = { c : c + suffix for c in output }
-                        df.rename(columns = rename, inplace = True)                      # rename columns to contain suffix
-                        self.DataTable = self.DataTable.join(df, how = 'inner')          # ... and join up
-
+            followers = [PVModel(self.config, elem) for elem in self.config.sections() if pat.match(elem)]
+            self.run_allModels(weather, modelLst, followers)
+            if len(followers) > 0:
                 pat = re.compile('^dc_')
                 self.InfluxFields = [ c for c in self.DataTable.columns if pat.match(c)]
-                pass
+            if self._lead.getint('ensemble', 0) > 0:
+                self._runEnsemble(weather, modelLst, followers)
 
         except Exception as e:
             print ("run_splitArray: " + str(e))
             sys.exit(1)
+
+    def _runEnsemble(self, weather: Forecast, modelLst, followers):
+        """Add quantiles of an ensemble of perturbed weather data to self.DataTable: columns 'ac_<model>_p<q>'
+        follow each column 'ac_<model>' (q from [PVSystem] ensembleQuantiles). All members are stacked and 
+        modelled in one pass, as run_backtest() does for forecast issues (see _ensembleWeather())"""
+
+        members           = self._lead.getint('ensemble')
+        quantiles         = [float(q) for q in self._lead.get('ensembleQuantiles', '10, 50, 90').split(',')]
+        result            = self.DataTable
+        influxFields      = list(self.InfluxFields)
+        issueSlices       = self._issueSlices
+        n                 = len(weather.DataTable)
+        base              = issueSlices if issueSlices is not None else [slice(0, n)]
+        self._issueSlices = [slice(k*n + i.start, k*n + i.stop) for k in range(members) for i in base]
+        self._ensemble    = True                                                         # perturbed rows are not worth memoizing (see _runIncremental())
+        try:
+            self.run_allModels(self._ensembleWeather(weather, members), modelLst, followers)
+            ensemble = self.DataTable
+        finally:
+            self._ensemble    = False
+            self._issueSlices = issueSlices
+            self.DataTable    = result
+            self.InfluxFields = influxFields
+
+        cols = []
+        for col in result.columns:
+            cols.append(col)
+            if col.startswith('ac_'):
+                values = ensemble[col].values.reshape(members, n)
+                for q in quantiles:
+                    name         = col + '_p' + ('%g' % q)
+                    result[name] = np.quantile(values, q/100, axis=0)
+                    cols.append(name)
+        self.DataTable = result[cols]
+
+    def _ensembleWeather(self, weather: Forecast, members):
+        """Stacked weather data of ensemble members (in order of members, each a copy of weather.DataTable).
+        'clouds' and 'ghi' are perturbed with Gaussian noise, correlated over time steps (AR(1) process):
+            clouds    + ensembleClouds * noise    [%], clipped to 0 .. 100
+            ghi * (1 - ensembleGHI    * noise),       clipped to >= 0  (more clouds, less irradiance)
+        Noise is reproducible with ensembleSeed"""
+
+        data    = weather.DataTable
+        n       = len(data)
+        phi     = self._lead.getfloat('ensembleCorrelation', 0.7)                        # correlation of noise between time steps
+        rng     = np.random.default_rng(self._lead.getint('ensembleSeed', 0))
+        z       = rng.standard_normal((members, n))
+        noise   = np.empty((members, n))
+        noise[:, 0] = z[:, 0]
+        for i in range(1, n):
+            noise[:, i] = phi * noise[:, i-1] + np.sqrt(1 - phi**2) * z[:, i]            # stationary, variance 1
+        stacked = pd.DataFrame(np.tile(data.values, (members, 1)), index=data.index[np.tile(np.arange(n), members)], columns=data.columns)
+        if 'clouds' in data:
+            clouds            = data['clouds'].values + self._lead.getfloat('ensembleClouds', 10) * noise
+            stacked['clouds'] = np.clip(clouds, 0, 100).ravel()
+        if 'ghi' in data:
+            ghi               = data['ghi'].values * (1 - self._lead.getfloat('ensembleGHI', 0.15) * noise)
+            stacked['ghi']    = np.clip(ghi, 0, None).ravel()
+        result           = Forecast()
+        result.DataTable = stacked
+        result.IssueTime = weather.IssueTime
+        result.SQLTable  = weather.SQLTable
+        return result
+
+    def run_backtest(self, weathers, modelLst = 'all'):
+        """Run run_splitArray() for a list of weather objects (eg. archived forecast issues) in one 
+        vectorized pass: weather data is stacked (in order of the list), modelled once and results 
+        are merged back into each weather object (as merge_PVSim() does).
         
+        All weather objects must have the same columns in their DataTable"""
+
+        try:
+            if len(weathers) == 0:
+                return
+            cols = list(weathers[0].DataTable)
+            for weather in weathers:
+                if list(weather.DataTable) != cols:
+                    sys.tracebacklimit=0
+                    raise Exception("ERROR --- all weather data must have the same columns, found differences at " + weather.IssueTime)
+            stacked           = Forecast()
+            stacked.DataTable = pd.concat([weather.DataTable for weather in weathers])   # index PeriodEnd is not unique, (IssueTime, PeriodEnd) is
+            stacked.IssueTime = weathers[0].IssueTime
+            stacked.SQLTable  = weathers[0].SQLTable
+            self._issueSlices = []
+            start             = 0
+            for weather in weathers:
+                self._issueSlices.append(slice(start, start + len(weather.DataTable)))
+                start         = start + len(weather.DataTable)
+            self.run_splitArray(stacked, modelLst)
+            for weather, i in zip(weathers, self._issueSlices):                           # scatter results back to issues
+                weather.DataTable    = pd.concat([weather.DataTable, self.DataTable.iloc[i]], axis=1)
+                weather.InfluxFields = self.InfluxFields
+        except Exception as e:
+            print ("run_backtest: " + str(e))
+            sys.exit(1)
+        finally:
+            self._issueSlices = None
+
+def _tmpFile(file):
+    """Name of temporary file for writing 'file', unique per process and thread"""
+    return file + '.' + str(os.getpid()) + '_' + str(threading.get_ident()) + '.tmp'
+
+def _runModelTask(config, weather, issueSlices, followers, model):
+    """Worker task of PVModel._runParallel(): run one irradiance model for lead array and
+    split-array followers; returns DataTable, InfluxFields and SQLTable"""
+
+    cfg            = configparser.ConfigParser()
+    cfg.read_dict(config)
+    pv             = PVModel(cfg)
+    pv._issueSlices = issueSlices
+    pv.run_allModels(weather, model, [PVModel(cfg, elem) for elem in followers])
+    return pv.DataTable, pv.InfluxFields, pv.SQLTable
+
+class _SystemSpec():
+    """Immutable, pre-parsed settings of PV system section [<section>] of a config file. Values are resolved
+    once, in order of precedence: [<section>], [PVSystem] (for split-array followers [PVSystem_<suffix>]),
+    [DEFAULT], built-in defaults. The config file object itself is never modified, so that PVModel objects
+    can be created and run concurrently on the same config.
+
+    Provides the getters of configparser section proxies: get(), getint(), getfloat(), getboolean()"""
+
+    _DEFAULTS = { 'nominalefficiency' : '0.96',                                          # nominal inverter efficiency, default of pvwatts model
+                  'temperaturecoeff'  : '-0.005',                                        # temperature coefficient of module, default of pvwatts model
+                  'temperaturemodel'  : 'open_rack_glass_glass',                         # https://pvlib-python.readthedocs.io/en/stable/generated/pvlib.temperature.sapm_cell.html
+                  'clearsky_model'    : 'simplified_solis',                              # default clearsky model
+                  'altitude'          : '0',                                             # default altitude sea level
+                  'model'             : 'PVWatts' }                                      # default PV modeling stratey
+
+    def __init__(self, config, section):
+        values = dict(self._DEFAULTS)
+        values.update(self.ownItems(config, config.default_section))
+        if section != 'PVSystem':
+            values.update(self.ownItems(config, 'PVSystem'))
+        values.update(self.ownItems(config, section))
+        self.section = section
+        self._values = MappingProxyType(values)
+
+    @staticmethod
+    def ownItems(config, section):
+        """Items defined in [section] itself (not inherited from [DEFAULT]), with interpolated values where possible"""
+
+        if section == config.default_section:
+            own = config.defaults()
+        else:
+            own = config._sections.get(section, {})                                      # configparser has no public access to own items
+        items = []
+        for key, raw in own.items():
+            try:
+                items.append((key, config.get(section, key)))
+            except configparser.Error:                                                   # eg. '%' in passwords
+                items.append((key, raw))
+        return items
+
+    def items(self):
+        return list(self._values.items())
+
+    def get(self, key, fallback = None):
+        return self._values.get(key.lower(), fallback)
+
+    def getint(self, key, fallback = None):
+        val = self.get(key)
+        return fallback if val is None else int(val)
+
+    def getfloat(self, key, fallback = None):
+        val = self.get(key)
+        return fallback if val is None else float(val)
+
+    def getboolean(self, key, fallback = None):
+        val = self.get(key)
+        if val is None:
+            return fallback
+        if val.lower() not in configparser.ConfigParser.BOOLEAN_STATES:
+            raise ValueError('Not a boolean: ' + val)
+        return configparser.ConfigParser.BOOLEAN_STATES[val.lower()]
+
+class _ArrayChain():
+    """Array based stand-in for the ModelChain configurations of PVModel (one fixed array, aoi 'physical', 
+    no spectral losses, temperature 'sapm'). Calculation steps are those of ModelChain.run_model(), but on 
+    plain ndarrays, avoiding the overhead of pandas alignment, input validation and result objects.
+    Subclasses implement DC and AC modelling in _dcac().
+
+    Implements the part of ModelChain used by PVModel: run_model() and results.dc, .ac, .solar_position"""
+
+    def __init__(self, system, location, transposition_model, airmass_model = 'kastenyoung1989'):
+        self.system              = system
+        self.location            = location
+        self.transposition_model = transposition_model
+        self.airmass_model       = airmass_model
+        self.results             = SimpleNamespace(dc = None, ac = None, solar_position = None)
+        self._array              = system.arrays[0]
+
+    def run_model(self, weather):
+        """Model PV output for weather (DataFrame with columns 'ghi', 'dni', 'dhi' and optionally 'temp_air', 'wind_speed')"""
+
+        times     = weather.index
+        if 'temp_air' in weather:
+            solpos   = self.location.get_solarposition(times, temperature=weather['temp_air'])
+            temp_air = weather['temp_air'].to_numpy(dtype=float)
+        else:
+            solpos   = self.location.get_solarposition(times)
+            temp_air = 20.
+        wind_speed = weather['wind_speed'].to_numpy(dtype=float) if 'wind_speed' in weather else 0.
+        zenith     = solpos['apparent_zenith'].to_numpy()
+        azimuth    = solpos['azimuth'].to_numpy()
+        airmass    = self.location.get_airmass(solar_position=solpos, model=self.airmass_model)['airmass_relative'].to_numpy()
+        dni_extra  = np.asarray(self.location.get_extra_radiation(times))
+        dni        = weather['dni'].to_numpy(dtype=float)
+        ghi        = weather['ghi'].to_numpy(dtype=float)
+        dhi        = weather['dhi'].to_numpy(dtype=float)
+
+        tilt       = self._array.mount.surface_tilt
+        orient     = self._array.mount.surface_azimuth
+        aoi        = irradiance.aoi(tilt, orient, zenith, azimuth)
+        sky        = irradiance.get_sky_diffuse(tilt, orient, zenith, azimuth, dni, ghi, dhi, 
+                                                dni_extra=dni_extra, airmass=airmass, model=self.transposition_model)
+        ground     = irradiance.get_ground_diffuse(tilt, ghi, self._array.albedo)
+        poa        = irradiance.poa_components(aoi, dni, sky, ground)
+        fd         = self._array.module_parameters.get('FD', 1.)
+        effective  = poa['poa_direct'] * self._array.get_iam(aoi, 'physical') + fd * poa['poa_diffuse']
+        params     = self._array.temperature_model_parameters
+        temp_cell  = pvlib.temperature.sapm_cell(poa['poa_global'], temp_air, wind_speed, params['a'], params['b'], params['deltaT'])
+        self.results.solar_position = solpos
+        self.results.dc, self.results.ac = self._dcac(effective, temp_cell, times)
+        return self
+
+class _PVWattsChain(_ArrayChain):
+    """Stand-in for ModelChain.with_pvwatts() as configured in PVModel._init_PVWatts(): transposition 'perez',
+    pvwatts DC, losses and AC models (see _ArrayChain)"""
+
+    def __init__(self, system, location):
+        super().__init__(system, location, 'perez')
+        self._losses = (100 - system.pvwatts_losses()) / 100.                            # as ModelChain.pvwatts_losses()
+
+    def _dcac(self, effective, temp_cell, times):
+        module = self._array.module_parameters
+        dc     = pvlib.pvsystem.pvwatts_dc(effective, temp_cell, module['pdc0'], module['gamma_pdc']) * self._losses
+        ac     = self.system.get_ac('pvwatts', dc)
+        return dc, np.where(np.isnan(ac), 0, ac)                                         # as ModelChain.pvwatts_inverter()
+
+class _CECSurrogateChain(_ArrayChain):
+    """Stand-in for ModelChain as configured in PVModel._init_CEC() (transposition 'haydavies', see _ArrayChain),
+    replacing the single-diode solution and Sandia inverter model by bilinear interpolation in a table of
+    DC and AC output over effective irradiance and cell temperature.
+
+    The table is calculated once per module, inverter and string layout (and pvlib version), memoized 
+    in-process and stored at <cachePath>/cec_surrogate_<hash>.pkl. Inputs outside the table are clipped
+    to its range. See debug/cec_surrogate_report.py for errors against the exact model"""
+
+    _E_GRID = np.concatenate([np.arange(0., 50., 1.), np.arange(50., 1601., 5.)])       # effective irradiance [W/m2]: finer at low irradiance
+    _T_GRID = np.arange(-40., 101., 1.)                                                  # cell temperature [C]
+    _tables = {}                                                                         # hash --> (p_mp, ac) tables
+
+    def __init__(self, system, location, cachePath = None):
+        super().__init__(system, location, 'haydavies')
+        self.cachePath = cachePath
+        self._p_mp, self._ac = self._getTable()
+
+    def exact(self, effective, temp_cell):
+        """DC (p_mp) and AC output for arrays of effective irradiance and cell temperature, as calculated by ModelChain"""
+
+        params = self.system.calcparams_cec(effective, temp_cell)
+        dc     = pd.DataFrame(self.system.singlediode(*params))
+        dc     = self.system.scale_voltage_current_power(dc).fillna(0)                   # as ModelChain._singlediode()
+        ac     = self.system.get_ac('sandia', dc['p_mp'], v_dc=dc['v_mp'])
+        return dc['p_mp'].to_numpy(), np.asarray(ac)
+
+    def _getTable(self):
+        h = hashlib.blake2b(repr((pvlib.__version__, 
+                                  sorted(self._array.module_parameters.items()), 
+                                  sorted(self.system.inverter_parameters.items()),
+                                  self._array.modules_per_string, self._array.strings,
+                                  self._E_GRID.tobytes(), self._T_GRID.tobytes())).encode(), digest_size=8).hexdigest()
+        if h in self._tables:
+            return self._tables[h]
+        file = None
+        if self.cachePath is not None:
+            file = os.path.join(self.cachePath, 'cec_surrogate_' + h + '.pkl')
+            try:
+                with open(file, 'rb') as f:
+                    self._tables[h] = pickle.load(f)
+                    return self._tables[h]
+            except Exception:                                                            # not yet calculated
+                pass
+        E, T        = np.meshgrid(self._E_GRID, self._T_GRID, indexing='ij')
+        with np.errstate(divide='ignore', invalid='ignore', over='ignore'):              # single-diode solution at zero irradiance
+            p_mp, ac    = self.exact(E.ravel(), T.ravel())
+        self._tables[h] = (p_mp.reshape(E.shape), ac.reshape(E.shape))
+        if file is not None:
+            try:
+                os.makedirs(self.cachePath, exist_ok=True)
+                tmp = _tmpFile(file)
+                with open(tmp, 'wb') as f:
+                    pickle.dump(self._tables[h], f)
+                os.replace(tmp, file)                                                    # don't leave partially written files
+            except Exception as e:
+                print("Warning --- can't write CEC surrogate table " + file + ": " + str(e))
+        return self._tables[h]
+
+    def _dcac(self, effective, temp_cell, times):
+        effective = np.asarray(effective, dtype=float)
+        temp_cell = np.asarray(temp_cell, dtype=float)
+        invalid   = np.isnan(effective) | np.isnan(temp_cell)                            # ModelChain results in zero DC output
+        e         = np.clip(np.where(invalid, 0, effective), self._E_GRID[0], self._E_GRID[-1])
+        t         = np.clip(np.where(invalid, 25, temp_cell), self._T_GRID[0], self._T_GRID[-1])
+        i         = np.clip(np.searchsorted(self._E_GRID, e, side='right') - 1, 0, len(self._E_GRID) - 2)
+        j         = np.clip(np.searchsorted(self._T_GRID, t, side='right') - 1, 0, len(self._T_GRID) - 2)
+        fe        = (e - self._E_GRID[i]) / (self._E_GRID[i+1] - self._E_GRID[i])
+        ft        = (t - self._T_GRID[j]) / (self._T_GRID[j+1] - self._T_GRID[j])
+        result    = []
+        for table in (self._p_mp, self._ac):
+            result.append((table[i, j]   * (1 - fe) + table[i+1, j]   * fe) * (1 - ft) +
+                          (table[i, j+1] * (1 - fe) + table[i+1, j+1] * fe) * ft)
+        return pd.DataFrame({ 'p_mp' : result[0] }, index=times), result[1]
+
+class _RowMemo():
+    """Persistent memo of modelled rows, see PVModel._runIncremental(). Rows are identified by a hash
+    over irradiance model, PeriodEnd and weather parameters. The memo is stored as pickle file
+    (one file per PV system configuration) and holds at most maxRows rows (least recently used
+    rows are evicted)"""
+
+    _weatherCols = ['temp_air', 'temp_dew', 'pressure', 'wind_speed', 'ghi', 'clouds']
+
+    def __init__(self, file, maxRows):
+        self.file    = file
+        self.maxRows = maxRows
+        self._rows   = OrderedDict()                                                     # key --> model results as bytes (float64)
+        try:
+            with open(file, 'rb') as f:
+                self._rows = pickle.load(f)
+        except Exception:                                                                # no memo yet (or unreadable)
+            pass
+
+    def keys(self, weatherData, model):
+        """keys for all rows of weatherData (pandas DataFrame) for irradiance model 'model'"""
+
+        cols = [c for c in self._weatherCols if c in weatherData]
+        data = np.column_stack([weatherData.index.asi8.view(np.float64)] + [weatherData[c].to_numpy(dtype=float) for c in cols])
+        head = (model + ':' + ','.join(cols)).encode()
+        return [hashlib.blake2b(head + row.tobytes(), digest_size=16).digest() for row in data]
+
+    def get(self, key):
+        val = self._rows.get(key)
+        if val is None:
+            return None
+        self._rows.move_to_end(key)
+        return np.frombuffer(val)
+
+    def put(self, key, val):
+        self._rows[key] = np.asarray(val, dtype=np.float64).tobytes()
+        self._rows.move_to_end(key)
+
+    def save(self):
+        while len(self._rows) > self.maxRows:
+            self._rows.popitem(last=False)
+        try:
+            os.makedirs(os.path.dirname(self.file), exist_ok=True)
+            tmp = _tmpFile(self.file)
+            with open(tmp, 'wb') as f:
+                pickle.dump(self._rows, f)
+            os.replace(tmp, self.file)                                                   # don't leave partially written files
+        except Exception as e:
+            print("Warning --- can't write row memo " + self.file + ": " + str(e))
+
+class _CECDatabase():
+    """Access to pvlib CEC module and inverter databases (pvlib.pvsystem.retrieve_sam()), avoiding
+    re-parsing the large .csv files for every PVModel object.
+
+    Parameters of requested modules/inverters are memoized in-process and stored as small pickle 
+    files at <cachePath>/cec_<pvlib version>/<db>/<name>.pkl. Caches of other pvlib versions are
+    removed when a new entry is stored."""
+
+    _tables = {}                                                                         # db --> DataFrame as read by retrieve_sam()
+    _memo   = {}                                                                         # (db, name) --> Series with parameters
+
+    @classmethod
+    def get(cls, db, name, cachePath = None):
+        """Parameters of 'name' in CEC database 'db' ('cecmod' or 'cecinverter'); KeyError if 'name' doesn't exist"""
+
+        if (db, name) in cls._memo:
+            return cls._memo[(db, name)]
+        file = None
+        if cachePath is not None and re.match(r'^[\w\-.]+$', name):
+            path = os.path.join(cachePath, 'cec_' + pvlib.__version__, db)
+            file = os.path.join(path, name + '.pkl')
+            try:
+                with open(file, 'rb') as f:
+                    cls._memo[(db, name)] = pickle.load(f)
+                    return cls._memo[(db, name)]
+            except Exception:                                                            # not (or not readable) in cache
+                pass
+        if db not in cls._tables:
+            cls._tables[db] = pvlib.pvsystem.retrieve_sam(db)
+        cls._memo[(db, name)] = cls._tables[db][name]
+        if file is not None:
+            try:
+                for f in os.listdir(cachePath):                                          # evict caches of other pvlib versions
+                    if f.startswith('cec_') and f != 'cec_' + pvlib.__version__:
+                        for root, dirs, files in os.walk(os.path.join(cachePath, f), topdown=False):
+                            for elem in files: os.remove(os.path.join(root, elem))
+                            os.rmdir(root)
+            except Exception:
+                pass
+            try:
+                os.makedirs(path, exist_ok=True)
+                tmp = _tmpFile(file)
+                with open(tmp, 'wb') as f:
+                    pickle.dump(cls._memo[(db, name)], f)
+                os.replace(tmp, file)                                                    # don't leave partially written files
+            except Exception as e:
+                print("Warning --- can't write CEC cache " + file + ": " + str(e))
+        return cls._memo[(db, name)]
+
+class _SolarGeometry():
+    """Stand-in for pvlib.location.Location, which memoizes solar geometry (solar position,
+    clearsky, airmass and extraterrestrial radiation) per time index.
+
+    One instance exists per location and solar position backend (see for_location()), so that 
+    all irradiance models of a PVModel and all split-array followers at the same location share 
+    the results. Results are kept for the last _MAX_TIMES time indices (LRU). Everything not 
+    memoized is delegated to the underlying Location object.
+    
+    Solar position backends ([PVSystem] solarPosition):
+        'nrel_numpy', 'nrel_numba', 'ephemeris', 'pyephem'   see pvlib.solarposition.get_solarposition()
+        'table'                                              interpolation in an annual table at 10min resolution,
+                                                             calculated once per location and stored at cachePath
+    
+    With [PVSystem] geometryCache, solar position, extraterrestrial radiation and clearsky irradiance are 
+    also kept on disk (see _GeometryCache)"""
+
+    _MAX_TIMES  = 4                                                                      # number of time indices kept per location
+    _METHODS    = ['nrel_numpy', 'nrel_numba', 'ephemeris', 'pyephem', 'table']
+    _geometries = {}                                                                     # (latitude, longitude, altitude, method) --> _SolarGeometry
+    _lock       = threading.RLock()                                                      # guards _memo of all instances (PVModel objects may run in threads)
+
+    @classmethod
+    def for_location(cls, latitude, longitude, altitude, method = 'nrel_numpy', cachePath = None, persist = False):
+        method = method.lower()
+        if method not in cls._METHODS:
+            sys.tracebacklimit=0
+            raise Exception("ERROR --- unknown solarPosition '" + method + "', must be one of " + ', '.join(cls._METHODS))
+        if method == 'nrel_numba' or method == 'pyephem':                                # optional libraries
+            try:
+                if method == 'nrel_numba': import numba
+                else:                      import ephem
+            except ImportError:
+                print("Warning --- solarPosition '" + method + "' requires library '" + ('numba' if method == 'nrel_numba' else 'ephem') + "', using 'nrel_numpy'")
+                method = 'nrel_numpy'
+        if persist and (cachePath is None or method not in _GeometryCache._METHODS):
+            print("Warning --- geometryCache requires cachePath and solarPosition '" + "' or '".join(_GeometryCache._METHODS) + "', ignored")
+            persist = False
+        key = (latitude, longitude, altitude, method, cachePath if persist else None)
+        if key not in cls._geometries:
+            geometry = cls(Location(latitude  = latitude,
+                                    longitude = longitude,
+                                    altitude  = altitude,
+                                    tz='UTC'),                                           # let's stay in UTC for the entire time ...
+                           method, cachePath, persist)
+            cls._geometries.setdefault(key, geometry)                                    # first one wins if threads race
+        return cls._geometries[key]
+
+    def __init__(self, location, method = 'nrel_numpy', cachePath = None, persist = False):
+        self.location  = location
+        self.method    = method
+        self.cachePath = cachePath
+        self._memo     = OrderedDict()                                                   # key(times) --> { (what, key(args)) : result }
+        self._table    = None                                                            # annual solar position table, for method = 'table'
+        self._disk     = _GeometryCache(self) if persist else None                       # persistent geometry cache
+
+    def __getattr__(self, name):
+        if name == 'location':                                                           # not yet initialized (eg. during unpickling)
+            raise AttributeError(name)
+        return getattr(self.location, name)
+
+    def _refract(self, solar_position, pressure, temperature):
+        """Apparent elevation and zenith of 'solar_position' for actual pressure [Pa] and temperature [C],
+        using the refraction correction of pvlib.spa.atmospheric_refraction_correction() (which, compiled 
+        with numba, doesn't accept arrays)"""
+
+        result    = solar_position.copy()
+        elevation = solar_position['elevation'].values
+        pressure  = np.asarray(pressure, dtype=float)/100                                # spa uses millibars
+        switch    = elevation >= -1.0 * (0.26667 + 0.5667)                               # no correction below horizon
+        delta     = ((pressure / 1010.0) * (283.0 / (273 + np.asarray(temperature, dtype=float))) * 1.02 / 
+                     (60 * np.tan(np.radians(elevation + 10.3 / (elevation + 5.11))))) * switch
+        result['apparent_elevation'] = elevation + delta
+        result['apparent_zenith']    = 90 - result['apparent_elevation']
+        return result
+
+    def _getTable(self):
+        """Solar position table over one leap year cycle (2020 .. 2023) at 10min resolution, calculated 
+        with 'nrel_numpy' and default atmosphere. Stored at cachePath"""
+
+        if self._table is None:
+            loc  = self.location
+            file = None
+            if self.cachePath is not None:
+                file = os.path.join(self.cachePath, 'solpos_%.5f_%.5f_%.1f_%s.pkl' % (loc.latitude, loc.longitude, loc.altitude, pvlib.__version__))
+                try:
+                    with open(file, 'rb') as f:
+                        self._table = pickle.load(f)
+                except Exception:                                                        # not yet calculated
+                    pass
+            if self._table is None:
+                times       = pd.date_range('2020-01-01', '2024-01-01 00:10', freq='10min', tz='UTC')
+                self._table = loc.get_solarposition(times)
+                if file is not None:
+                    try:
+                        os.makedirs(self.cachePath, exist_ok=True)
+                        tmp = _tmpFile(file)
+                        with open(tmp, 'wb') as f:
+                            pickle.dump(self._table, f)
+                        os.replace(tmp, file)
+                    except Exception as e:
+                        print("Warning --- can't write solar position table " + file + ": " + str(e))
+        return self._table
+
+    def _fromTable(self, times):
+        """Solar position for 'times', interpolated from _getTable(). Times are mapped to the same 
+        calendar date and time in the year of 2020 .. 2023 with the same position in the leap year cycle"""
+
+        table   = self._getTable()
+        grid    = (table.index.asi8 - table.index.asi8[0]) / 1e9                         # seconds since 2020-01-01
+        cycle   = np.array([0, 366, 731, 1096]) * 86400                                  # start of 2020 .. 2023
+        jan1    = pd.to_datetime(times.year.astype(str), format='%Y', utc=True)
+        secs    = cycle[times.year.values % 4] + (times.asi8 - jan1.asi8) / 1e9
+        result  = pd.DataFrame(index=times)
+        for col in table:
+            if col == 'azimuth':                                                         # interpolate on unit circle
+                az  = np.radians(table[col].values)
+                result[col] = np.degrees(np.arctan2(np.interp(secs, grid, np.sin(az)), np.interp(secs, grid, np.cos(az)))) % 360
+            else:
+                result[col] = np.interp(secs, grid, table[col].values)
+        return result
+
+    @staticmethod
+    def _key(val):
+        """hashable key for scalar and array-like arguments"""
+        if val is None or isinstance(val, (str, int, float)):
+            return val
+        return hash(np.asarray(val, dtype=float).tobytes())
+
+    def _lookup(self, times, what, args, calc):
+        times = pd.DatetimeIndex(times)
+        tkey  = (len(times), str(times.tz), hash(times.asi8.tobytes()))
+        key   = (what, ) + tuple(self._key(a) for a in args)
+        with self._lock:
+            if tkey in self._memo:
+                self._memo.move_to_end(tkey)
+            else:
+                self._memo[tkey] = {}
+                if len(self._memo) > self._MAX_TIMES:
+                    self._memo.popitem(last=False)
+            memo = self._memo[tkey]
+            if key in memo:
+                return memo[key]
+        val = calc()                                                                     # outside lock: calc() may itself call _lookup()
+        with self._lock:
+            return memo.setdefault(key, val)                                             # identical results if threads race, keep first
+
+    @staticmethod
+    def _atFirst(times, val):
+        """Values of 'val' (scalar or array-like, aligned to times) at the first occurrence of each time, 
+        if they are identical at all repetitions of this time; else None"""
+        if np.ndim(val) == 0:
+            return val
+        val   = np.asarray(val, dtype=float)
+        first = ~times.duplicated()
+        pos   = pd.Index(times[first]).get_indexer(times)
+        if not np.array_equal(val, val[first][pos], equal_nan=True):
+            return None
+        return val[first]
+
+    def _is_cached(self, solar_position):
+        with self._lock:
+            return any(solar_position is v for memo in self._memo.values() for v in memo.values())
+
+    def get_solarposition(self, times, pressure=None, temperature=12, **kwargs):
+        if pressure is None:
+            pressure = pvlib.atmosphere.alt2pres(self.location.altitude)
+        kwargs.pop('method', None)                                                       # we use the configured backend (eg. instead of ModelChain's default)
+        if len(kwargs) > 0:
+            return self.location.get_solarposition(times, pressure, temperature, method=self.method, **kwargs)
+        times = pd.DatetimeIndex(times)
+        if not times.is_unique and np.ndim(pressure) == 0 and np.ndim(temperature) == 0:   # stacked issues (see PVModel.run_backtest()): calculate on unique times
+            calc = lambda: self.get_solarposition(times.unique(), pressure, temperature).reindex(times)
+        elif not times.is_unique and self._atFirst(times, pressure) is not None and self._atFirst(times, temperature) is not None:
+            first = ~times.duplicated()                                                  # stacked ensemble members (see PVModel._runEnsemble()): same atmosphere at repeated times
+            calc  = lambda: self.get_solarposition(times[first], self._atFirst(times, pressure), self._atFirst(times, temperature)).reindex(times)
+        elif self._disk is not None and self._disk.covers(times):
+            calc = lambda: self._disk.solarposition(times, pressure, temperature)
+        elif self.method in ['nrel_numba', 'pyephem', 'table'] and (np.ndim(pressure) > 0 or np.ndim(temperature) > 0):
+            calc = lambda: self._refract(self.get_solarposition(times), pressure, temperature)   # these backends only support a scalar atmosphere
+        elif self.method == 'table':                                                     # refraction per default atmosphere
+            calc = lambda: self._fromTable(times)
+        else:
+            calc = lambda: self.location.get_solarposition(times, pressure, temperature, method=self.method)
+        return self._lookup(times, 'solar_position', (pressure, temperature), calc)
+
+    def get_extra_radiation(self, times):
+        times = pd.DatetimeIndex(times)
+        if not times.is_unique:
+            return self._lookup(times, 'dni_extra', (),
+                                lambda: self.get_extra_radiation(times.unique()).reindex(times))
+        if self._disk is not None and self._disk.covers(times):
+            return self._lookup(times, 'dni_extra', (), 
+                                lambda: pd.Series(self._disk.get(times, ['dni_extra'])[:, 0], index=times))
+        return self._lookup(times, 'dni_extra', (),
+                            lambda: irradiance.get_extra_radiation(times))
+
+    def get_clearsky(self, times, model='ineichen', solar_position=None, dni_extra=None, **kwargs):
+        if len(kwargs) > 0 or dni_extra is not None or not (solar_position is None or self._is_cached(solar_position)):
+            return self.location.get_clearsky(times, model, solar_position, dni_extra, **kwargs)
+        times = pd.DatetimeIndex(times)
+        if solar_position is None:                                                       # as in Location.get_clearsky()
+            solar_position = self.get_solarposition(times)
+        if not times.is_unique and solar_position is self.get_solarposition(times):
+            return self._lookup(times, 'clearsky_' + model, (solar_position['apparent_zenith'], ),
+                                lambda: self.get_clearsky(times.unique(), model).reindex(times))
+        if (self._disk is not None and model in _GeometryCache._CLEARSKY and self._disk.covers(times) and 
+            solar_position is self.get_solarposition(times)):
+            return self._lookup(times, 'clearsky_' + model, (solar_position['apparent_zenith'], ),
+                                lambda: pd.DataFrame(self._disk.get(times, [model + '_' + c for c in ['ghi', 'dni', 'dhi']]), 
+                                                     index=times, columns=['ghi', 'dni', 'dhi']))
+        return self._lookup(times, 'clearsky_' + model, (solar_position['apparent_zenith'], ),
+                            lambda: self.location.get_clearsky(times, model, solar_position, self.get_extra_radiation(times)))
+
+    def get_airmass(self, times=None, solar_position=None, model='kastenyoung1989'):
+        if solar_position is None or not self._is_cached(solar_position):
+            return self.location.get_airmass(times, solar_position, model)
+        return self._lookup(solar_position.index, 'airmass_' + model, (solar_position['apparent_zenith'], ),
+                            lambda: self.location.get_airmass(times, solar_position, model))
+
+class _GeometryCache():
+    """Persistent cache of time dependent solar geometry of a _SolarGeometry: solar position for default 
+    atmosphere, extraterrestrial radiation and clearsky irradiance ('ineichen' and 'simplified_solis').
+
+    Values are stored for one calendar year at 15min resolution per file <cachePath>/geometry_<key>_<year>.npy
+    and read as memory mapped arrays. A year is calculated when first needed. <key> is a hash over 
+    location, solar position backend and pvlib version, so that changes of these start new files. Only the 
+    most recently used _MAX_FILES files are kept.
+
+    Results are identical to calculating them: all values are elementwise functions of time and solar 
+    position for other atmospheres is derived with the refraction correction of the 'nrel' algorithm"""
+
+    _RESOLUTION = 900                                                                    # [s]
+    _MAX_FILES  = 16
+    _METHODS    = ['nrel_numpy', 'nrel_numba']                                           # backends which refraction correction of _SolarGeometry._refract() reproduces
+    _CLEARSKY   = ['ineichen', 'simplified_solis']
+    _SOLPOS     = ['apparent_zenith', 'zenith', 'apparent_elevation', 'elevation', 'azimuth', 'equation_of_time']
+    _COLUMNS    = _SOLPOS + ['dni_extra'] + [m + '_' + c for m in _CLEARSKY for c in ['ghi', 'dni', 'dhi']]
+
+    def __init__(self, geometry):
+        loc           = geometry.location
+        self.geometry = geometry
+        self.key      = hashlib.blake2b(repr((loc.latitude, loc.longitude, loc.altitude, geometry.method, pvlib.__version__, 
+                                              self._RESOLUTION, self._COLUMNS)).encode(), digest_size=8).hexdigest()
+        self._years   = {}                                                               # year --> memory mapped array
+        self._col     = { col : i for i, col in enumerate(self._COLUMNS) }
+
+    def covers(self, times):
+        """True if all 'times' (DatetimeIndex) are on the 15min grid (in UTC)"""
+
+        if len(times) == 0 or not (times.tz is None or str(times.tz) == 'UTC'):
+            return False
+        return not (times.asi8 % (self._RESOLUTION * 10**9)).any()
+
+    def get(self, times, columns):
+        """Values of 'columns' for 'times' (see covers()) as ndarray"""
+
+        t      = times.asi8
+        years  = times.year.values
+        idx    = [self._col[c] for c in columns]
+        result = np.empty((len(t), len(idx)))
+        for year in np.unique(years):
+            sel         = years == year
+            rows        = (t[sel] - pd.Timestamp(str(year)).value) // (self._RESOLUTION * 10**9)
+            result[sel] = self._year(year)[rows][:, idx]
+        return result
+
+    def solarposition(self, times, pressure, temperature):
+        """Solar position as calculated by _SolarGeometry.get_solarposition()"""
+
+        solpos = pd.DataFrame(self.get(times, self._SOLPOS), index=times, columns=self._SOLPOS)
+        if (np.ndim(pressure) == 0 and np.ndim(temperature) == 0 and
+            pressure == pvlib.atmosphere.alt2pres(self.geometry.location.altitude) and temperature == 12):
+            return solpos                                                                # default atmosphere, as stored
+        return self.geometry._refract(solpos, pressure, temperature)
+
+    def _year(self, year):
+        if year in self._years:
+            return self._years[year]
+        path = self.geometry.cachePath
+        file = os.path.join(path, 'geometry_' + self.key + '_' + str(year) + '.npy')
+        try:
+            self._years[year] = np.load(file, mmap_mode='r')
+            os.utime(file)                                                               # mark as recently used
+            return self._years[year]
+        except Exception:                                                                # not yet calculated
+            pass
+
+        loc    = self.geometry.location
+        times  = pd.date_range(str(year), str(year + 1), freq=str(self._RESOLUTION) + 's', tz='UTC', inclusive='left')
+        solpos = loc.get_solarposition(times, method=self.geometry.method)
+        data   = np.empty((len(times), len(self._COLUMNS)))
+        for col in self._SOLPOS:
+            data[:, self._col[col]] = solpos[col]
+        dni_extra = irradiance.get_extra_radiation(times)
+        data[:, self._col['dni_extra']] = dni_extra
+        for model in self._CLEARSKY:
+            clearsky = loc.get_clearsky(times, model, solpos, dni_extra)
+            for col in ['ghi', 'dni', 'dhi']:
+                data[:, self._col[model + '_' + col]] = clearsky[col]
+        self._years[year] = data
+        try:
+            os.makedirs(path, exist_ok=True)
+            tmp = _tmpFile(file) + '.npy'                                                # np.save() appends '.npy'
+            np.save(tmp, data)
+            os.replace(tmp, file)                                                        # don't leave partially written files
+            self._years[year] = np.load(file, mmap_mode='r')
+            files = sorted([f for f in os.listdir(path) if f.startswith('geometry_') and f.endswith('.npy')],
+                           key=lambda f: os.path.getmtime(os.path.join(path, f)), reverse=True)
+            for f in files[self._MAX_FILES:]:                                            # evict least recently used files
+                os.remove(os.path.join(path, f))
+        except Exception as e:
+            print("Warning --- can't write geometry cache " + file + ": " + str(e))
+        return self._years[year]
+
 # -------------------------------------------------------------------------------------- 
 """
 The helper code below this line has been lifted out of pvlib v0.9.4 (https://github.com/pvlib)
@@ -495,7 +1569,7 @@ class _cloud_to_irrandiance():
         # pressure, temp, etc., but the cloud cover forecast is not
         # accurate enough to justify using these minor corrections
         solar_position = self.location.get_solarposition(cloud_cover.index)
-        dni_extra = irradiance.get_extra_radiation(cloud_cover.index)
+        dni_extra = self.location.get_extra_radiation(cloud_cover.index)
 
         transmittance = self.cloud_cover_to_transmittance_linear(cloud_cover,
                                                                  **kwargs)
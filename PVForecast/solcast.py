@@ -30,9 +30,10 @@ from .dbrepository import DBRepository
 from .influx       import InfluxRepo
 
 class SolCast(Forecast):
-    def __init__(self, config):
+    def __init__(self, config, db = None):
         """Initialize PVModel
-        config      configparser object with section [SolCast]"""
+        config      configparser object with section [SolCast]
+        db          DBRepository to be used (default: opened when needed)"""
 
         super().__init__()
         self.config        = config
@@ -50,7 +51,7 @@ class SolCast(Forecast):
             elif interval == 'early': self._interval = -2                                # call often early, at cost of neglecting late
             elif interval == '24h':   self._interval = -3
             else:                     self._interval =  0                                # call often over mid-day
-        self._db           = None                                                        # DBRepository object once DB is opened
+        self._db           = db                                                          # DBRepository object once DB is opened
         self._storeDB      = self.config['SolCast'].getboolean('storeDB', False)         # ... store to DB
         self._storeInflux  = self.config['SolCast'].getboolean('storeInflux')            # ... store to Influx (one of the two must be true to make sense to get data from solcast)
         self._storeCSV     = self.config['SolCast'].getboolean('storeCSV')               # ... store to csv in storePath
@@ -75,7 +76,7 @@ class SolCast(Forecast):
         if self._force or self._interval == -3 or self._interval > 0 or (now_utc > mySun['sunrise'] and now_utc < mySun['sunset']):    # storeDB enabled, SolCast enabled, daylight
             if self._storeDB or self._storeInflux:
                 if self._storeDB:
-                    self._db        = DBRepository(self.config)
+                    if self._db is None: self._db = DBRepository(self.config)
                     self.last_issue = self._db.getLastIssueTime(self.SQLTable)
                     if self._storeInflux: self._influx = InfluxRepo(self.config)         # need to open Influx to later load data
                 else:
@@ -0,0 +1,87 @@
+'''
+With [PVSystem] engine = surrogate, CEC modelling replaces the single-diode solution and Sandia inverter
+model by bilinear interpolation in a pre-calculated table (see pvmodel.py / _CECSurrogateChain).
+This debugger script reports the errors of the surrogate against the exact CEC model:
+  - interpolation error at the centers of all table cells within a realistic operating range
+  - error of modelled PV output over one year of hourly synthetic weather data
+
+Run from the repository root: python debug/cec_surrogate_report.py
+(view inline comments below)
+'''
+
+import sys
+import os
+import time
+import warnings
+import configparser
+import numpy  as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from PVForecast.pvmodel  import PVModel
+from PVForecast.forecast import Forecast
+
+# --------------------------------------------------------------------------- User Input required here
+PVSYSTEM     = { 'Latitude'      : '50.2',                                        # Frankfurt: 50.2N / 8.7E
+                 'Longitude'     : '8.7',
+                 'Model'         : 'CEC',
+                 'ModuleName'    : 'LG_Electronics_Inc__LG325N1W_V5',
+                 'InverterName'  : 'SMA_America__SB10000TL_US__240V_',
+                 'NumStrings'    : '2',
+                 'NumPanels'     : '15',
+                 'Tilt'          : '30',
+                 'Azimuth'       : '127',
+                 'cachePath'     : './temp/cache/' }                              # where surrogate table is stored
+START        = '2023-01-01 00:30'                                                 # evaluated period (UTC) ...
+HOURS        = 8760                                                               # ... hourly steps
+MODELS       = 'clearsky,clearsky_scaling,campbell_norman'                        # irradiance models to evaluate
+E_RANGE      = (10, 1200)                                                         # operating range [W/m2] ...
+T_RANGE      = (-20, 75)                                                          # ... and [C] for table check
+# --------------------------------------------------------------------------- End of User Input
+
+warnings.filterwarnings("ignore", category=RuntimeWarning)
+
+def pvModel(engine):
+    config = configparser.ConfigParser()
+    config.read_dict({ 'PVSystem': dict(PVSYSTEM, engine=engine) })
+    return PVModel(config)
+
+# ----------------------------------------------- interpolation error at table cell centers
+chain  = pvModel('surrogate')._mc
+E      = chain._E_GRID
+T      = chain._T_GRID
+Ec     = (E[:-1] + E[1:])/2
+Tc     = (T[:-1] + T[1:])/2
+Ec, Tc = np.meshgrid(Ec[(Ec >= E_RANGE[0]) & (Ec <= E_RANGE[1])], Tc[(Tc >= T_RANGE[0]) & (Tc <= T_RANGE[1])], indexing='ij')
+dc, ac = chain._dcac(Ec.ravel(), Tc.ravel(), pd.RangeIndex(Ec.size))
+dcx, acx = chain.exact(Ec.ravel(), Tc.ravel())
+dcErr  = np.abs(dc['p_mp'].values - dcx)
+acErr  = np.abs(ac - acx)
+print('table cell centers (%d points, %g .. %g W/m2, %g .. %g C)' % (Ec.size, E_RANGE[0], E_RANGE[1], T_RANGE[0], T_RANGE[1]))
+print('    max error dc: %8.3f W   (%.4f%% of max. dc)' % (dcErr.max(), dcErr.max()/dcx.max()*100))
+print('    max error ac: %8.3f W   (%.4f%% of max. ac)' % (acErr.max(), acErr.max()/acx.max()*100))
+print()
+
+# ----------------------------------------------- modelled output over one year
+rng               = np.random.default_rng(0)
+times             = pd.date_range(START, periods=HOURS, freq='h', tz='UTC')
+weather           = Forecast()
+weather.DataTable = pd.DataFrame({ 'temp_air'   : 283.15 + 10*np.sin((times.dayofyear - 110)/365*2*np.pi) + rng.normal(0, 3, HOURS),
+                                   'wind_speed' : rng.uniform(0, 8, HOURS),
+                                   'clouds'     : rng.uniform(0, 100, HOURS) }, index=times)
+weather.IssueTime = str(times[0])
+weather.SQLTable  = 'report'
+
+result = {}
+for engine in ['ModelChain', 'surrogate']:
+    pv     = pvModel(engine)
+    t      = time.perf_counter()
+    pv.run_allModels(weather, MODELS)
+    result[engine] = (pv.DataTable, time.perf_counter() - t)
+exact, tExact  = result['ModelChain']
+surr,  tSurr   = result['surrogate']
+print('one year hourly data: ModelChain %.2fs, surrogate %.2fs' % (tExact, tSurr))
+print('%-18s %14s %14s %16s' % ('model', 'max err ac [W]', 'mean err [W]', 'energy err [%]'))
+for m in MODELS.split(','):
+    err = (surr['ac_' + m] - exact['ac_' + m]).abs()
+    print('%-18s %14.3f %14.4f %16.5f' % (m, err.max(), err.mean(), (surr['ac_' + m].sum()/exact['ac_' + m].sum() - 1)*100))
@@ -0,0 +1,123 @@
+'''
+DWDForecast parses MOSMIX .kml files in a single streaming pass (parseKML for MOSMIX_L, extractMOSMIX_S 
+for the global MOSMIX_S file), converting only the weather elements needed for PV modelling.
+This debugger script benchmarks these against the XPath based parsing of earlier versions (requires 
+library 'elementpath') and checks that both give identical weather data.
+
+Run from the repository root: python debug/mosmix_parse_benchmark.py
+(view inline comments below)
+'''
+
+import sys
+import os
+import time
+import configparser
+import xml.etree.ElementTree as ET
+import numpy  as np
+import pandas as pd
+from zipfile import ZipFile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from PVForecast.dwdforecast import DWDForecast
+
+# --------------------------------------------------------------------------- User Input required here
+STATION      = '10637'                                                            # Frankfurt
+FILE_L       = './temp/MOSMIX_L_LATEST_' + STATION + '.kmz'                       # MOSMIX_L file, downloaded if missing
+FILE_S       = None                                                               # MOSMIX_S file (global, ~37MB), eg. kept with [DWD] keepKMZ_S
+STATIONS_S   = [STATION, '10147', '10865', '10384', '10513', '10738']             # stations extracted from MOSMIX_S
+REPEAT       = 5                                                                  # timing: best of REPEAT runs
+# --------------------------------------------------------------------------- End of User Input
+
+def dwdForecast(dropWeather):
+    config = configparser.ConfigParser()
+    config.read_dict({ 'DWD': { 'DWDStation': STATION, 'storePath': os.path.dirname(FILE_L) + '/', 'dropWeather': dropWeather } })
+    return DWDForecast(config)
+
+def xpathParse(kml):
+    """Parsing as in earlier versions of DWDForecast.parseKML()"""
+    import elementpath
+    ns          = { 'dwd': 'https://opendata.dwd.de/weather/lib/pointforecast_dwd_extension_V1_0.xsd' }
+    tree        = ET.fromstring(kml)
+    IssueTime   = elementpath.select(tree, '//dwd:IssueTime/text()', ns)[0]
+    PeriodEnd   = elementpath.select(tree, '//dwd:ForecastTimeSteps/dwd:TimeStep/text()', ns)
+    ParaNames   = elementpath.select(tree, '//dwd:Forecast/@dwd:elementName', ns)
+    valStrArray = elementpath.select(tree, '//dwd:Forecast/dwd:value', ns)
+    weatherData = {}
+    for i, param in enumerate(ParaNames):
+        weatherData[param] = np.asarray(np.array(valStrArray[i].text.replace('-', 'nan').split()), dtype=float)
+    return pd.DataFrame(weatherData, index=pd.DatetimeIndex(PeriodEnd))
+
+def lineScan(file, station):
+    """Station extract from MOSMIX_S as in earlier versions of DWDForecast.getForecast_DWD_S()"""
+    extract = 1
+    kml     = ''
+    zipfile = ZipFile(file)
+    kmlfile = zipfile.open(zipfile.namelist()[0], 'r')
+    for line in kmlfile:
+        if (extract == 1):
+            kml += line.decode('ISO-8859-1')
+            if (line.find(rb'</kml:ExtendedData>') > 0):
+                extract = 0
+        elif (extract == 2):
+            kml += line.decode('ISO-8859-1')
+            if (line.find(rb'</kml:Placemark>') > 0):
+                break
+        elif (line.find(('<kml:name>' + station + '</kml:name>').encode()) > 0):
+            kml += '        <kml:Placemark>' + line.decode('ISO-8859-1')
+            extract = 2
+    kmlfile.close()
+    return kml + '   </kml:Document>\n</kml:kml>'
+
+def best(func):
+    dt = []
+    for i in range(REPEAT):
+        t   = time.perf_counter()
+        res = func()
+        dt.append(time.perf_counter() - t)
+    return min(dt)*1000, res
+
+try:
+    import elementpath
+    hasXPath = True
+except ImportError:
+    print("Warning --- library 'elementpath' not installed, XPath reference skipped")
+    hasXPath = False
+
+# ----------------------------------------------- MOSMIX_L
+if not os.path.isfile(FILE_L):
+    myWeather = dwdForecast('1')
+    myWeather.getForecast_DWD_L(STATION)
+    os.makedirs(os.path.dirname(FILE_L), exist_ok=True)
+    with ZipFile(FILE_L, 'w') as zipfile:
+        zipfile.writestr(myWeather.kmlName, myWeather._kml)
+myWeather = dwdForecast('1')
+myWeather.readKML(FILE_L)
+kml       = myWeather._kml
+print('MOSMIX_L %s: %.2f MB' % (FILE_L, len(kml)/1e6))
+print('%-42s %12s %10s' % ('parser', 'time [ms]', 'identical'))
+if hasXPath:
+    tXPath, ref = best(lambda: xpathParse(kml))
+    print('%-42s %12.2f %10s' % ('XPath (earlier versions)', tXPath, ''))
+for dropWeather in ['1', '0']:
+    def parse():
+        myWeather = dwdForecast(dropWeather)
+        myWeather._kml = kml
+        myWeather.parseKML()
+        return myWeather.DataTable
+    t, table = best(parse)
+    same     = table.equals(ref[table.columns]) if hasXPath else ''
+    print('%-42s %12.2f %10s' % ('parseKML, dropWeather = ' + dropWeather + ' (%d elements)' % table.shape[1], t, same))
+
+# ----------------------------------------------- MOSMIX_S
+if FILE_S is not None:
+    print()
+    print('MOSMIX_S %s: %.1f MB' % (FILE_S, os.path.getsize(FILE_S)/1e6))
+    print('%-42s %12s %10s' % ('extractor', 'time [ms]', 'identical'))
+    if hasXPath:
+        tLine, ref = best(lambda: xpathParse(lineScan(FILE_S, STATIONS_S[0]).encode('ISO-8859-1')))
+        print('%-42s %12.2f %10s' % ('line scan + XPath, 1 station', tLine, ''))
+    t, data    = best(lambda: dwdForecast('1').readMOSMIX_S(FILE_S, STATIONS_S[:1]))
+    print('%-42s %12.2f %10s' % ('readMOSMIX_S, 1 station', t, ''))
+    t, data    = best(lambda: dwdForecast('0').readMOSMIX_S(FILE_S, STATIONS_S))
+    same       = data[STATIONS_S[0]].DataTable.equals(ref) if hasXPath else ''
+    print('%-42s %12.2f %10s' % ('readMOSMIX_S, %d stations (all elements)' % len(data), t, same))
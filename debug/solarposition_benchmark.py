@@ -0,0 +1,65 @@
+'''
+PVModel supports several solar position backends ([PVSystem] solarPosition, see pvmodel.py / _SolarGeometry).
+This debugger script benchmarks them against the default 'nrel_numpy': run time, maximum error of
+solar zenith and maximum error of modelled PV output (ac_clearsky, PVWatts model).
+
+Run from the repository root: python debug/solarposition_benchmark.py
+(view inline comments below)
+'''
+
+import sys
+import os
+import time
+import configparser
+import numpy  as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from PVForecast.pvmodel  import PVModel, _SolarGeometry
+from PVForecast.forecast import Forecast
+
+# --------------------------------------------------------------------------- User Input required here
+LATITUDE     = 50.2                                                               # Frankfurt: 50.2N / 8.7E
+LONGITUDE    =  8.7
+CACHEPATH    = './temp/cache/'                                                    # where table for 'table' is stored
+START        = '2023-01-01 00:07'                                                 # evaluated period (UTC) ...
+HOURS        = 8760                                                               # ... hourly steps
+REPEAT       =  5                                                                 # timing: best of REPEAT runs
+BACKENDS     = ['nrel_numpy', 'nrel_numba', 'ephemeris', 'pyephem', 'table']
+# --------------------------------------------------------------------------- End of User Input
+
+def pvOutput(method, weather):
+    config = configparser.ConfigParser()
+    config.read_dict({ 'PVSystem': { 'Latitude'      : str(LATITUDE), 'Longitude'   : str(LONGITUDE),
+                                     'InverterPower' : '10000',       'SystemPower' : '9750',
+                                     'Tilt'          : '30',          'Azimuth'     : '180',
+                                     'cachePath'     : CACHEPATH,     'solarPosition' : method } })
+    pv = PVModel(config)
+    pv.run_allModels(weather, 'clearsky')
+    return pv.DataTable['ac_clearsky']
+
+times             = pd.date_range(START, periods=HOURS, freq='h', tz='UTC')
+weather           = Forecast()
+weather.DataTable = pd.DataFrame({ 'temp_air': 288.15, 'wind_speed': 1.0 }, index=times)
+weather.IssueTime = str(times[0])
+weather.SQLTable  = 'benchmark'
+
+ref_geo = _SolarGeometry.for_location(LATITUDE, LONGITUDE, 0, 'nrel_numpy')
+ref_pos = ref_geo.location.get_solarposition(times, method='nrel_numpy')
+ref_ac  = pvOutput('nrel_numpy', weather)
+print('%-12s %12s %16s %16s %14s' % ('backend', 'time [ms]', 'max err zenith', 'zenith<90 [deg]', 'max err ac [W]'))
+for method in BACKENDS:
+    geo = _SolarGeometry.for_location(LATITUDE, LONGITUDE, 0, method, CACHEPATH)
+    if geo.method != method:                                                      # fall-back, library not installed
+        continue
+    geo.get_solarposition(times[:24])                                             # warm-up (numba compilation, table creation)
+    dt  = []
+    for i in range(REPEAT):
+        geo._memo.clear()                                                         # time calculation, not memoization
+        t   = time.perf_counter()
+        pos = geo.get_solarposition(times)
+        dt.append(time.perf_counter() - t)
+    err = np.abs(pos['zenith'].values - ref_pos['zenith'].values)
+    day = ref_pos['zenith'].values < 90
+    ac  = np.nanmax(np.abs(pvOutput(method, weather).values - ref_ac.values))
+    print('%-12s %12.2f %16.4f %16.4f %14.3f' % (method, min(dt)*1000, err.max(), err[day].max(), ac))
@@ -0,0 +1,91 @@
+'''
+DBRepository can store forecasts in rows (text keys, or compact integer keys) or - with [DBRepo] storage = blob -
+as one compressed blob per IssueTime (see dbrepository.py). This debugger script writes the same forecasts with
+  - 'rows'            text keys, real values (default)
+  - 'compact q=2'     [DBRepo] compact = 1, quantize = 2
+  - 'blob'            [DBRepo] storage = blob
+  - 'blob q=2'        [DBRepo] storage = blob, quantize = 2
+and reports database size, write time and the time of DBRepository.getIssues() for all issues covering one day
+of PeriodEnd (two columns). It verifies that all storage modes return identical data (within quantization).
+Data is synthetic (diurnal curves with two decimals, as MOSMIX / pvlib output); ratios for real data differ.
+
+Run from the repository root: python debug/sqlite_blob_benchmark.py
+(view inline comments below)
+'''
+
+import sys
+import os
+import time
+import shutil
+import tempfile
+import configparser
+import numpy  as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from PVForecast.dbrepository import DBRepository
+from PVForecast.forecast     import Forecast
+
+# --------------------------------------------------------------------------- User Input required here
+FORECASTS    = 500                                                                # number of forecasts (issues) ...
+PERIODS      = 240                                                                # ... with this many hourly periods ...
+COLUMNS      = 20                                                                 # ... and data columns
+CODEC        = 'zlib'                                                             # zlib or zstd (requires library 'zstandard')
+SCAN         = ('2024-01-10 00:00:00+00:00', '2024-01-11 00:00:00+00:00')          # PeriodEnd range for getIssues()
+STOREPATH    = None                                                               # database location; None: temporary directory
+# --------------------------------------------------------------------------- End of User Input
+
+def forecasts():
+    rng    = np.random.default_rng(0)
+    result = []
+    for i in range(FORECASTS):
+        issue          = pd.Timestamp('2024-01-01', tz='UTC') + pd.Timedelta(hours=i)
+        index          = pd.date_range(issue + pd.Timedelta(hours=1), periods=PERIODS, freq='h', name='PeriodEnd')
+        sun            = np.maximum(0, np.sin(2*np.pi*(index.hour.to_numpy() - 6)/24))
+        clouds         = np.clip(np.cumsum(rng.normal(0, 0.1, PERIODS)) + 0.5, 0, 1)
+        data           = {}
+        for c in range(COLUMNS):
+            if c % 2 == 0: data['col_%d' % c] = sun*(1 - 0.7*clouds)*rng.uniform(200, 1000)      # irradiance, power: zero at night
+            else:          data['col_%d' % c] = rng.uniform(-10, 1000) + 10*sun + clouds          # temperature, pressure, ...
+        f              = Forecast()
+        f.DataTable    = pd.DataFrame(data, index=index).round(2)
+        f.IssueTime    = str(issue)
+        f.SQLTable     = 'dwd'
+        result.append(f)
+    return result
+
+def repository(path, name, options):
+    config = configparser.ConfigParser()
+    config.read_dict({ 'DBRepo': dict(storePath=path, dbName=name, wal='0', codec=CODEC, **options) })
+    return DBRepository(config)
+
+path    = STOREPATH if STOREPATH is not None else tempfile.mkdtemp()
+data    = forecasts()
+ref     = None
+print('%-12s %12s %10s %10s %10s' % ('storage', 'size [kB]', 'ratio', 'write [s]', 'scan [s]'))
+for label, options, tol in [('rows',        {},                                   0),
+                            ('compact q=2', { 'compact': '1', 'quantize': '2' }, 0.005),
+                            ('blob',        { 'storage': 'blob' },                0),
+                            ('blob q=2',    { 'storage': 'blob', 'quantize': '2' }, 0.005)]:
+    name  = label.replace(' ', '_').replace('=', '') + '.db'
+    db    = repository(path, name, options)
+    t     = time.perf_counter()
+    db.begin()
+    for f in data:
+        db.loadData(f)
+    db.commit()
+    write = time.perf_counter() - t
+    del db
+    db    = repository(path, name, options)
+    t     = time.perf_counter()
+    scan  = list(db.getIssues('dwd', SCAN[0], SCAN[1], ['col_0', 'col_1']))
+    scan  = (time.perf_counter() - t, scan)
+    del db
+    size  = os.path.getsize(path + '/' + name)
+    if ref is None: ref = (size, scan[1])
+    print('%-12s %12.0f %10.1f %10.2f %10.3f' % (label, size/1024, ref[0]/size, write, scan[0]))
+    if [issue for issue, _ in scan[1]] != [issue for issue, _ in ref[1]] or \
+       not all(np.allclose(a.to_numpy(), b.to_numpy(), atol=tol, equal_nan=True) for (_, a), (_, b) in zip(ref[1], scan[1])):
+        print('    ... data differs from rows')
+if STOREPATH is None:
+    shutil.rmtree(path)
@@ -0,0 +1,67 @@
+'''
+DBRepository.migrate() (see CompactDB.py) converts tables while other processes keep writing. Writers opened
+before the migration have cached the former schema; they must re-read it before preparing data. This debugger
+script opens writers before migrating a table to compact schema or blob storage:
+  - 'cold'            writer has not yet written to the migrated table
+  - 'warm'            writer has written to the table before
+  - 'deferred'        writer has data pending (begin()) while the table is migrated
+and checks that getLastIssueTime(), getData() and further writes work, and that all issues are stored.
+
+Run from the repository root: python debug/sqlite_migrate_check.py
+(view inline comments below)
+'''
+
+import sys
+import os
+import shutil
+import tempfile
+import configparser
+import numpy  as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from PVForecast.dbrepository import DBRepository
+from PVForecast.forecast     import Forecast
+
+# --------------------------------------------------------------------------- User Input required here
+PERIODS      = 24                                                                 # periods per forecast
+QUANTIZE     = 2                                                                  # decimals, see [DBRepo] quantize
+STOREPATH    = None                                                               # database location; None: temporary directory
+# --------------------------------------------------------------------------- End of User Input
+
+def forecast(i, table = 'dwd'):
+    f           = Forecast()
+    f.IssueTime = str(pd.Timestamp('2024-01-01', tz='UTC') + pd.Timedelta(hours=i))
+    f.SQLTable  = table
+    f.DataTable = pd.DataFrame({ 'ghi': np.arange(PERIODS) + i + 0.25 },
+                               index=pd.date_range(pd.Timestamp(f.IssueTime) + pd.Timedelta(hours=1), periods=PERIODS, freq='h', name='PeriodEnd'))
+    return f
+
+path   = STOREPATH if STOREPATH is not None else tempfile.mkdtemp()
+failed = 0
+for storage in ['compact', 'blob']:
+    for mode in ['cold', 'warm', 'deferred']:
+        name   = storage + '_' + mode + '.db'
+        config = configparser.ConfigParser()
+        config.read_dict({ 'DBRepo': { 'storePath': path, 'dbName': name } })
+        DBRepository(config).loadBatch([forecast(0), forecast(0, 'owm')])
+        writer = DBRepository(config)                                             # opened before migration
+        if mode == 'warm':     writer.loadData(forecast(1))
+        if mode == 'deferred': writer.begin(); writer.loadData(forecast(1))
+        DBRepository(config).migrate('dwd', QUANTIZE, storage=storage)           # as by CompactDB.py, in other process
+        try:
+            last   = writer.getLastIssueTime('dwd')
+            latest = writer.getData('dwd')
+            writer.loadBatch([forecast(2), forecast(2, 'owm')])
+            if mode == 'deferred': writer.commit()
+            issues = DBRepository(config).getData('dwd', mode='all')['IssueTime'].nunique()
+            ok     = issues == (2 if mode == 'cold' else 3) and len(latest) > 0
+            print('%-8s %-9s %s  last issue %s, %d issues stored' % (storage, mode, 'OK    ' if ok else 'FAILED', last, issues))
+        except Exception as e:
+            ok     = False
+            print('%-8s %-9s FAILED %s' % (storage, mode, repr(e)))
+        failed = failed + (0 if ok else 1)
+        del writer
+print('all checks passed' if failed == 0 else str(failed) + ' check(s) failed')
+if STOREPATH is None:
+    shutil.rmtree(path)
@@ -0,0 +1,102 @@
+'''
+DBRepository writes data with prepared 'INSERT OR IGNORE' statements (executemany) in explicit transactions,
+to a database in WAL mode (see dbrepository.py). This debugger script benchmarks rows/sec against the former
+path (duplicate check with SELECT and pandas.to_sql(), one commit per forecast):
+  - 'to_sql'          former path
+  - 'loadData'        one transaction per forecast
+  - 'begin/commit'    one transaction for all forecasts, as within ForecastManager.runForecasts()
+and verifies that all paths store identical data.
+
+Run from the repository root: python debug/sqlite_write_benchmark.py
+(view inline comments below)
+'''
+
+import sys
+import os
+import time
+import shutil
+import sqlite3
+import tempfile
+import configparser
+import numpy  as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from PVForecast.dbrepository import DBRepository
+from PVForecast.forecast     import Forecast
+
+# --------------------------------------------------------------------------- User Input required here
+FORECASTS    = 200                                                                # number of forecasts (issues) ...
+PERIODS      = 240                                                                # ... with this many hourly periods ...
+COLUMNS      = 20                                                                 # ... and data columns
+TABLES       = ['dwd', 'owm', 'solcast']                                          # forecasts are spread over these tables
+STOREPATH    = None                                                               # database location; None: temporary directory
+# --------------------------------------------------------------------------- End of User Input
+
+def forecasts():
+    rng    = np.random.default_rng(0)
+    result = []
+    for i in range(FORECASTS):
+        issue          = pd.Timestamp('2024-01-01', tz='UTC') + pd.Timedelta(hours=i)
+        f              = Forecast()
+        f.DataTable    = pd.DataFrame(rng.uniform(0, 1000, (PERIODS, COLUMNS)), columns=['col_%d' % c for c in range(COLUMNS)],
+                                      index=pd.date_range(issue + pd.Timedelta(hours=1), periods=PERIODS, freq='h', name='PeriodEnd'))
+        f.DataTable.iloc[::7, 0] = np.nan
+        f.IssueTime    = str(issue)
+        f.SQLTable     = TABLES[i % len(TABLES)]
+        result.append(f)
+    return result
+
+def toSql(path, data):
+    """former DBRepository.loadData()"""
+    db     = sqlite3.connect(path + '/to_sql.db')
+    tables = []
+    for f in data:
+        c = db.cursor()
+        if f.SQLTable not in tables:
+            c.execute('CREATE TABLE `' + f.SQLTable + '` (IssueTime text, PeriodEnd text, ' + ' real, '.join(f.get_ParaNames()) + ' real, PRIMARY KEY(IssueTime, PeriodEnd));')
+            tables.append(f.SQLTable)
+        c.execute("SELECT IssueTime FROM `" + f.SQLTable + "` WHERE IssueTime='" + f.IssueTime + "';")
+        if c.fetchone() is None:
+            myData = f.DataTable.copy()
+            myData['IssueTime'] = f.IssueTime
+            myData.to_sql(f.SQLTable, db, if_exists='append')
+        c.close()
+    db.close()
+    return 'to_sql.db'
+
+def repository(path, data, deferred):
+    name   = 'deferred.db' if deferred else 'loadData.db'
+    config = configparser.ConfigParser()
+    config.read_dict({ 'DBRepo': { 'storePath': path, 'dbName': name } })
+    db     = DBRepository(config)
+    if deferred: db.begin()
+    for f in data:
+        db.loadData(f)
+    if deferred: db.commit()
+    del db
+    return name
+
+def dump(path, name):
+    db   = sqlite3.connect(path + '/' + name)
+    rows = [db.execute('SELECT * FROM `' + table + '` ORDER BY IssueTime, PeriodEnd;').fetchall() for table in TABLES]
+    db.close()
+    return rows
+
+path  = STOREPATH if STOREPATH is not None else tempfile.mkdtemp()
+data  = forecasts()
+rows  = FORECASTS*PERIODS
+ref   = None
+print('%-14s %10s %14s' % ('path', 'time [s]', 'rows/sec'))
+for label, run in [('to_sql',       lambda: toSql(path, data)),
+                   ('loadData',     lambda: repository(path, data, False)),
+                   ('begin/commit', lambda: repository(path, data, True))]:
+    t    = time.perf_counter()
+    name = run()
+    dt   = time.perf_counter() - t
+    print('%-14s %10.2f %14.0f' % (label, dt, rows/dt))
+    if ref is None: ref = dump(path, name)
+    elif dump(path, name) != ref:
+        print('    ... stored data differs from to_sql')
+if STOREPATH is None:
+    shutil.rmtree(path)